@@ -0,0 +1,173 @@
+"""
+Local stand-ins for the gspread and OpenAI clients, with a configurable latency per call.
+
+Register them with `utils.clients.set_client` so the dashboard code runs unchanged without network access.
+"""
+import time
+import threading
+from types import SimpleNamespace
+import gspread
+
+
+class CallCounter:
+    """
+    Counts the calls made to a fake and sleeps for its latency on each of them.
+
+    Parameters:
+    - latency (float): Seconds each call takes.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def record(self, name):
+        """
+        Records a call and waits for the configured latency.
+
+        Parameters:
+        - name (str): The name of the called method.
+        """
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class FakeWorksheet:
+    """Worksheet metadata as returned by `Spreadsheet.worksheet`."""
+
+    def __init__(self, sheet_id, title, values):
+        self.id = sheet_id
+        self.title = title
+        self.row_count = max(len(values), 1000)
+        self.col_count = max(max(map(len, values), default=0), 26)
+
+
+class FakeSpreadsheet:
+    """
+    In-memory spreadsheet answering the value requests the dashboard makes.
+
+    Parameters:
+    - worksheets (dict): Rows of each worksheet keyed by tab title, in tab order.
+    - counter (CallCounter): Counter shared with the client, which also applies the latency.
+    """
+
+    def __init__(self, worksheets, counter):
+        self.values = {title: [list(row) for row in rows] for title, rows in worksheets.items()}
+        self.counter = counter
+
+    def worksheets(self):
+        self.counter.record("worksheets")
+        return [FakeWorksheet(index, title, rows) for index, (title, rows) in enumerate(self.values.items())]
+
+    def worksheet(self, title):
+        self.counter.record("worksheet")
+        return FakeWorksheet(list(self.values).index(title), title, self.values[title])
+
+    def get_range(self, range_name):
+        """
+        Returns the values of an A1 range such as "'title'" or "'title'!A2:H".
+
+        Parameters:
+        - range_name (str): The absolute range name.
+
+        Returns:
+        - list: The rows of the range, with trailing empty cells and rows removed like the Sheets API does.
+        """
+        title, _, cells = range_name.partition("!")
+        rows = self.values[title.strip("'")]
+        if cells:
+            start, _, end = cells.partition(":")
+            first_row, first_column = gspread.utils.a1_to_rowcol(start)
+            last_column = gspread.utils.a1_to_rowcol(end + "1")[1] if end else first_column
+            rows = [row[first_column - 1:last_column] for row in rows[first_row - 1:]]
+        rows = [[str(value) for value in row] for row in rows]
+        while rows and not any(rows[-1]):
+            rows.pop()
+        return rows
+
+    def values_get(self, range_name, params=None):
+        self.counter.record("values_get")
+        return {"range": range_name, "values": self.get_range(range_name)}
+
+    def values_batch_get(self, ranges, params=None):
+        self.counter.record("values_batch_get")
+        return {"valueRanges": [{"range": range_name, "values": self.get_range(range_name)} for range_name in ranges]}
+
+    def batch_update(self, body):
+        self.counter.record("batch_update")
+        titles = list(self.values)
+        for request in body["requests"]:
+            if "updateCells" not in request:
+                continue
+            cell_range = request["updateCells"]["range"]
+            rows = self.values[titles[cell_range["sheetId"]]]
+            row_index, column_index = cell_range["startRowIndex"], cell_range["startColumnIndex"]
+            while len(rows) <= row_index:
+                rows.append([])
+            row = rows[row_index]
+            for offset, cell in enumerate(request["updateCells"]["rows"][0]["values"]):
+                while len(row) <= column_index + offset:
+                    row.append("")
+                value = cell.get("userEnteredValue", {})
+                row[column_index + offset] = value.get("stringValue", value.get("numberValue", ""))
+        return {"replies": []}
+
+
+class FakeGspreadClient:
+    """
+    gspread client serving in-memory spreadsheets.
+
+    Parameters:
+    - spreadsheets (dict): Worksheets of each spreadsheet keyed by spreadsheet name, see FakeSpreadsheet.
+    - latency (float): Seconds each API call takes.
+    """
+
+    def __init__(self, spreadsheets, latency=0.0):
+        self.counter = CallCounter(latency)
+        self.spreadsheets = {name: FakeSpreadsheet(worksheets, self.counter) for name, worksheets in spreadsheets.items()}
+
+    def open(self, name):
+        self.counter.record("open")
+        return self.spreadsheets[name]
+
+
+class FakeChatCompletions:
+    """
+    `client.chat.completions` answering every request with a short canned analysis.
+
+    Parameters:
+    - counter (CallCounter): Counter that also applies the latency of each request.
+    - chunks (int): Number of chunks a streamed answer is split into.
+    """
+
+    def __init__(self, counter, chunks=10):
+        self.counter = counter
+        self.chunks = chunks
+
+    def create(self, model, messages, stream=False, **params):
+        self.counter.record("chat.completions.create")
+        content = f"Synthetic analysis from {model} of {len(messages[-1]['content'])} characters of feedback."
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+        size = len(content) // self.chunks + 1
+        return (
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[start:start + size]))])
+            for start in range(0, len(content), size)
+        )
+
+
+class FakeOpenAI:
+    """
+    OpenAI client whose chat completions are answered locally.
+
+    Parameters:
+    - latency (float): Seconds each request takes before its answer starts.
+    """
+
+    def __init__(self, latency=0.0):
+        self.counter = CallCounter(latency)
+        self.chat = SimpleNamespace(completions=FakeChatCompletions(self.counter))
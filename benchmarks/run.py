@@ -0,0 +1,180 @@
+"""
+End-to-end benchmarks of the dashboard's data path on synthetic worksheets.
+
+Google Sheets and OpenAI are replaced by the local fakes of benchmarks.fakes, with a configurable
+latency per call, and the timings are written as JSON for regression tracking. Run it from the
+repository root:
+
+    python -m benchmarks.run --rows 1000 100000 --locations 10 1000 --output bench.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from streamlit import config as streamlit_config, logger as streamlit_logger
+from utils import (aggregate_cache, clients, data_cleaning, data_processing, google_services, ingestion, llm_cache,
+                   openai_functions, rollups, style)
+from benchmarks import fakes, synthetic
+
+# Default grid of benchmarked sizes
+DEFAULT_ROWS = [1000, 10000, 100000]
+DEFAULT_LOCATIONS = [10, 100, 1000]
+
+
+def time_call(func, setup=None, repeat=3):
+    """
+    Times a call several times.
+
+    Parameters:
+    - func (callable): The call to time.
+    - setup (callable): Called before each timed call, outside of the timing.
+    - repeat (int): Number of timed calls.
+
+    Returns:
+    - dict: The minimum, median, mean and maximum duration in seconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return {
+        "min_s": min(durations), "median_s": statistics.median(durations),
+        "mean_s": statistics.fmean(durations), "max_s": max(durations)
+    }
+
+def install_fakes(worksheets, sheets_latency, openai_latency):
+    """
+    Registers fake clients serving the synthetic spreadsheet and forgets every cached state.
+
+    Parameters:
+    - worksheets (dict): Rows of each worksheet, as returned by synthetic.generate_spreadsheet.
+    - sheets_latency (float): Seconds each Sheets call takes.
+    - openai_latency (float): Seconds each OpenAI request takes.
+
+    Returns:
+    - tuple: The fake gspread and OpenAI clients.
+    """
+    gspread_client = fakes.FakeGspreadClient({"edmo_dashboard": worksheets}, latency=sheets_latency)
+    openai_client = fakes.FakeOpenAI(latency=openai_latency)
+    clients.reset_clients()
+    clients.set_client("gspread", gspread_client)
+    clients.set_client("openai", openai_client)
+    google_services.invalidate_sheets_cache()
+    ingestion.reset_ingestion()
+    return gspread_client, openai_client
+
+def run_size(rows, locations, args):
+    """
+    Runs every benchmark on one spreadsheet size.
+
+    Parameters:
+    - rows (int): Number of responses per response worksheet.
+    - locations (int): Number of distinct locations.
+    - args (argparse.Namespace): The command line options.
+
+    Returns:
+    - list: One result per benchmark, with its timings and the fake API calls it made.
+    """
+    worksheets = synthetic.generate_spreadsheet(rows, locations, seed=args.seed)
+    gspread_client, openai_client = install_fakes(worksheets, args.sheets_latency, args.openai_latency)
+
+    dataframes = google_services.load_worksheets("edmo_dashboard", google_services.WORKSHEETS)
+    cleaned_df = data_cleaning.clean_data_midyear_endofession(dataframes["df_midyear"])
+    dic_comments = data_processing.create_comments_dict(cleaned_df)
+    feedback_df = pd.concat([dataframes["df_endofyear_eng"], dataframes["df_endofyear_spa"]], ignore_index=True)
+    response_encoding, dimensions, satisfaction_indices = data_processing.get_feedback_data()
+    survey_rollups = rollups.build_survey_rollups(dataframes["df_midyear"])
+
+    def clear_caches():
+        # A cold load downloads the worksheets and computes the aggregates again
+        google_services.invalidate_sheets_cache()
+        aggregate_cache.get_aggregate_cache().clear()
+
+    benchmarks = [
+        ("load_and_prepare_data[cold]", lambda: data_cleaning.load_and_prepare_data("feedback_midyear"), clear_caches),
+        ("load_and_prepare_data[warm]", lambda: data_cleaning.load_and_prepare_data("feedback_midyear"), None),
+        ("create_grouped_df", lambda: data_processing.create_grouped_df(cleaned_df), None),
+        ("create_comments_dict", lambda: data_processing.create_comments_dict(cleaned_df), None),
+        ("build_survey_rollups", lambda: rollups.build_survey_rollups(dataframes["df_midyear"]), None),
+        ("SurveyRollups.query[weekly]", lambda: survey_rollups.query(freq="W"), None),
+        ("display_dimensions_scores_endofyear",
+         lambda: style.display_dimensions_scores_endofyear(feedback_df, dimensions, response_encoding, satisfaction_indices),
+         None),
+    ]
+    if not args.skip_analysis:
+        benchmarks.append(("analyze_comment", lambda: openai_functions.analyze_comment(dic_comments),
+                           llm_cache.get_llm_cache().clear))
+
+    results = []
+    for name, func, setup in benchmarks:
+        calls_before = {**gspread_client.counter.calls, **openai_client.counter.calls}
+        timings = time_call(func, setup, args.repeat)
+        calls_after = {**gspread_client.counter.calls, **openai_client.counter.calls}
+        api_calls = {call: (count - calls_before.get(call, 0)) / args.repeat
+                     for call, count in calls_after.items() if count != calls_before.get(call, 0)}
+        results.append({"benchmark": name, "rows": rows, "locations": locations, "repeat": args.repeat,
+                        **timings, "api_calls_per_run": api_calls})
+        print(f"{name:40s} rows={rows:<8d} locations={locations:<5d} median={timings['median_s']:.4f}s",
+              file=sys.stderr)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the EDMO dashboard on synthetic data with local fakes.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="Responses per worksheet.")
+    parser.add_argument("--locations", type=int, nargs="+", default=DEFAULT_LOCATIONS, help="Distinct locations.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs of each benchmark.")
+    parser.add_argument("--sheets-latency", type=float, default=0.05, help="Seconds each Sheets call takes.")
+    parser.add_argument("--openai-latency", type=float, default=0.2, help="Seconds each OpenAI request takes.")
+    parser.add_argument("--respect-rate-limits", action="store_true",
+                        help="Throttle the fake OpenAI calls with the account's rate limits.")
+    parser.add_argument("--skip-analysis", action="store_true", help="Do not benchmark analyze_comment.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data.")
+    parser.add_argument("--output", default=None, help="JSON file to write, stdout by default.")
+    args = parser.parse_args()
+
+    # Streamlit warns about every call made outside of `streamlit run`. Its configuration is parsed
+    # first, since parsing it resets the log level
+    streamlit_config.get_option("logger.level")
+    streamlit_logger.set_log_level("error")
+
+    # Keep the benchmark's LLM responses away from the dashboard's cache
+    llm_cache.LLM_CACHE_PATH = os.path.join(tempfile.mkdtemp(prefix="edmo_bench_"), "llm_responses.sqlite3")
+    if not args.respect_rate_limits:
+        openai_functions.OPENAI_RATE_LIMITS = {
+            model: {"requests_per_minute": 10 ** 9, "tokens_per_minute": 10 ** 12}
+            for model in openai_functions.OPENAI_RATE_LIMITS
+        }
+
+    results = []
+    for rows in args.rows:
+        for locations in args.locations:
+            results.extend(run_size(rows, locations, args))
+
+    report = {
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(), "platform": platform.platform(),
+            "pandas": pd.__version__, "numpy": np.__version__
+        },
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
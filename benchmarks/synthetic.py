@@ -0,0 +1,149 @@
+"""
+Synthetic survey worksheets with the layouts the dashboard expects.
+"""
+import numpy as np
+import pandas as pd
+from utils import data_processing, google_services
+
+# Words the synthetic comments are made of
+COMMENT_WORDS = [
+    "staff", "friendly", "activities", "fun", "pick-up", "schedule", "kids", "bored", "safe", "learning",
+    "science", "art", "communication", "late", "organized", "snacks", "field", "trip", "engaging", "more"
+]
+
+# Share of respondents leaving a comment
+COMMENT_RATE = 0.6
+
+# Responses are submitted evenly over a summer starting on SURVEY_START, lasting SURVEY_DAYS days
+SURVEY_START = np.datetime64("2024-06-03T08:00:00")
+SURVEY_DAYS = 70
+
+
+def generate_comments(rng, count):
+    """
+    Generates short free-text comments, some of them empty.
+
+    Parameters:
+    - rng (np.random.Generator): The random generator.
+    - count (int): Number of comments.
+
+    Returns:
+    - list: The comments.
+    """
+    lengths = rng.integers(3, 15, size=count)
+    words = rng.choice(COMMENT_WORDS, size=int(lengths.sum()))
+    comments, start = [], 0
+    for length, has_comment in zip(lengths, rng.random(count) < COMMENT_RATE):
+        comments.append(" ".join(words[start:start + length]) if has_comment else "")
+        start += length
+    return comments
+
+def generate_timestamps(count):
+    """
+    Generates submission timestamps spread evenly over the survey period, in the Google Forms format.
+
+    Parameters:
+    - count (int): Number of timestamps.
+
+    Returns:
+    - np.ndarray: The timestamps as "MM/DD/YYYY HH:MM:SS" strings, in submission order.
+    """
+    offsets = np.arange(count) * (SURVEY_DAYS * 24 * 3600 // max(count, 1))
+    submitted = pd.to_datetime(SURVEY_START + offsets.astype("timedelta64[s]"))
+    return submitted.strftime("%m/%d/%Y %H:%M:%S").to_numpy()
+
+def generate_survey_values(rng, rows, locations):
+    """
+    Generates a mid-year or end-of-session response worksheet: timestamp, email, name and child
+    columns, then location, experience rating (1-5), recommendation likelihood (0-10) and comment,
+    as read by data_cleaning.clean_data_midyear_endofession.
+
+    Parameters:
+    - rng (np.random.Generator): The random generator.
+    - rows (int): Number of responses.
+    - locations (int): Number of distinct locations.
+
+    Returns:
+    - list: The worksheet's rows, header included.
+    """
+    header = ["Timestamp", "Email Address", "Parent Name", "Child Name", "Location",
+              "Kid Camp Experience Rating", "Recommendation Likelihood", "Additional Comments"]
+    location_names = np.array([f"Location {index:04d}" for index in range(locations)] + [""])
+    # A few respondents leave the location empty
+    location_ids = np.where(rng.random(rows) < 0.02, locations, rng.integers(0, locations, size=rows))
+    columns = [
+        generate_timestamps(rows), np.full(rows, "parent@example.com"), np.full(rows, "Parent"),
+        np.full(rows, "Child"), location_names[location_ids],
+        rng.integers(1, 6, size=rows).astype(str), rng.integers(0, 11, size=rows).astype(str),
+        np.array(generate_comments(rng, rows), dtype=object)
+    ]
+    return [header] + np.column_stack(columns).tolist()
+
+def generate_endofyear_values(rng, rows):
+    """
+    Generates an end-of-year response worksheet whose columns match the indices of
+    data_processing.get_feedback_data: Likert answers to every dimension question, the two
+    satisfaction columns, then the positive and improvement feedback.
+
+    Parameters:
+    - rng (np.random.Generator): The random generator.
+    - rows (int): Number of responses.
+
+    Returns:
+    - list: The worksheet's rows, header included.
+    """
+    response_encoding, dimensions, satisfaction_indices = data_processing.get_feedback_data()
+    question_indices = sorted(index for details in dimensions.values() for index in details["indices"])
+    width = max(satisfaction_indices) + 3
+    labels = np.array(list(response_encoding) + [""])
+
+    columns = [np.full(rows, "")] * width
+    columns[0] = np.full(rows, "2024-06-01 10:00:00")
+    for index in question_indices:
+        columns[index] = labels[rng.integers(0, len(labels), size=rows)]
+    columns[satisfaction_indices[0]] = rng.integers(1, 6, size=rows).astype(str)
+    columns[satisfaction_indices[1]] = rng.integers(0, 11, size=rows).astype(str)
+    columns[width - 2] = np.array(generate_comments(rng, rows), dtype=object)
+    columns[width - 1] = np.array(generate_comments(rng, rows), dtype=object)
+
+    header = ["Timestamp"] + [f"Question {index}" for index in range(1, width - 2)] + \
+             ["Positive Feedback", "Improvement Feedback"]
+    return [header] + np.column_stack(columns).tolist()
+
+def generate_spreadsheet(rows, locations, seed=0):
+    """
+    Generates every worksheet of the dashboard spreadsheet, in tab order.
+
+    The response worksheets get `rows` responses each; the location feedback worksheets hold an
+    analysis per location and the end-of-year one only its header, as before its first update.
+
+    Parameters:
+    - rows (int): Number of responses per response worksheet.
+    - locations (int): Number of distinct locations.
+    - seed (int): Seed of the random generator.
+
+    Returns:
+    - dict: Rows of each worksheet keyed by worksheet name, in google_services.WORKSHEETS order.
+    """
+    rng = np.random.default_rng(seed)
+    feedback_values = {
+        "feedback_midyear": [["Location", "Analysis", "Date Sent", "Comments Hash"]],
+        "feedback_endofsession": [["Location", "Analysis", "Date Sent", "Comments Hash"]],
+        "feedback_endofyear": [["Positive Feedback Summary", "Improvement Feedback Summary", "Date Sent",
+                                "Positive Feedback Hash", "Improvement Feedback Hash"]]
+    }
+    location_feedback = [
+        [f"Location {index:04d}", f"Synthetic analysis of location {index}.", "2024-06-01", ""]
+        for index in range(locations)
+    ] + [["No Location", "Synthetic analysis of responses without a location.", "2024-06-01", ""]]
+    feedback_values["feedback_midyear"] += location_feedback
+    feedback_values["feedback_endofsession"] += location_feedback
+    worksheets = {}
+    for worksheet_name in google_services.WORKSHEETS:
+        if worksheet_name in ("df_midyear", "df_endofsession"):
+            worksheets[worksheet_name] = generate_survey_values(rng, rows, locations)
+        elif worksheet_name in ("df_endofyear_eng", "df_endofyear_spa"):
+            worksheets[worksheet_name] = generate_endofyear_values(rng, rows)
+        else:
+            worksheets[worksheet_name] = feedback_values[worksheet_name]
+    return worksheets
@@ -1,20 +1,42 @@
 import streamlit as st
 import pandas as pd
-from utils import data_cleaning, google_services, openai_functions, style, data_processing
+from utils import assets, data_cleaning, google_services, jobs, openai_functions, single_flight, style, data_processing, telemetry
 from datetime import datetime
 
 # Set page configuration with favicon and collapsed sidebar
 st.set_page_config(
     layout="wide",
     page_title="EDMO End of Year Feedback Dashboard",
-    page_icon="https://raw.githubusercontent.com/OthmanBensoudaKoraichi/EDMO/refs/heads/main/images/edmo_logo.png",
+    page_icon=assets.get_encoded_image(assets.LOGO_PATH, assets.FAVICON_WIDTH)[0],
     initial_sidebar_state="expanded"
 )
 
+@st.fragment(run_every=jobs.JOBS_POLL_INTERVAL_SECONDS)
+def show_update_progress(job_id):
+    """
+    Shows that a background update of the feedback summaries is running, and reruns the page
+    with the new summaries once it is over.
+
+    Parameters:
+    - job_id (str): The ID of the update job.
+    """
+    job = jobs.get_job(job_id)
+    state = job.snapshot() if job is not None else {"status": "cancelled"}
+    if state["status"] in jobs.JOB_FINAL_STATUSES:
+        st.session_state["update_message_feedback_endofyear"] = {
+            "succeeded": ("success", "Dashboard updated successfully with feedback summaries!"),
+            "failed": ("error", f"The update failed: {state.get('error')}"),
+            "cancelled": ("info", "The update was cancelled.")
+        }[state["status"]]
+        st.rerun()
+
+    st.info(f"Updating the feedback summaries ({state['status']})...")
+    if st.button("Cancel update"):
+        jobs.cancel_job(job_id)
+
 def main():
-    # Display the logo in the sidebar using the GitHub URL
-    logo_url = "https://raw.githubusercontent.com/OthmanBensoudaKoraichi/EDMO/refs/heads/main/images/edmo_logo.png"
-    st.sidebar.image(logo_url, use_column_width=True)
+    # Display the logo in the sidebar, encoded once per process from the local images
+    st.sidebar.image(assets.get_encoded_image(assets.LOGO_PATH, assets.LOGO_SIDEBAR_WIDTH)[0], use_column_width=True)
     # Title
     st.markdown("<h1 style='color: #6BD0C3;'>EDMO End of Year Feedback Analysis Dashboard</h1>", unsafe_allow_html=True)
     # Get all feedback data
@@ -22,9 +44,9 @@ def main():
 
     style.configure_page_style_endofyear()
 
-    # Load data from Google Sheets
-    dataframes = google_services.load_google_sheets_data("edmo_dashboard")
-    feedback_endofyear_df = dataframes[5]  # Assuming feedback_endofyear is the 6th sheet
+    # Load only the End of Year worksheets from Google Sheets
+    dataframes = google_services.load_worksheets("edmo_dashboard", google_services.PAGE_WORKSHEETS["feedback_endofyear"])
+    feedback_endofyear_df = dataframes["feedback_endofyear"]
 
     # Load feedback summaries from Google Sheets
     feedback_summaries = data_processing.load_feedback_summaries(feedback_endofyear_df)
@@ -32,22 +54,44 @@ def main():
     positive_feedback_summary = feedback_summaries["positive_summary"]
     improvement_feedback_summary = feedback_summaries["improvement_summary"]
 
-    # Check if summaries need to be generated
-    should_generate_feedback = not positive_feedback_summary or not improvement_feedback_summary
+    # Check if summaries need to be generated, unless they are left to the nightly batch job
+    precomputed_only = data_processing.is_precomputed_only()
+    should_generate_feedback = not precomputed_only and (not positive_feedback_summary or not improvement_feedback_summary)
+
+    # Report the outcome of the last background update started from this session
+    update_message = st.session_state.pop("update_message_feedback_endofyear", None)
+    if update_message:
+        getattr(st, update_message[0])(update_message[1])
 
-    # Update dashboard if needed
+    # Update dashboard if needed. The button runs the update as a background job, so it is not
+    # interrupted by reruns or page changes
     col1, _ = st.columns([1, 9])
     with col1:
-        if st.button("Update Dashboard") or should_generate_feedback:
-            with st.spinner("Updating dashboard..."):
-                positive_feedback_summary, improvement_feedback_summary, last_update_date = data_processing.update_feedback_summaries_endofyear(
-                    dataframes)
+        if not precomputed_only and st.button("Update Dashboard"):
+            jobs.enqueue_job("edmo_dashboard-feedback_endofyear", jobs.run_feedback_summaries_update, dataframes=dataframes)
+        active_job = jobs.get_active_job("edmo_dashboard-feedback_endofyear")
+        if active_job is None and should_generate_feedback:
+            # Generate the missing summaries, unless another session is already doing it
+            with st.spinner("Updating dashboard..."), \
+                    single_flight.single_flight("edmo_dashboard-feedback_endofyear") as leader:
+                if leader:
+                    positive_feedback_summary, improvement_feedback_summary, last_update_date = data_processing.update_feedback_summaries_endofyear(
+                        dataframes)
+            if not leader:
+                # Serve the summaries written by the other session
+                single_flight.reload_leader_result("edmo_dashboard", "feedback_endofyear")
+            else:
+                st.success("Dashboard updated successfully with feedback summaries!")
+
+    # Follow the update running for this page, whichever session started it
+    if active_job is not None:
+        show_update_progress(active_job.id)
 
     # Display last update date
     st.write(f"**Last updated:** {last_update_date}")
 
     # Display dimensions and scores
-    feedback_df = pd.concat([dataframes[1], dataframes[2]], ignore_index=True)
+    feedback_df = pd.concat([dataframes["df_endofyear_eng"], dataframes["df_endofyear_spa"]], ignore_index=True)
     style.display_dimensions_scores_endofyear(feedback_df, dimensions, response_encoding, satisfaction_indices)
 
     # Display feedback summaries
@@ -64,4 +108,7 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    # Time the whole rerun, and show where the time went when the performance panel is enabled
+    with telemetry.trace("page.End_Of_Year") as rerun_span:
+        main()
+    telemetry.show_performance_panel(rerun_span.trace)
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+from utils import chunking, llm_cache, openai_functions
+
+
+class RecordingCompletions:
+    """Answers every request with a fixed text and records the messages it received."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.requests = []
+
+    def create(self, model, messages, **params):
+        self.requests.append(messages)
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content=self.answer))])
+
+def build_messages(comments):
+    return [{"role": "user", "content": "\n".join(comments)}]
+
+def run_map_reduce(monkeypatch, tmp_path, comments, answer, token_budget):
+    monkeypatch.setattr(llm_cache, "_llm_cache", llm_cache.LLMCache(str(tmp_path / "llm.sqlite3")))
+    completions = RecordingCompletions(answer)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    result = openai_functions.map_reduce_completion(
+        client, "gpt-4o-mini", "test task", comments, build_messages, "Merge.", token_budget
+    )
+    return result, completions.requests
+
+def test_chunks_fit_the_budget_and_keep_the_order():
+    comments = [f"Comment number {index} about the program" for index in range(50)]
+    chunks = chunking.chunk_comments(comments, token_budget=40)
+
+    assert [comment for chunk in chunks for comment in chunk] == comments
+    assert all(sum(chunking.count_tokens(comment) for comment in chunk) <= 40 for chunk in chunks)
+
+def test_oversized_comment_gets_a_chunk_of_its_own():
+    chunks = chunking.chunk_comments(["short", "long " * 100, "short"], token_budget=20)
+    assert chunks == [["short"], ["long " * 100], ["short"]]
+    assert chunking.chunk_comments([], token_budget=20) == []
+
+def test_truncate_to_tokens():
+    text = "word " * 100
+    assert chunking.truncate_to_tokens("short", 10) == "short"
+    assert chunking.count_tokens(chunking.truncate_to_tokens(text, 10)) <= 10
+
+def test_small_input_is_a_single_request(monkeypatch, tmp_path):
+    result, requests = run_map_reduce(monkeypatch, tmp_path, ["Great staff"], "Analysis", 100)
+    assert result == "Analysis"
+    assert len(requests) == 1
+
+def test_final_reduce_stays_within_the_budget_when_results_are_long(monkeypatch, tmp_path):
+    comments = [f"Comment number {index} about the program" for index in range(40)]
+    # Every partial result alone is larger than the budget, so no two of them can be merged as is
+    result, requests = run_map_reduce(monkeypatch, tmp_path, comments, "long analysis " * 100, 60)
+
+    assert result == ("long analysis " * 100).strip()
+    reduce_requests = [messages for messages in requests if messages[-1]["content"].startswith("Merge.")]
+    assert reduce_requests
+    for messages in reduce_requests:
+        parts = messages[-1]["content"].split("\n\n")[1:]
+        assert sum(chunking.count_tokens(part.split(":\n", 1)[1]) for part in parts) <= 60
+    report = openai_functions.get_chunking_reports()["test task"]
+    # Identical merges are answered from the LLM cache
+    assert report["chunks"] > 1 and report["calls"] >= len(requests)
+
+def test_chunking_reports_are_bounded(monkeypatch, tmp_path):
+    monkeypatch.setattr(openai_functions, "CHUNKING_REPORTS_MAX_TASKS", 3)
+    monkeypatch.setattr(llm_cache, "_llm_cache", llm_cache.LLMCache(str(tmp_path / "llm.sqlite3")))
+    client = SimpleNamespace(chat=SimpleNamespace(completions=RecordingCompletions("Analysis")))
+    for index in range(5):
+        openai_functions.map_reduce_completion(client, "gpt-4o-mini", f"task {index}", ["Great staff"], build_messages, "Merge.")
+
+    assert list(openai_functions.get_chunking_reports())[-3:] == ["task 2", "task 3", "task 4"]
+    assert len(openai_functions.get_chunking_reports()) <= 3
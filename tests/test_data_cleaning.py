@@ -0,0 +1,57 @@
+import pandas as pd
+from utils import data_cleaning, data_processing, google_services
+from benchmarks import run, synthetic
+
+
+def baseline_clean(df):
+    """clean_data_midyear_endofession before the typed schema."""
+    cleaned_df = df.iloc[:, 4:8].copy()
+    cleaned_df.columns = ['Location', 'Kid Camp Experience Rating', 'Recommendation Likelihood', 'Additional Comments']
+    cleaned_df["Location"] = cleaned_df["Location"].replace('', pd.NA).fillna("No Location")
+    cleaned_df['Kid Camp Experience Rating'] = pd.to_numeric(cleaned_df['Kid Camp Experience Rating'], errors='coerce')
+    cleaned_df['Recommendation Likelihood'] = pd.to_numeric(cleaned_df['Recommendation Likelihood'], errors='coerce')
+    return cleaned_df
+
+def baseline_grouped_df(cleaned_mid):
+    """create_grouped_df before the typed schema."""
+    grouped_df = cleaned_mid.groupby('Location', as_index=False)[
+        ['Kid Camp Experience Rating', 'Recommendation Likelihood']
+    ].mean().round(2)
+    grouped_df['Combined Mean'] = grouped_df[['Kid Camp Experience Rating', 'Recommendation Likelihood']].mean(axis=1).round(2)
+    return grouped_df.sort_values(by='Combined Mean', ascending=False)
+
+def load_responses():
+    values = synthetic.generate_spreadsheet(400, 6, seed=3)["df_midyear"]
+    # Fractional, out-of-range and unreadable ratings, as respondents sometimes type them
+    values[1][5], values[2][5], values[3][6], values[4][6], values[5][5] = "4.5", "3.25", "7.5", "1000", "four"
+    return google_services.records_to_dataframe(values)
+
+
+def test_cleaned_frame_follows_the_schema():
+    cleaned_df = data_cleaning.clean_data_midyear_endofession(load_responses())
+    data_cleaning.validate_cleaned_survey_schema(cleaned_df)
+    assert cleaned_df['Kid Camp Experience Rating'].dtype == 'Float64'
+
+def test_means_match_the_baseline_cleaning():
+    responses = load_responses()
+    expected = baseline_grouped_df(baseline_clean(responses)).set_index("Location").sort_index()
+    actual = data_processing.create_grouped_df(data_cleaning.clean_data_midyear_endofession(responses))
+    actual = actual.astype({"Location": object}).set_index("Location").sort_index()
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+def test_fractional_ratings_are_kept():
+    ratings = data_cleaning.to_rating(pd.Series(["4.5", 3, "", "x", 1000]))
+    assert ratings.tolist()[:2] == [4.5, 3.0]
+    assert ratings.isna().tolist() == [False, False, True, True, False]
+
+def test_numeric_locations_match_the_feedback_worksheet():
+    worksheets = synthetic.generate_spreadsheet(200, 3, seed=1)
+    for row in worksheets["df_midyear"][1:40]:
+        row[4] = "101"
+    worksheets["feedback_midyear"].append(["101", "Analysis of 101", "2024-06-01", "sha256:101"])
+    run.install_fakes(worksheets, 0, 0)
+
+    feedback, df_combined_mean, dic_comments = data_cleaning.load_and_prepare_data("feedback_midyear")
+    assert 101 in df_combined_mean["Location"].tolist() and 101 in dic_comments
+    assert feedback.loc[feedback["Location"] == 101, "Combined Mean"].notna().all()
+    assert data_processing.get_previous_analyses(feedback)[101] == ("sha256:101", "Analysis of 101")
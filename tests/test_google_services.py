@@ -0,0 +1,115 @@
+import pytest
+from utils import clients, google_services
+from benchmarks import fakes
+
+
+@pytest.fixture
+def spreadsheet():
+    """Registers a fake spreadsheet with one worksheet and records the batch updates sent to it."""
+    client = fakes.FakeGspreadClient({"sheet": {"feedback": [["Location", "Analysis"], ["A", "good"], ["B", "fine"]]}})
+    clients.reset_clients()
+    clients.set_client("gspread", client)
+    fake = client.spreadsheets["sheet"]
+    fake.sent_requests = []
+    batch_update = fake.batch_update
+
+    def record_batch_update(body):
+        fake.sent_requests.extend(body["requests"])
+        return batch_update(body)
+
+    fake.batch_update = record_batch_update
+    yield fake
+    clients.reset_clients()
+
+
+def test_changed_cell_runs_of_unchanged_values_are_empty():
+    values = [["Location", "Rating"], ["A", 4.5], ["B", ""]]
+    assert google_services.get_changed_cell_runs([["Location", "Rating"], ["A", "4.5"], ["B"]], values) == []
+
+def test_changed_cell_runs_blank_the_tail_of_shrinking_values():
+    current = [["Location", "Analysis", "Date"], ["A", "good", "2024"], ["B", "fine", "2024"]]
+    new = [["Location", "Analysis"], ["A", "better"]]
+    assert google_services.get_changed_cell_runs(current, new) == [
+        (0, 2, [None]), (1, 1, ["better", None]), (2, 0, [None, None, None])
+    ]
+
+def test_changed_cell_runs_append_the_rows_of_growing_values():
+    current = [["Location"], ["A"]]
+    new = [["Location"], ["A"], ["B"], ["C"]]
+    assert google_services.get_changed_cell_runs(current, new) == [(2, 0, ["B"]), (3, 0, ["C"])]
+
+def test_changed_cell_runs_split_on_unchanged_cells():
+    assert google_services.get_changed_cell_runs([["a", "b", "c", "d"]], [["x", "b", "y", "z"]]) == [
+        (0, 0, ["x"]), (0, 2, ["y", "z"])
+    ]
+
+def test_unchanged_write_sends_no_cells(spreadsheet):
+    written = google_services.write_worksheet_values(
+        "sheet", "feedback", [["Location", "Analysis"], ["A", "good"], ["B", "fine"]]
+    )
+    assert written == 0
+    assert spreadsheet.sent_requests == []
+    assert "batch_update" not in spreadsheet.counter.calls
+
+def test_shrinking_write_blanks_the_tail(spreadsheet):
+    google_services.write_worksheet_values("sheet", "feedback", [["Location", "Analysis"], ["A", "better"]])
+    assert spreadsheet.get_range("'feedback'") == [["Location", "Analysis"], ["A", "better"]]
+    assert not any("appendDimension" in request for request in spreadsheet.sent_requests)
+
+def test_growing_write_appends_rows_and_grows_the_grid(spreadsheet):
+    values = [["Location", "Analysis"]] + [[f"L{index}", "ok"] for index in range(1200)]
+    google_services.write_worksheet_values("sheet", "feedback", values)
+    assert spreadsheet.get_range("'feedback'") == values
+    # The fake grid has 1000 rows, the header and 1200 locations need 201 more
+    assert {"appendDimension": {"sheetId": 0, "dimension": "ROWS", "length": 201}} in spreadsheet.sent_requests
+
+def test_write_keeps_numbers_as_numbers(spreadsheet):
+    google_services.write_worksheet_values("sheet", "feedback", [["Location", "Rating"], ["A", 4.5]])
+    cells = [request["updateCells"]["rows"][0]["values"] for request in spreadsheet.sent_requests]
+    assert [{"userEnteredValue": {"stringValue": "Rating"}}] in cells
+    assert [{"userEnteredValue": {"numberValue": 4.5}}] in cells
+
+
+@pytest.fixture
+def cached_client(monkeypatch):
+    """Registers a fake spreadsheet holding every worksheet, with an empty snapshot cache."""
+    worksheets = {f"Tab {index}": [["Location", "Rating"], ["A", index]] for index in range(len(google_services.WORKSHEETS))}
+    client = fakes.FakeGspreadClient({"sheet": worksheets})
+    clients.reset_clients()
+    clients.set_client("gspread", client)
+    google_services.invalidate_sheets_cache()
+    yield client
+    google_services.invalidate_sheets_cache()
+    clients.reset_clients()
+
+
+def test_worksheets_are_served_from_the_cache_until_they_expire(cached_client, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(google_services.time, "monotonic", lambda: now[0])
+
+    first = google_services.load_worksheets("sheet", ["df_midyear"], ttl=60)
+    assert google_services.load_worksheets("sheet", ["df_midyear"], ttl=60)["df_midyear"] is first["df_midyear"]
+    assert cached_client.counter.calls["values_batch_get"] == 1
+
+    now[0] += 61
+    google_services.load_worksheets("sheet", ["df_midyear"], ttl=60)
+    assert cached_client.counter.calls["values_batch_get"] == 2
+
+def test_invalidating_a_worksheet_refetches_only_that_worksheet(cached_client):
+    google_services.load_worksheets("sheet", ["df_midyear", "feedback_midyear"])
+    cached_client.spreadsheets["sheet"].values["Tab 0"][1][1] = 9
+
+    google_services.invalidate_sheets_cache("sheet", "df_midyear")
+    dataframes = google_services.load_worksheets("sheet", ["df_midyear", "feedback_midyear"])
+    assert dataframes["df_midyear"]["Rating"].tolist() == [9]
+    assert cached_client.counter.calls["values_batch_get"] == 2
+    assert google_services.get_sheets_cache_stats()["cached_worksheets"] == 2
+
+def test_invalidating_a_file_resolves_renamed_tabs_again(cached_client):
+    google_services.load_worksheets("sheet", ["df_midyear"])
+    fake = cached_client.spreadsheets["sheet"]
+    fake.values = {("Renamed" if title == "Tab 0" else title): rows for title, rows in fake.values.items()}
+
+    google_services.invalidate_sheets_cache("sheet")
+    assert google_services.load_worksheets("sheet", ["df_midyear"])["df_midyear"]["Rating"].tolist() == [0]
+    assert cached_client.counter.calls["worksheets"] == 2
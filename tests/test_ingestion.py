@@ -0,0 +1,58 @@
+import pandas as pd
+from utils import data_cleaning, data_processing, google_services, ingestion
+from benchmarks import run, synthetic
+
+
+def load_responses(rows=500, locations=8, seed=0):
+    worksheets = synthetic.generate_spreadsheet(rows, locations, seed=seed)
+    return google_services.records_to_dataframe(worksheets["df_midyear"])
+
+
+def test_aggregator_totals_equal_the_full_groupby():
+    responses = load_responses()
+    aggregator = ingestion.LocationAggregator()
+    for start in range(0, len(responses), 137):
+        aggregator.update(data_cleaning.clean_data_midyear_endofession(responses.iloc[start:start + 137]))
+
+    cleaned_df = data_cleaning.clean_data_midyear_endofession(responses)
+    expected = data_processing.create_grouped_df(cleaned_df)
+    actual = aggregator.grouped_df()
+    pd.testing.assert_frame_equal(
+        actual.set_index("Location").sort_index(),
+        expected.astype({"Location": str}).set_index("Location").sort_index()
+    )
+    assert aggregator.comments_dict() == dict(data_processing.create_comments_dict(cleaned_df))
+
+def test_comments_dict_is_a_snapshot():
+    aggregator = ingestion.LocationAggregator()
+    responses = load_responses(rows=50)
+    aggregator.update(data_cleaning.clean_data_midyear_endofession(responses.iloc[:25]))
+    snapshot = aggregator.comments_dict()
+    counts = {location: len(comments) for location, comments in snapshot.items()}
+    aggregator.update(data_cleaning.clean_data_midyear_endofession(responses.iloc[25:]))
+    assert {location: len(comments) for location, comments in snapshot.items()} == counts
+
+def test_raw_and_aggregated_ingestion_of_the_same_worksheet():
+    worksheets = synthetic.generate_spreadsheet(120, 4)
+    run.install_fakes(worksheets, 0, 0)
+    rows = ingestion.ingest_raw_worksheet("edmo_dashboard", "df_midyear", ttl=0)
+    df_combined_mean, dic_comments = ingestion.ingest_survey_worksheet("edmo_dashboard", "df_midyear", ttl=0)
+    assert len(rows) == 120
+    cleaned_df = data_cleaning.clean_data_midyear_endofession(rows)
+    assert dic_comments == dict(data_processing.create_comments_dict(cleaned_df))
+    assert len(ingestion.ingest_raw_worksheet("edmo_dashboard", "df_midyear", ttl=0)) == 120
+
+def test_ingestion_only_reads_new_rows():
+    worksheets = synthetic.generate_spreadsheet(100, 4)
+    gspread_client, _ = run.install_fakes(worksheets, 0, 0)
+    ingestion.ingest_survey_worksheet("edmo_dashboard", "df_midyear", ttl=0)
+    title = list(gspread_client.spreadsheets["edmo_dashboard"].values)[0]
+    gspread_client.spreadsheets["edmo_dashboard"].values[title].extend(worksheets["df_midyear"][1:11])
+    df_combined_mean, _ = ingestion.ingest_survey_worksheet("edmo_dashboard", "df_midyear", ttl=0)
+
+    responses = google_services.records_to_dataframe(gspread_client.spreadsheets["edmo_dashboard"].values[title])
+    expected = data_processing.create_grouped_df(data_cleaning.clean_data_midyear_endofession(responses))
+    pd.testing.assert_frame_equal(
+        df_combined_mean.set_index("Location").sort_index(),
+        expected.astype({"Location": object}).set_index("Location").sort_index()
+    )
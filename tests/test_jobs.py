@@ -0,0 +1,77 @@
+import time
+import threading
+from tests.test_openai_functions import install_slow_openai
+from utils import clients, jobs
+
+
+def wait_until_finished(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while job.status not in jobs.JOB_FINAL_STATUSES:
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+    return job.snapshot()
+
+def test_job_runs_to_success_and_is_shared_while_active():
+    release = threading.Event()
+
+    def target(job, value):
+        job.set_progress("Location A", "partial")
+        release.wait(5)
+        return value * 2
+
+    job = jobs.enqueue_job("test-shared", target, locations=["Location A"], value=21)
+    assert jobs.enqueue_job("test-shared", target, value=0) is job
+    assert jobs.get_active_job("test-shared") is job
+
+    release.set()
+    snapshot = wait_until_finished(job)
+    assert snapshot["status"] == "succeeded"
+    assert snapshot["result"] == 42
+    assert snapshot["progress"] == {"Location A": "partial"}
+    assert jobs.get_active_job("test-shared") is None
+    assert jobs.enqueue_job("test-shared", target, value=1) is not job
+
+def test_failed_job_records_the_error():
+    def target(job):
+        raise ValueError("sheet not found")
+
+    snapshot = wait_until_finished(jobs.enqueue_job("test-failed", target))
+    assert snapshot["status"] == "failed"
+    assert snapshot["error"] == "sheet not found"
+
+def test_cancelled_job_stops_at_its_next_check():
+    started = threading.Event()
+
+    def target(job):
+        started.set()
+        job.cancel_event.wait(5)
+        return None
+
+    job = jobs.enqueue_job("test-cancelled", target)
+    assert started.wait(5)
+    assert jobs.cancel_job(job.id)
+    assert wait_until_finished(job)["status"] == "cancelled"
+    assert not jobs.cancel_job(job.id)
+
+def test_cancelling_a_location_update_stops_its_streams_without_writing(monkeypatch, tmp_path):
+    completions = install_slow_openai(monkeypatch, tmp_path)
+    writes = []
+    monkeypatch.setattr(jobs.google_services, "send_to_google_sheet", lambda **kwargs: writes.append(kwargs))
+    dic_comments = {f"Location {index}": [f"Comment {index}"] for index in range(4)}
+
+    job = jobs.enqueue_job(
+        "test-locations", jobs.run_location_analysis_update, locations=list(dic_comments),
+        dic_comments=dic_comments, previous_analyses={}, sheet_name="edmo_dashboard", worksheet_name="feedback_midyear"
+    )
+    deadline = time.monotonic() + 5
+    while not any(job.snapshot()["progress"].values()):
+        assert time.monotonic() < deadline, "no progress"
+        time.sleep(0.01)
+    started = time.monotonic()
+    jobs.cancel_job(job.id)
+
+    assert wait_until_finished(job)["status"] == "cancelled"
+    assert time.monotonic() - started < 1
+    assert completions.started and len(completions.closed) == len(completions.started)
+    assert writes == []
+    clients.reset_clients()
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+import pytest
+from utils import llm_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the clock of the cache with one set by the test."""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+def make_cache(tmp_path, **options):
+    return llm_cache.LLMCache(str(tmp_path / "llm.sqlite3"), **options)
+
+
+def test_key_depends_on_the_model_messages_and_parameters():
+    messages = [{"role": "user", "content": "Summarize"}]
+    key = llm_cache.LLMCache.make_key("gpt-4o-mini", messages)
+    assert key == llm_cache.LLMCache.make_key("gpt-4o-mini", [dict(message) for message in messages], {})
+    assert key != llm_cache.LLMCache.make_key("gpt-4-turbo", messages)
+    assert key != llm_cache.LLMCache.make_key("gpt-4o-mini", messages, {"temperature": 0})
+
+def test_responses_survive_a_new_connection(tmp_path):
+    make_cache(tmp_path).set("key", "response")
+    cache = make_cache(tmp_path)
+    assert cache.get("key") == "response"
+    assert cache.get("missing") is None
+    assert cache.get_stats() == {"hits": 1, "misses": 1, "evictions": 0, "hit_rate": 0.5, "entries": 1}
+
+def test_least_recently_used_responses_are_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.set("a", "A")
+    clock.now += 1
+    cache.set("b", "B")
+    clock.now += 1
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == "A"
+    clock.now += 1
+    cache.set("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.get_stats()["evictions"] == 1
+
+def test_responses_expire_after_the_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=60)
+    cache.set("key", "response")
+    clock.now += 60
+    assert cache.get("key") == "response"
+    clock.now += 1
+    assert cache.get("key") is None
+
+def test_reads_do_not_extend_the_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=60)
+    cache.set("key", "response")
+    clock.now += 50
+    assert cache.get("key") == "response"
+    clock.now += 20
+    assert cache.get("key") is None
+
+def test_clear_removes_every_response(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("key", "response")
+    cache.clear()
+    assert cache.get("key") is None
+    assert cache.get_stats()["entries"] == 0
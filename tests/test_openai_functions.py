@@ -0,0 +1,72 @@
+import time
+import threading
+from types import SimpleNamespace
+from utils import clients, llm_cache, openai_functions
+
+
+def test_hash_comments_ignores_order_blanks_and_whitespace():
+    assert openai_functions.hash_comments(["Great staff", "More  snacks "]) == \
+        openai_functions.hash_comments(["", "More snacks", "  ", "Great   staff"])
+
+def test_hash_comments_changes_with_the_comments():
+    assert openai_functions.hash_comments(["Great staff"]) != openai_functions.hash_comments(["Great staff", "Late pick-up"])
+    assert openai_functions.hash_comments([]).startswith("sha256:")
+
+
+class SlowStreamCompletions:
+    """Streams a long answer one word at a time and records which responses were closed."""
+
+    def __init__(self, words=200, delay=0.01):
+        self.words = words
+        self.delay = delay
+        self.started = []
+        self.closed = []
+
+    def create(self, model, messages, stream=False, **params):
+        location = messages[-1]["content"]
+        self.started.append(location)
+
+        def chunks():
+            try:
+                for _ in range(self.words):
+                    time.sleep(self.delay)
+                    yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content="word "))])
+            finally:
+                self.closed.append(location)
+        return chunks()
+
+def install_slow_openai(monkeypatch, tmp_path):
+    completions = SlowStreamCompletions()
+    monkeypatch.setattr(llm_cache, "_llm_cache", llm_cache.LLMCache(str(tmp_path / "llm.sqlite3")))
+    clients.reset_clients()
+    clients.set_client("openai", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    return completions
+
+def test_stop_event_closes_streams_in_progress(monkeypatch, tmp_path):
+    completions = install_slow_openai(monkeypatch, tmp_path)
+    stop_event = threading.Event()
+    dic_comments = {f"Location {index}": [f"Comment {index}"] for index in range(4)}
+
+    started = time.perf_counter()
+    updates = 0
+    for _ in openai_functions.analyze_comment_stream(dic_comments, max_concurrency=2, stop_event=stop_event):
+        updates += 1
+        if updates == 5:
+            stop_event.set()
+
+    assert time.perf_counter() - started < 1
+    assert len(completions.started) == 2
+    assert len(completions.closed) == 2
+    # Stopped streams are not cached as complete answers
+    assert llm_cache.get_llm_cache().get_stats()["entries"] == 0
+
+def test_leaving_the_stream_early_stops_the_workers(monkeypatch, tmp_path):
+    completions = install_slow_openai(monkeypatch, tmp_path)
+    dic_comments = {f"Location {index}": [f"Comment {index}"] for index in range(4)}
+
+    started = time.perf_counter()
+    for _ in openai_functions.analyze_comment_stream(dic_comments, max_concurrency=2):
+        break
+
+    assert time.perf_counter() - started < 1
+    assert len(completions.started) == len(completions.closed) <= 2
@@ -0,0 +1,72 @@
+import threading
+from types import SimpleNamespace
+import pytest
+from utils import rate_limiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the clock of the rate limiter with one that only moves when it sleeps."""
+    clock = SimpleNamespace(now=0.0, slept=[])
+
+    def sleep(seconds):
+        clock.slept.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=lambda: clock.now, sleep=sleep))
+    return clock
+
+
+def test_bucket_serves_its_capacity_without_waiting(clock):
+    bucket = rate_limiter.TokenBucket(capacity=10, refill_per_second=1)
+    for _ in range(10):
+        bucket.acquire()
+    assert clock.slept == []
+
+def test_bucket_waits_for_the_refill_once_empty(clock):
+    bucket = rate_limiter.TokenBucket(capacity=10, refill_per_second=2)
+    bucket.acquire(10)
+    bucket.acquire(3)
+    assert clock.now == pytest.approx(1.5)
+
+def test_bucket_refills_up_to_its_capacity_only(clock):
+    bucket = rate_limiter.TokenBucket(capacity=10, refill_per_second=1)
+    bucket.acquire(10)
+    clock.now += 100
+    bucket.acquire(10)
+    bucket.acquire(1)
+    assert clock.now == pytest.approx(101)
+
+def test_amounts_above_the_capacity_are_capped(clock):
+    bucket = rate_limiter.TokenBucket(capacity=10, refill_per_second=1)
+    bucket.acquire(50)
+    assert clock.slept == []
+
+def test_limiter_waits_for_the_tokens_per_minute(clock):
+    limiter = rate_limiter.RateLimiter(requests_per_minute=600, tokens_per_minute=6000)
+    limiter.acquire(6000)
+    limiter.acquire(1000)
+    # 6000 tokens per minute refill 100 tokens per second
+    assert clock.now == pytest.approx(10)
+
+def test_limiter_waits_for_the_requests_per_minute(clock):
+    limiter = rate_limiter.RateLimiter(requests_per_minute=60, tokens_per_minute=1000000)
+    for _ in range(61):
+        limiter.acquire(1)
+    assert clock.now == pytest.approx(1)
+
+def test_concurrent_acquires_never_overdraw_the_bucket():
+    bucket = rate_limiter.TokenBucket(capacity=100, refill_per_second=0.001)
+    acquired = []
+
+    def take():
+        bucket.acquire(1)
+        acquired.append(1)
+
+    threads = [threading.Thread(target=take) for _ in range(100)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(acquired) == 100
+    assert bucket._tokens < 1
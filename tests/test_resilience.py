@@ -0,0 +1,90 @@
+import pytest
+from types import SimpleNamespace
+from utils import resilience, telemetry
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+class FlakyCall:
+    """Raises the given errors in turn, then returns 'ok'."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+@pytest.fixture(autouse=True)
+def no_waits(monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_INITIAL_WAIT_SECONDS", 0)
+    monkeypatch.setattr(resilience, "RETRY_MAX_WAIT_SECONDS", 0)
+    monkeypatch.setattr(resilience, "_circuit_breakers", {})
+
+def test_rate_limits_and_server_errors_are_retried_and_recorded_on_the_span():
+    call = FlakyCall(StatusError(429), StatusError(503))
+    with telemetry.span("test.call") as call_span:
+        assert resilience.call_with_retry("test", call) == "ok"
+
+    assert call.calls == 3
+    assert call_span.attributes["retries"] == 2
+    assert call_span.attributes["last_retry_error"] == "HTTP 503"
+
+def test_client_errors_are_not_retried():
+    call = FlakyCall(StatusError(400))
+    with pytest.raises(StatusError):
+        resilience.call_with_retry("test", call)
+    assert call.calls == 1
+
+def test_retries_stop_after_the_maximum_attempts():
+    call = FlakyCall(*[StatusError(429)] * resilience.RETRY_MAX_ATTEMPTS)
+    with pytest.raises(StatusError):
+        resilience.call_with_retry("test", call)
+    assert call.calls == resilience.RETRY_MAX_ATTEMPTS
+
+def test_retry_after_header():
+    assert resilience.get_retry_after(StatusError(429, {"retry-after-ms": "1500"})) == 1.5
+    assert resilience.get_retry_after(StatusError(429, {"retry-after": "2"})) == 2.0
+    assert resilience.get_retry_after(StatusError(429)) is None
+
+def test_circuit_opens_after_consecutive_failures_and_lets_one_trial_through(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    breaker = resilience.CircuitBreaker("test", failure_threshold=2, reset_seconds=10)
+
+    breaker.record_failure()
+    assert breaker.get_state() == "closed"
+    breaker.record_failure()
+    assert breaker.get_state() == "open"
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.before_call()
+
+    now[0] = 11
+    assert breaker.get_state() == "half-open"
+    breaker.before_call()
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.get_state() == "closed"
+
+def test_open_circuit_fails_fast_without_calling_the_service(monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(resilience, "_circuit_breakers", {"test": resilience.CircuitBreaker("test", failure_threshold=2)})
+    with telemetry.span("test.call") as call_span:
+        for _ in range(2):
+            with pytest.raises(StatusError):
+                resilience.call_with_retry("test", FlakyCall(StatusError(500)))
+    assert call_span.attributes["circuit_opened"] == "test"
+
+    call = FlakyCall()
+    with telemetry.span("test.call"):
+        with pytest.raises(resilience.CircuitOpenError):
+            resilience.call_with_retry("test", call)
+    assert call.calls == 0
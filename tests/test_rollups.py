@@ -0,0 +1,61 @@
+import pandas as pd
+from utils import data_cleaning, data_processing, google_services, rollups
+from benchmarks import synthetic
+
+
+def load_responses(rows=700, locations=6, seed=0):
+    worksheets = synthetic.generate_spreadsheet(rows, locations, seed=seed)
+    return google_services.records_to_dataframe(worksheets["df_midyear"])
+
+
+def test_whole_window_matches_create_grouped_df():
+    responses = load_responses()
+    trend = rollups.build_survey_rollups(responses).query(freq=None)
+    expected = data_processing.create_grouped_df(data_cleaning.clean_data_midyear_endofession(responses))
+    pd.testing.assert_series_equal(
+        trend.set_index("Location")["Combined Mean"].sort_index(),
+        expected.astype({"Location": str}).set_index("Location")["Combined Mean"].sort_index()
+    )
+
+def test_batch_updates_equal_a_full_build():
+    responses = load_responses()
+    survey_rollups = rollups.SurveyRollups()
+    for start in range(0, len(responses), 250):
+        batch = responses.iloc[start:start + 250]
+        survey_rollups.update(data_cleaning.clean_data_midyear_endofession(batch), data_cleaning.get_response_timestamps(batch))
+    pd.testing.assert_frame_equal(survey_rollups.table, rollups.build_survey_rollups(responses).table)
+
+def test_weekly_query_counts_every_dated_response_once():
+    responses = load_responses()
+    responses.iloc[:5, data_cleaning.SURVEY_TIMESTAMP_COLUMN] = ""
+    survey_rollups = rollups.build_survey_rollups(responses)
+    trend = survey_rollups.query(freq="W")
+    assert survey_rollups.undated == 5
+    assert trend["Responses"].sum() == len(responses) - 5
+    assert (trend["Period"].dt.dayofweek == 0).all()
+
+def test_window_bounds_are_inclusive():
+    survey_rollups = rollups.build_survey_rollups(load_responses())
+    trend = survey_rollups.query("2024-06-10", "2024-06-16", freq="D", locations=["Location 0001"])
+    assert trend["Period"].min() >= pd.Timestamp("2024-06-10")
+    assert trend["Period"].max() <= pd.Timestamp("2024-06-16")
+    assert set(trend["Location"]) == {"Location 0001"}
+
+def test_session_trend_splits_on_session_starts():
+    survey_rollups = rollups.build_survey_rollups(load_responses())
+    trend = survey_rollups.session_trend({"Session 2": "2024-07-01", "Session 1": "2024-06-03"})
+    assert trend["Period"].unique().tolist() == ["Session 1", "Session 2"]
+    assert trend["Responses"].sum() == survey_rollups.table["Responses"].sum()
+    assert survey_rollups.session_trend({}).empty
+
+def test_rollups_reuse_the_cleaning_of_the_aggregates():
+    responses = load_responses()
+    calls = []
+
+    def clean_function(df):
+        calls.append(len(df))
+        return data_cleaning.clean_data_midyear_endofession(df)
+
+    data_cleaning.aggregate_survey_responses(responses, clean_function)
+    rollups.get_survey_rollups(responses, clean_function)
+    assert calls == [len(responses)]
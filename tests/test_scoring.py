@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils import data_processing, google_services, scoring
+from benchmarks import synthetic
+
+
+def reference_scores(feedback_df, dimensions, response_encoding, satisfaction_indices):
+    """The scores as computed by the replace/apply loop scoring.py replaced."""
+    feedback_encoded = feedback_df.replace(response_encoding).apply(pd.to_numeric, errors='coerce')
+    dimension_means = {
+        dimension: feedback_encoded.iloc[:, details["indices"]].mean(axis=1).mean()
+        for dimension, details in dimensions.items()
+    }
+    satisfaction_scores = feedback_encoded.iloc[:, satisfaction_indices].astype("float64")
+    satisfaction_scores.iloc[:, 1] = satisfaction_scores.iloc[:, 1] / 2
+    return dimension_means, satisfaction_scores.mean(axis=1).mean()
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_scores_match_the_previous_loop(seed):
+    worksheets = synthetic.generate_spreadsheet(300, 5, seed=seed)
+    feedback_df = pd.concat([
+        google_services.records_to_dataframe(worksheets["df_endofyear_eng"]),
+        google_services.records_to_dataframe(worksheets["df_endofyear_spa"])
+    ], ignore_index=True)
+    response_encoding, dimensions, satisfaction_indices = data_processing.get_feedback_data()
+
+    scores = scoring.compute_endofyear_scores(feedback_df, dimensions, response_encoding, satisfaction_indices)
+    dimension_means, satisfaction_mean = reference_scores(feedback_df, dimensions, response_encoding, satisfaction_indices)
+
+    assert [dimension for dimension, _ in scores["dimension_scores"]] == \
+        sorted(dimension_means, key=dimension_means.get, reverse=True)
+    for dimension, score in scores["dimension_scores"]:
+        assert score == pytest.approx(dimension_means[dimension], abs=1e-12)
+    assert scores["satisfaction_score"] == pytest.approx(satisfaction_mean, abs=1e-12)
+
+def test_weighted_row_means_ignore_missing_answers():
+    encoded = np.array([[5.0, np.nan, 1.0], [np.nan, np.nan, np.nan]])
+    weights = np.array([[1.0, 1.0, 0.0], [1.0, 1.0, 2.0]])
+    means = scoring.weighted_row_means(encoded, weights)
+    assert means[0].tolist() == [5.0, pytest.approx(7 / 3)]
+    assert np.isnan(means[1]).all()
@@ -0,0 +1,19 @@
+import pandas as pd
+from utils import aggregate_cache, google_services, sheets_mirror
+
+
+def test_mirror_reads_the_same_frame_as_the_api(tmp_path):
+    dataframe = google_services.records_to_dataframe([
+        ["Location", "Rating", "Comment", "Score"],
+        ["A", 4, "fine", 1.5],
+        [12, "", 7, 2],
+        ["B", 5, "", 3]
+    ])
+    sheets_mirror.write_worksheets("sheet", {"df_midyear": dataframe}, str(tmp_path))
+    mirrored = sheets_mirror.read_worksheets("sheet", ["df_midyear"], str(tmp_path))["df_midyear"]
+
+    pd.testing.assert_frame_equal(mirrored, dataframe)
+    assert mirrored["Location"].tolist() == ["A", 12, "B"]
+    assert aggregate_cache.fingerprint_frame(mirrored) == aggregate_cache.fingerprint_frame(dataframe)
+    assert sheets_mirror.read_manifest("sheet", str(tmp_path))["worksheets"]["df_midyear"]["mixed_columns"] == \
+        ["Location", "Rating", "Comment"]
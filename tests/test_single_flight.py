@@ -0,0 +1,65 @@
+import threading
+import pytest
+from utils import single_flight
+
+
+@pytest.fixture(autouse=True)
+def lock_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(single_flight, "SINGLE_FLIGHT_LOCK_DIR", str(tmp_path))
+
+
+def test_completed_run_is_reused_while_fresh():
+    with single_flight.single_flight("fresh", fresh_for=60) as leader:
+        assert leader
+    with single_flight.single_flight("fresh", fresh_for=60) as leader:
+        assert not leader
+    with single_flight.single_flight("fresh", fresh_for=0) as leader:
+        assert leader
+
+def test_failed_run_does_not_count_as_completed():
+    with pytest.raises(RuntimeError):
+        with single_flight.single_flight("failing", fresh_for=60) as leader:
+            assert leader
+            raise RuntimeError("update failed")
+    with single_flight.single_flight("failing", fresh_for=60) as leader:
+        assert leader
+
+def test_other_sessions_wait_for_the_running_one():
+    started, finish = threading.Event(), threading.Event()
+    events = []
+
+    def lead():
+        with single_flight.single_flight("shared") as leader:
+            events.append(("leader", leader))
+            started.set()
+            finish.wait(5)
+            events.append(("leader done", leader))
+
+    def follow():
+        with single_flight.single_flight("shared", wait_timeout=5) as leader:
+            events.append(("follower", leader))
+
+    leader_thread = threading.Thread(target=lead)
+    leader_thread.start()
+    assert started.wait(5)
+    follower_thread = threading.Thread(target=follow)
+    follower_thread.start()
+    finish.set()
+    leader_thread.join()
+    follower_thread.join()
+
+    assert events == [("leader", True), ("leader done", True), ("follower", False)]
+
+def test_waiting_stops_at_the_timeout():
+    with single_flight.single_flight("busy") as leader:
+        assert leader
+        result = []
+
+        def follow():
+            with single_flight.single_flight("busy", wait_timeout=0) as follower_leads:
+                result.append(follower_leads)
+
+        follower = threading.Thread(target=follow)
+        follower.start()
+        follower.join(5)
+        assert result == [False]
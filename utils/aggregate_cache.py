@@ -0,0 +1,166 @@
+import sys
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+import pandas as pd
+
+# Maximum memory held by the cached aggregates, in bytes; the least recently used are evicted beyond it
+AGGREGATE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Maximum number of cached aggregates
+AGGREGATE_CACHE_MAX_ENTRIES = 64
+
+# Fingerprint of each live DataFrame, so an unchanged snapshot is hashed once: {id(df): (weakref, fingerprint)}
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+# Process-wide cache shared by every session, created on first use
+_aggregate_cache = None
+_aggregate_cache_lock = threading.Lock()
+
+
+def fingerprint_frame(df):
+    """
+    Computes a content fingerprint of a DataFrame: two frames with the same columns, dtypes, index
+    and values have the same fingerprint.
+
+    The fingerprint is remembered for as long as the DataFrame lives, so the snapshots served by
+    google_services.load_worksheets are hashed once, not on every rerun.
+
+    Parameters:
+    - df (pd.DataFrame): The frame to fingerprint.
+
+    Returns:
+    - str: A 128-bit hex digest.
+    """
+    with _fingerprints_lock:
+        cached = _fingerprints.get(id(df))
+    if cached is not None and cached[0]() is df:
+        return cached[1]
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((list(df.columns), [str(dtype) for dtype in df.dtypes], df.shape)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    fingerprint = digest.hexdigest()
+
+    key = id(df)
+    # The entry is dropped when the frame is garbage collected, before its id can be reused
+    reference = weakref.ref(df, lambda _, key=key: _fingerprints.pop(key, None))
+    with _fingerprints_lock:
+        _fingerprints[key] = (reference, fingerprint)
+    return fingerprint
+
+def estimate_size(value):
+    """
+    Estimates the memory used by a cached value.
+
+    Parameters:
+    - value: A DataFrame, Series, or a container of them and of plain Python objects.
+
+    Returns:
+    - int: The estimated size in bytes.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class AggregateCache:
+    """
+    In-memory LRU cache of derived data, bounded by total size and number of entries.
+
+    Keys identify the data a value was computed from, such as the fingerprint of its source frame,
+    so a value is reused for as long as that data does not change. Cached values are shared and
+    must not be modified.
+
+    Parameters:
+    - max_bytes (int): Maximum estimated size of all cached values.
+    - max_entries (int): Maximum number of cached values.
+    """
+
+    def __init__(self, max_bytes=AGGREGATE_CACHE_MAX_BYTES, max_entries=AGGREGATE_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "uncacheable": 0}
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value of a key, computing and caching it on a miss.
+
+        Concurrent misses of the same key may compute it more than once; the last result is kept.
+
+        Parameters:
+        - key (tuple): Hashable identity of the value and of the data it derives from.
+        - compute (callable): Computes the value.
+
+        Returns:
+        - The cached or computed value.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key][0]
+            self.stats["misses"] += 1
+
+        value = compute()
+        size = estimate_size(value)
+        with self._lock:
+            if size > self.max_bytes:
+                # Caching it would evict everything else
+                self.stats["uncacheable"] += 1
+                return value
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.stats["evictions"] += 1
+        return value
+
+    def clear(self):
+        """Drops every cached value."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self):
+        """
+        Returns the cache counters and its current size.
+
+        Returns:
+        - dict: 'hits', 'misses', 'evictions', 'uncacheable', 'entries', 'bytes' and 'hit_rate'.
+        """
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats, "entries": len(self._entries), "bytes": self._bytes,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None
+            }
+
+
+def get_aggregate_cache():
+    """
+    Returns the process-wide aggregate cache, creating it with AGGREGATE_CACHE_MAX_BYTES and
+    AGGREGATE_CACHE_MAX_ENTRIES on first use.
+
+    Returns:
+    - AggregateCache: The shared cache.
+    """
+    global _aggregate_cache
+    with _aggregate_cache_lock:
+        if _aggregate_cache is None:
+            _aggregate_cache = AggregateCache(AGGREGATE_CACHE_MAX_BYTES, AGGREGATE_CACHE_MAX_ENTRIES)
+        return _aggregate_cache
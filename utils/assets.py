@@ -0,0 +1,171 @@
+import io
+import os
+import base64
+import mimetypes
+import threading
+import requests
+import streamlit as st
+from PIL import Image
+
+# Root directory of the repository and of the images shipped with it
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGES_DIR = os.path.join(REPO_DIR, "images")
+
+# Images used by every page
+LOGO_PATH = os.path.join(IMAGES_DIR, "edmo_logo.png")
+BACKGROUND_PATH = os.path.join(IMAGES_DIR, "colorkit.png")
+
+# Largest width of an encoded image, in pixels. Wider images are scaled down, keeping their aspect ratio
+ASSET_MAX_WIDTH = 1920
+
+# Widths the logo is served at in the sidebar (twice the sidebar width, for high-density screens) and as the favicon
+LOGO_SIDEBAR_WIDTH = 600
+FAVICON_WIDTH = 64
+
+# Format and quality images are re-encoded in before being sent to the browser
+ASSET_FORMAT = "WEBP"
+ASSET_QUALITY = 80
+
+# Directory Streamlit serves at /app/static/ when `server.enableStaticServing` is set in .streamlit/config.toml.
+# Its files are generated, see .gitignore
+STATIC_DIR = os.path.join(REPO_DIR, "static")
+
+# Process-wide cache of loaded assets shared by every session: {key: value}. The lock is reentrant
+# since assets are built from other cached assets
+_assets = {}
+_assets_lock = threading.RLock()
+
+
+def get_cached(key, load):
+    """
+    Returns a cached asset, loading it on first use.
+
+    Parameters:
+    - key (tuple): The cache key of the asset.
+    - load (callable): Loads the asset when it is not cached.
+
+    Returns:
+    - The cached asset.
+    """
+    with _assets_lock:
+        if key not in _assets:
+            _assets[key] = load()
+        return _assets[key]
+
+def get_asset_bytes(image_path):
+    """
+    Returns the content of an image file or URL, read or downloaded once per process.
+
+    Parameters:
+    - image_path (str): Path of a local file, or an http(s) URL.
+
+    Returns:
+    - bytes: The content of the image.
+    """
+    def load():
+        if image_path.startswith(('http://', 'https://')):
+            response = requests.get(image_path, timeout=30)
+            response.raise_for_status()
+            return response.content
+        with open(image_path, "rb") as image_file:
+            return image_file.read()
+
+    return get_cached(("bytes", image_path), load)
+
+def encode_image(content, max_width=ASSET_MAX_WIDTH, image_format=ASSET_FORMAT, quality=ASSET_QUALITY):
+    """
+    Scales an image down to `max_width` and re-encodes it in a compressed format.
+
+    Parameters:
+    - content (bytes): The original image.
+    - max_width (int): Largest width in pixels, None to keep the original size.
+    - image_format (str): Pillow format name, such as "WEBP" or "PNG".
+    - quality (int): Encoding quality from 0 to 100.
+
+    Returns:
+    - tuple: The encoded image bytes and its MIME type.
+    """
+    with Image.open(io.BytesIO(content)) as image:
+        if max_width and image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format=image_format, quality=quality, method=6)
+    return output.getvalue(), Image.MIME[image_format.upper()]
+
+def get_encoded_image(image_path, max_width=ASSET_MAX_WIDTH):
+    """
+    Returns an image scaled down and re-encoded in ASSET_FORMAT, computed once per process.
+
+    The original image is returned when it cannot be re-encoded or when re-encoding does not make it smaller.
+
+    Parameters:
+    - image_path (str): Path of a local file, or an http(s) URL.
+    - max_width (int): Largest width in pixels, None to keep the original size.
+
+    Returns:
+    - tuple: The image bytes and its MIME type.
+    """
+    def load():
+        content = get_asset_bytes(image_path)
+        original_type = mimetypes.guess_type(image_path)[0] or "image/png"
+        try:
+            encoded, mime_type = encode_image(content, max_width)
+        except Exception as e:
+            print(f"Error encoding image '{image_path}', serving the original: {e}")
+            return content, original_type
+        return (encoded, mime_type) if len(encoded) < len(content) else (content, original_type)
+
+    return get_cached(("encoded", image_path, max_width), load)
+
+def get_image_data_uri(image_path, max_width=ASSET_MAX_WIDTH):
+    """
+    Returns an image as a base64 data URI, encoded once per process.
+
+    Parameters:
+    - image_path (str): Path of a local file, or an http(s) URL.
+    - max_width (int): Largest width in pixels, None to keep the original size.
+
+    Returns:
+    - str: The data URI of the scaled down and re-encoded image.
+    """
+    def load():
+        content, mime_type = get_encoded_image(image_path, max_width)
+        return f"data:{mime_type};base64,{base64.b64encode(content).decode()}"
+
+    return get_cached(("data_uri", image_path, max_width), load)
+
+def get_image_url(image_path, max_width=ASSET_MAX_WIDTH):
+    """
+    Returns the URL a page should reference an image with.
+
+    With Streamlit static serving enabled, the encoded image is written once to STATIC_DIR and
+    referenced by its absolute URL, so the browser downloads and caches it once. Otherwise the image is inlined
+    as a data URI.
+
+    Parameters:
+    - image_path (str): Path of a local file, or an http(s) URL.
+    - max_width (int): Largest width in pixels, None to keep the original size.
+
+    Returns:
+    - str: The static URL or the data URI of the image.
+    """
+    if not st.get_option("server.enableStaticServing"):
+        return get_image_data_uri(image_path, max_width)
+
+    def load():
+        content, mime_type = get_encoded_image(image_path, max_width)
+        name = os.path.splitext(os.path.basename(image_path))[0]
+        file_name = f"{name}-{max_width or 'full'}{mimetypes.guess_extension(mime_type) or ''}"
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        with open(os.path.join(STATIC_DIR, file_name), "wb") as static_file:
+            static_file.write(content)
+        # Absolute, so the URL also resolves from the pages served under /<page name>, below the
+        # server's base path if it has one
+        base_path = (st.get_option("server.baseUrlPath") or "").strip("/")
+        return f"{'/' + base_path if base_path else ''}/app/static/{file_name}"
+
+    try:
+        return get_cached(("static_url", image_path, max_width), load)
+    except OSError as e:
+        print(f"Error writing image '{image_path}' to the static directory, inlining it: {e}")
+        return get_image_data_uri(image_path, max_width)
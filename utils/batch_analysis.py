@@ -0,0 +1,257 @@
+"""
+Headless nightly analysis through the OpenAI Batch API.
+
+Collects every location analysis and end-of-year summary prompt into one JSONL job file, submits it
+to the batch endpoint, waits for the results and writes them back to the feedback worksheets.
+Run it from the repository root, for instance from cron:
+
+    python -m utils.batch_analysis
+"""
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+import pandas as pd
+from utils import chunking, clients, data_cleaning, data_processing, google_services, llm_cache, openai_functions, resilience
+
+# Directory where the JSONL job files are written
+BATCH_DIR = os.path.join(os.path.dirname(llm_cache.LLM_CACHE_PATH), "batch")
+
+# Number of seconds between two status checks of a submitted batch
+BATCH_POLL_INTERVAL_SECONDS = 60
+
+# Batch statuses after which the batch will not change anymore
+BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+# Feedback worksheets holding one analysis per location
+LOCATION_WORKSHEETS = ["feedback_midyear", "feedback_endofsession"]
+
+
+def build_batch_tasks(dataframes):
+    """
+    Collects the prompts of every analysis and summary whose comments changed since the last update.
+
+    Comment sets that exceed the token budget are not batched: they need several dependent
+    map-reduce calls and are left to `run_oversized_tasks`.
+
+    Parameters:
+    - dataframes (dict): Dictionary of DataFrames keyed by worksheet name, with every worksheet in google_services.WORKSHEETS.
+
+    Returns:
+    - dict: A dictionary with 'tasks' (prompts to batch) and 'oversized' (tasks to run outside the batch),
+      both keyed by custom id, plus 'results' (previous results reused as they are), 'comments'
+      (the comments behind every result) and 'previous' ((comments fingerprint, result) tuple from
+      the last update), all keyed by (worksheet, location or summary kind).
+    """
+    tasks, results, oversized, all_comments, all_previous = {}, {}, {}, {}, {}
+
+    for feedback_worksheet in LOCATION_WORKSHEETS:
+        response_worksheet = google_services.PAGE_WORKSHEETS[feedback_worksheet][0]
+        cleaned_df = data_cleaning.clean_data_midyear_endofession(dataframes[response_worksheet])
+        dic_comments = data_processing.create_comments_dict(cleaned_df)
+        previous_analyses = data_processing.get_previous_analyses(dataframes[feedback_worksheet])
+        all_previous.update({(feedback_worksheet, location): previous for location, previous in previous_analyses.items()})
+
+        for index, (location, comments) in enumerate(dic_comments.items()):
+            task = {"worksheet": feedback_worksheet, "key": location, "comments": comments, "model": "gpt-4-turbo"}
+            all_comments[(feedback_worksheet, location)] = comments
+            previous_hash, previous_analysis = previous_analyses.get(location, (None, None))
+            if previous_analysis and previous_hash == openai_functions.hash_comments(comments):
+                results[(feedback_worksheet, location)] = previous_analysis
+            elif len(chunking.chunk_comments(comments, model=task["model"])) > 1:
+                oversized[f"{feedback_worksheet}-{index}"] = task
+            else:
+                task["messages"] = openai_functions.build_analysis_messages(location, comments)
+                tasks[f"{feedback_worksheet}-{index}"] = task
+
+    # End-of-year summaries over the English and Spanish responses
+    feedback_df = pd.concat([dataframes["df_endofyear_eng"], dataframes["df_endofyear_spa"]], ignore_index=True)
+    feedback_dict = data_processing.get_feedback_lists_by_indices(
+        feedback_df, positive_feedback_index=23, improvement_feedback_index=24
+    )
+    previous = data_processing.load_feedback_summaries(dataframes["feedback_endofyear"])
+    for kind in ("positive", "improvement"):
+        all_previous[("feedback_endofyear", kind)] = (previous[f"{kind}_hash"], previous[f"{kind}_summary"])
+    for kind, build_messages in (("positive", openai_functions.build_positive_summary_messages),
+                                 ("improvement", openai_functions.build_improvement_summary_messages)):
+        comments = feedback_dict[f"{kind}_feedback"]
+        task = {"worksheet": "feedback_endofyear", "key": kind, "comments": comments, "model": "gpt-4o-mini"}
+        all_comments[("feedback_endofyear", kind)] = comments
+        if previous[f"{kind}_summary"] and previous[f"{kind}_hash"] == openai_functions.hash_comments(comments):
+            results[("feedback_endofyear", kind)] = previous[f"{kind}_summary"]
+        elif len(chunking.chunk_comments(comments, model=task["model"])) > 1:
+            oversized[f"feedback_endofyear-{kind}"] = task
+        else:
+            task["messages"] = build_messages(comments)
+            tasks[f"feedback_endofyear-{kind}"] = task
+
+    return {"tasks": tasks, "results": results, "oversized": oversized, "comments": all_comments, "previous": all_previous}
+
+def write_batch_file(tasks, path):
+    """
+    Writes the tasks as a Batch API JSONL input file.
+
+    Parameters:
+    - tasks (dict): Tasks keyed by custom id, as returned by build_batch_tasks.
+    - path (str): Path of the JSONL file to write.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as batch_file:
+        for custom_id, task in tasks.items():
+            request = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": task["model"], "messages": task["messages"]}
+            }
+            batch_file.write(json.dumps(request) + "\n")
+
+def submit_and_wait(path, poll_interval=None):
+    """
+    Submits a JSONL file to the batch endpoint and polls until the batch is finished.
+
+    Parameters:
+    - path (str): Path of the JSONL input file.
+    - poll_interval (float): Seconds between status checks. Defaults to BATCH_POLL_INTERVAL_SECONDS.
+
+    Returns:
+    - dict: The content of each successful response keyed by custom id.
+    """
+    poll_interval = BATCH_POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+    client = clients.get_openai_client()
+
+    with open(path, "rb") as batch_file:
+        input_file = resilience.call_with_retry("openai", client.files.create, file=batch_file, purpose="batch")
+    batch = resilience.call_with_retry(
+        "openai", client.batches.create,
+        input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window="24h"
+    )
+    print(f"Submitted batch {batch.id} from {path}")
+
+    while batch.status not in BATCH_FINAL_STATUSES:
+        time.sleep(poll_interval)
+        batch = resilience.call_with_retry("openai", client.batches.retrieve, batch.id)
+        print(f"Batch {batch.id} is {batch.status}")
+
+    if batch.status != "completed" or not batch.output_file_id:
+        print(f"Batch {batch.id} ended as {batch.status} without results")
+        return {}
+
+    contents = {}
+    for line in resilience.call_with_retry("openai", client.files.content, batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        output = json.loads(line)
+        response = output.get("response") or {}
+        if response.get("status_code") == 200:
+            contents[output["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+        else:
+            print(f"Error in batch request '{output['custom_id']}': {output.get('error') or response}")
+    return contents
+
+def run_oversized_tasks(oversized):
+    """
+    Runs the tasks too large for a single request through the chunked map-reduce path.
+
+    Parameters:
+    - oversized (dict): Tasks keyed by custom id, as returned by build_batch_tasks.
+
+    Returns:
+    - dict: The result of each task keyed by custom id.
+    """
+    contents = {}
+    for custom_id, task in oversized.items():
+        if task["worksheet"] == "feedback_endofyear":
+            summarize = openai_functions.summarize_positive_feedback if task["key"] == "positive" \
+                else openai_functions.summarize_improvement_feedback
+            contents[custom_id] = summarize(task["comments"])
+        else:
+            contents[custom_id] = openai_functions.analyze_comment({task["key"]: task["comments"]})[task["key"]]
+    return contents
+
+def write_results(batch_tasks, contents, sheet_name="edmo_dashboard"):
+    """
+    Writes the reused and newly generated results back to the feedback worksheets.
+
+    Results that failed keep their previous value when there is one, instead of an error placeholder.
+
+    Parameters:
+    - batch_tasks (dict): The output of build_batch_tasks.
+    - contents (dict): Generated results keyed by custom id.
+    - sheet_name (str): Name of the Google Sheets file.
+    """
+    results = dict(batch_tasks["results"])
+    for custom_id, task in {**batch_tasks["tasks"], **batch_tasks["oversized"]}.items():
+        if custom_id in contents:
+            results[(task["worksheet"], task["key"])] = contents[custom_id]
+            # Store batched answers in the LLM cache so the dashboard gets the same answer for the same prompt
+            if "messages" in task:
+                cache = llm_cache.get_llm_cache()
+                cache.set(cache.make_key(task["model"], task["messages"], {}), contents[custom_id])
+
+    for feedback_worksheet in LOCATION_WORKSHEETS:
+        dic_comments = {
+            location: comments for (worksheet, location), comments in batch_tasks["comments"].items()
+            if worksheet == feedback_worksheet
+        }
+        previous_analyses = {
+            location: previous for (worksheet, location), previous in batch_tasks["previous"].items()
+            if worksheet == feedback_worksheet
+        }
+        analysis_dict = {
+            location: openai_functions.keep_previous_on_error(
+                location,
+                results.get((feedback_worksheet, location), openai_functions.ANALYSIS_ERROR_MESSAGE),
+                previous_analyses
+            )
+            for location in dic_comments
+        }
+        google_services.send_to_google_sheet(
+            analysis_dict=analysis_dict,
+            sheet_name=sheet_name,
+            worksheet_name=feedback_worksheet,
+            comment_hashes=openai_functions.comment_hashes(dic_comments, analysis_dict, previous_analyses)
+        )
+
+    # Failed summaries keep the previous one, and neither gets a new fingerprint so they are generated again on the next run
+    summaries, hashes = {}, {}
+    for kind, error_message in (("positive", openai_functions.POSITIVE_SUMMARY_ERROR_MESSAGE),
+                                ("improvement", openai_functions.IMPROVEMENT_SUMMARY_ERROR_MESSAGE)):
+        previous_hash, previous_summary = batch_tasks["previous"][("feedback_endofyear", kind)]
+        summaries[kind] = results.get(("feedback_endofyear", kind), error_message)
+        if summaries[kind] == error_message and previous_summary:
+            summaries[kind] = previous_summary
+        hashes[kind] = openai_functions.summary_hash(
+            summaries[kind], batch_tasks["comments"][("feedback_endofyear", kind)], error_message,
+            previous_summary, previous_hash
+        )
+    google_services.send_feedback_to_google_sheet(
+        summaries["positive"], summaries["improvement"], sheet_name=sheet_name,
+        positive_hash=hashes["positive"], improvement_hash=hashes["improvement"]
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze EDMO feedback through the OpenAI Batch API.")
+    parser.add_argument("--sheet-name", default="edmo_dashboard", help="Name of the Google Sheets file.")
+    parser.add_argument("--poll-interval", type=float, default=None, help="Seconds between batch status checks.")
+    parser.add_argument("--dry-run", action="store_true", help="Only write the JSONL job file.")
+    args = parser.parse_args()
+
+    dataframes = google_services.load_worksheets(args.sheet_name, google_services.WORKSHEETS, ttl=0)
+    batch_tasks = build_batch_tasks(dataframes)
+    path = os.path.join(BATCH_DIR, f"feedback_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    write_batch_file(batch_tasks["tasks"], path)
+    print(f"{len(batch_tasks['tasks'])} batched prompts, {len(batch_tasks['oversized'])} oversized, "
+          f"{len(batch_tasks['results'])} unchanged results reused")
+
+    if args.dry_run:
+        return
+
+    contents = submit_and_wait(path, args.poll_interval) if batch_tasks["tasks"] else {}
+    contents.update(run_oversized_tasks(batch_tasks["oversized"]))
+    write_results(batch_tasks, contents, args.sheet_name)
+
+
+if __name__ == '__main__':
+    main()
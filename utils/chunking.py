@@ -0,0 +1,99 @@
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate when tiktoken is not installed
+    tiktoken = None
+
+# Maximum number of comment tokens sent in a single request before the comments are split into chunks
+COMMENTS_TOKEN_BUDGET = 6000
+
+# Tokenizers loaded so far: {model: Encoding or None}
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(model):
+    """
+    Returns the local tokenizer of a model, loading it once per process.
+
+    Parameters:
+    - model (str): The OpenAI model name.
+
+    Returns:
+    - tiktoken.Encoding: The tokenizer, or None if tiktoken or its encoding files are unavailable.
+    """
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model) if tiktoken else None
+            except Exception as e:
+                print(f"Could not load the tokenizer for '{model}', estimating tokens instead: {e}")
+                _encodings[model] = None
+        return _encodings[model]
+
+def count_tokens(text, model="gpt-4o-mini"):
+    """
+    Counts the tokens of a text with the model's tokenizer, or estimates about four characters per token.
+
+    Parameters:
+    - text (str): The text to count.
+    - model (str): The OpenAI model name.
+
+    Returns:
+    - int: The number of tokens.
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text, max_tokens, model="gpt-4o-mini"):
+    """
+    Shortens a text to at most a number of tokens.
+
+    Parameters:
+    - text (str): The text to shorten.
+    - max_tokens (int): Maximum number of tokens to keep.
+    - model (str): The OpenAI model whose tokenizer counts the tokens.
+
+    Returns:
+    - str: The text, cut after `max_tokens` tokens when it is longer.
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = get_encoding(model)
+    if encoding is None:
+        # Matches the estimate of count_tokens
+        return text[:max(max_tokens - 1, 0) * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+def chunk_comments(comments, token_budget=None, model="gpt-4o-mini"):
+    """
+    Splits comments into consecutive batches that each fit within a token budget.
+
+    A single comment larger than the budget gets a batch of its own.
+
+    Parameters:
+    - comments (list): The comments to split.
+    - token_budget (int): Maximum number of tokens per batch. Defaults to COMMENTS_TOKEN_BUDGET.
+    - model (str): The OpenAI model whose tokenizer counts the tokens.
+
+    Returns:
+    - list: A list of comment lists, one per batch. Empty when there are no comments.
+    """
+    token_budget = COMMENTS_TOKEN_BUDGET if token_budget is None else token_budget
+    chunks = []
+    current_chunk, current_tokens = [], 0
+
+    for comment in comments:
+        tokens = count_tokens(str(comment), model)
+        if current_chunk and current_tokens + tokens > token_budget:
+            chunks.append(current_chunk)
+            current_chunk, current_tokens = [], 0
+        current_chunk.append(comment)
+        current_tokens += tokens
+
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
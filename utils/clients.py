@@ -0,0 +1,93 @@
+import threading
+import gspread
+import streamlit as st
+from google.oauth2.service_account import Credentials
+from openai import OpenAI
+from utils import google_services, resilience
+
+# Process-wide clients shared by every session: {"gspread": Client, "openai": OpenAI}
+_clients = {}
+
+# Spreadsheets opened through the shared gspread client: {sheet_name: Spreadsheet}
+_spreadsheets = {}
+
+_clients_lock = threading.Lock()
+
+
+def get_gspread_client():
+    """
+    Returns the process-wide gspread client, authorizing it on first use.
+
+    The client keeps one pooled HTTP session and refreshes its access token by itself when it expires.
+
+    Returns:
+    - gspread.Client: The authorized client, or the fake registered with set_client.
+    """
+    with _clients_lock:
+        if "gspread" not in _clients:
+            scope, credentials_info = google_services.load_credentials()
+            creds = Credentials.from_service_account_info(credentials_info, scopes=scope)
+            _clients["gspread"] = gspread.authorize(creds)
+        return _clients["gspread"]
+
+def get_spreadsheet(sheet_name):
+    """
+    Returns a spreadsheet opened once per process with the shared gspread client.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+
+    Returns:
+    - gspread.Spreadsheet: The opened spreadsheet.
+    """
+    client = get_gspread_client()
+    with _clients_lock:
+        if sheet_name in _spreadsheets:
+            return _spreadsheets[sheet_name]
+
+    # Opened without holding the lock, since retries can take minutes and the lock also guards the
+    # OpenAI client. Sessions opening it at the same time keep the first one stored
+    spreadsheet = resilience.call_with_retry("sheets", client.open, sheet_name)
+    with _clients_lock:
+        if _clients.get("gspread") is not client:
+            # The client was replaced with set_client while opening, do not cache a spreadsheet of the old one
+            return spreadsheet
+        return _spreadsheets.setdefault(sheet_name, spreadsheet)
+
+def get_openai_client():
+    """
+    Returns the process-wide OpenAI client, creating it from the Streamlit secrets on first use.
+
+    An optional `base_url` in the `openai` secrets section points the client at another
+    OpenAI-compatible server, such as a local stub. The client's own retries are disabled, calls
+    are retried by resilience.call_with_retry instead.
+
+    Returns:
+    - OpenAI: The client, or the fake registered with set_client.
+    """
+    with _clients_lock:
+        if "openai" not in _clients:
+            _clients["openai"] = OpenAI(
+                api_key=st.secrets["openai"]['openai_key'], base_url=st.secrets["openai"].get("base_url"),
+                max_retries=0
+            )
+        return _clients["openai"]
+
+def set_client(name, client):
+    """
+    Registers the client to use for a backend, for instance a local fake in tests or benchmarks.
+
+    Parameters:
+    - name (str): The backend, either "gspread" or "openai".
+    - client: The client object to return from then on.
+    """
+    with _clients_lock:
+        _clients[name] = client
+        if name == "gspread":
+            _spreadsheets.clear()
+
+def reset_clients():
+    """Drops every shared client and opened spreadsheet so they are recreated on next use."""
+    with _clients_lock:
+        _clients.clear()
+        _spreadsheets.clear()
@@ -1,56 +1,261 @@
+import warnings
 import pandas as pd
+import openpyxl
 from collections import defaultdict
 import streamlit as st
-from utils import google_services,data_processing
+from utils import aggregate_cache,google_services,data_processing,ingestion,telemetry
+
+# Declared dtypes of the cleaned survey frame: locations as category codes, ratings as nullable
+# floats, so fractional ratings are averaged as they are, and comments as Arrow-backed strings
+CLEANED_SURVEY_SCHEMA = {
+    'Location': 'category',
+    'Kid Camp Experience Rating': 'Float64',
+    'Recommendation Likelihood': 'Float64',
+    'Additional Comments': 'string[pyarrow]'
+}
+
+# Column of the mid-year and end-of-session worksheets holding the time each response was submitted
+SURVEY_TIMESTAMP_COLUMN = 0
+
+
+def to_rating(column):
+    """
+    Converts a rating column to nullable floats, non-numeric values becoming missing.
+
+    Parameters:
+    - column (pd.Series): The raw rating column.
+
+    Returns:
+    - pd.Series: The ratings as Float64.
+    """
+    return pd.to_numeric(column, errors='coerce').astype('Float64')
+
+def validate_cleaned_survey_schema(cleaned_df):
+    """
+    Checks that a cleaned survey frame has exactly the columns and dtypes of CLEANED_SURVEY_SCHEMA.
+
+    Parameters:
+    - cleaned_df (pd.DataFrame): The cleaned survey frame.
+
+    Raises:
+    - ValueError: If a column is missing, unexpected or of another dtype.
+    """
+    if list(cleaned_df.columns) != list(CLEANED_SURVEY_SCHEMA):
+        raise ValueError(f"Cleaned survey columns {list(cleaned_df.columns)} do not match {list(CLEANED_SURVEY_SCHEMA)}")
+    for column, dtype in CLEANED_SURVEY_SCHEMA.items():
+        if cleaned_df[column].dtype != dtype:
+            raise ValueError(f"Column '{column}' is {cleaned_df[column].dtype}, expected {dtype}")
+
+def get_memory_usage_report(cleaned_df):
+    """
+    Compares the memory used by a cleaned survey frame with the same frame stored as Python objects and floats.
+
+    Parameters:
+    - cleaned_df (pd.DataFrame): The cleaned survey frame.
+
+    Returns:
+    - pd.DataFrame: Per column, and in total, the dtype, the bytes used, the bytes used without the
+      schema and the ratio between the two.
+    """
+    untyped_df = cleaned_df.astype({
+        column: 'float64' if dtype == 'Float64' else object for column, dtype in CLEANED_SURVEY_SCHEMA.items()
+    })
+    report = pd.DataFrame({
+        'dtype': cleaned_df.dtypes.astype(str),
+        'bytes': cleaned_df.memory_usage(index=False, deep=True),
+        'untyped_bytes': untyped_df.memory_usage(index=False, deep=True)
+    })
+    report.loc['Total'] = ['', report['bytes'].sum(), report['untyped_bytes'].sum()]
+    report['ratio'] = (report['bytes'] / report['untyped_bytes']).round(2)
+    return report
 
 # Function to clean and prepare data
+@telemetry.traced("pandas.clean_data_midyear_endofession")
 def clean_data_midyear_endofession(df):
     """
     Cleans the initial DataFrame by selecting relevant columns, renaming them,
     handling missing values, and converting specific columns to numeric.
 
+    The result follows CLEANED_SURVEY_SCHEMA.
+
     Parameters:
     - init_mid (DataFrame): The initial DataFrame containing survey data.
 
     Returns:
     - DataFrame: A cleaned DataFrame with necessary columns processed.
     """
-    # Select necessary columns and rename them
-    cleaned_df = df.iloc[:, 4:8]
-    cleaned_df.columns = ['Location', 'Kid Camp Experience Rating', 'Recommendation Likelihood', 'Additional Comments']
+    # Select necessary columns and build a new frame from them, so no column is assigned on a slice of `df`
+    survey_columns = df.iloc[:, 4:8]
+    cleaned_df = pd.DataFrame({
+        # Replace empty or NaN values in the "Location" column with "No Location Specified". Numeric
+        # locations stay numbers, like in the feedback worksheets they are joined with
+        'Location': survey_columns.iloc[:, 0].replace('', pd.NA).fillna("No Location").astype('category'),
+        # Convert 'Kid Camp Experience Rating' and 'Recommendation Likelihood' to numeric, handling non-numeric values
+        'Kid Camp Experience Rating': to_rating(survey_columns.iloc[:, 1]),
+        'Recommendation Likelihood': to_rating(survey_columns.iloc[:, 2]),
+        'Additional Comments': survey_columns.iloc[:, 3].astype('string[pyarrow]')
+    })
 
-    # Replace empty or NaN values in the "Location" column with "No Location Specified"
-    cleaned_df["Location"] = cleaned_df["Location"].replace('', pd.NA).fillna("No Location")
+    validate_cleaned_survey_schema(cleaned_df)
+    return cleaned_df
 
-    # Convert 'Kid Camp Experience Rating' and 'Recommendation Likelihood' to numeric, handling non-numeric values
-    cleaned_df['Kid Camp Experience Rating'] = pd.to_numeric(cleaned_df['Kid Camp Experience Rating'],
-                                                              errors='coerce')
-    cleaned_df['Recommendation Likelihood'] = pd.to_numeric(cleaned_df['Recommendation Likelihood'], errors='coerce')
 
-    return cleaned_df
+def get_response_timestamps(df):
+    """
+    Parses the submission time of each response of a mid-year or end-of-session worksheet.
+
+    Timestamps are parsed with the format inferred from the first one, and only those that do not
+    match it are parsed one by one.
+
+    Parameters:
+    - df (DataFrame): The survey data, with the timestamp in column SURVEY_TIMESTAMP_COLUMN.
+
+    Returns:
+    - pd.Series: datetime64 timestamps aligned with the rows of `df`, NaT where missing or unreadable.
+    """
+    raw = df.iloc[:, SURVEY_TIMESTAMP_COLUMN].astype("string").str.strip().replace("", pd.NA)
+    with warnings.catch_warnings():
+        # pandas warns when it cannot infer a single format, the fallback below handles it
+        warnings.simplefilter("ignore", UserWarning)
+        timestamps = pd.to_datetime(raw, errors="coerce")
+    unparsed = timestamps.isna() & raw.notna()
+    if unparsed.any():
+        timestamps[unparsed] = pd.to_datetime(raw[unparsed], format="mixed", errors="coerce")
+    return timestamps
+
+
+# Number of rows read, cleaned and aggregated at a time from survey exports
+SURVEY_EXPORT_CHUNK_ROWS = 10000
+
 
+def iter_survey_export(path, chunksize=SURVEY_EXPORT_CHUNK_ROWS, sheet_name=None):
+    """
+    Reads a CSV or XLSX survey export in fixed-size row batches, without loading the whole file.
+
+    Empty cells are returned as empty strings, like the rows read from Google Sheets.
+
+    Parameters:
+    - path (str): Path of the .csv or .xlsx export.
+    - chunksize (int): Number of rows per batch.
+    - sheet_name (str): Worksheet of an XLSX export. Defaults to the active worksheet.
+
+    Yields:
+    - pd.DataFrame: The next batch of raw rows, with the export's header as columns.
+    """
+    if path.lower().endswith(".csv"):
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False)
+        return
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name else workbook.active
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        batch = []
+        for row in rows:
+            batch.append(["" if value is None else value for value in row])
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+def clean_survey_export(path, chunksize=SURVEY_EXPORT_CHUNK_ROWS, sheet_name=None):
+    """
+    Cleans a mid-year or end-of-session survey export batch by batch.
+
+    Parameters:
+    - path (str): Path of the .csv or .xlsx export.
+    - chunksize (int): Number of rows per batch.
+    - sheet_name (str): Worksheet of an XLSX export. Defaults to the active worksheet.
+
+    Yields:
+    - pd.DataFrame: The next batch of rows cleaned by clean_data_midyear_endofession.
+    """
+    for chunk in iter_survey_export(path, chunksize, sheet_name):
+        yield clean_data_midyear_endofession(chunk)
+
+
+def clean_survey_responses(responses, clean_function=clean_data_midyear_endofession):
+    """
+    Cleans a response worksheet once per version of its content, so the per-location aggregates and
+    the per-day rollups of the same snapshot share a single cleaning pass. The returned frame is
+    shared and must not be modified.
+
+    Parameters:
+    - responses (pd.DataFrame): A response worksheet as returned by google_services.load_worksheets.
+    - clean_function (callable): Turns the worksheet into a frame following CLEANED_SURVEY_SCHEMA.
+
+    Returns:
+    - pd.DataFrame: The cleaned responses.
+    """
+    key = ("cleaned_survey", aggregate_cache.fingerprint_frame(responses), clean_function)
+    return aggregate_cache.get_aggregate_cache().get_or_compute(key, lambda: clean_function(responses))
+
+def aggregate_survey_responses(responses, clean_function=clean_data_midyear_endofession):
+    """
+    Cleans a response worksheet and computes the mean ratings and the comments of each location.
+
+    The aggregates are memoized in the process-wide aggregate cache under the content fingerprint
+    of the worksheet, so they are computed once per version of the data and shared by every page
+    and session reading it, even after the snapshot is downloaded again. The returned objects are
+    shared and must not be modified.
+
+    Parameters:
+    - responses (pd.DataFrame): A response worksheet as returned by google_services.load_worksheets.
+    - clean_function (callable): Turns the worksheet into a frame following CLEANED_SURVEY_SCHEMA.
 
-# Function to create a dictionary of comments per location
+    Returns:
+    - tuple: The DataFrame of mean ratings per location and the dictionary of comments per location.
+    """
+    def compute():
+        cleaned_df = clean_survey_responses(responses, clean_function)
+        return data_processing.create_grouped_df(cleaned_df), data_processing.create_comments_dict(cleaned_df)
+
+    key = ("survey_aggregates", aggregate_cache.fingerprint_frame(responses), clean_function)
+    return aggregate_cache.get_aggregate_cache().get_or_compute(key, compute)
 
-def load_and_prepare_data(worksheet_name, sheet_name="edmo_dashboard"):
+@telemetry.traced("data.load_and_prepare_data")
+def load_and_prepare_data(worksheet_name, sheet_name="edmo_dashboard", incremental=False, response_worksheet=None,
+                          clean_function=clean_data_midyear_endofession):
     """
     Load, clean, and process data for the selected worksheet.
+
+    The per-location aggregates are reused while the response worksheet's content is unchanged,
+    see aggregate_survey_responses. With `incremental`, the response worksheet is not downloaded
+    again: only the rows added since the last load are fetched and added to running per-location
+    aggregates, always cleaned with clean_data_midyear_endofession.
+
+    Parameters:
+    - worksheet_name (str): The feedback worksheet of the page, such as "feedback_midyear".
+    - sheet_name (str): The name of the Google Sheets file.
+    - incremental (bool): Only fetch the responses added since the last load.
+    - response_worksheet (str): The response worksheet. Defaults to the one google_services.PAGE_WORKSHEETS
+      gives for the mid-year and end-of-session feedback worksheets.
+    - clean_function (callable): Turns the response worksheet into a frame following CLEANED_SURVEY_SCHEMA.
+
+    Returns:
+    - tuple: The feedback DataFrame with each location's rating, the DataFrame of mean ratings and
+      the dictionary of comments per location. The first two are None if a 'Location' column is missing.
     """
-    # Load all dataframes
-    dataframes = google_services.load_google_sheets_data(sheet_name)
-    df_midyear, df_endofyear_eng, df_endofyear_spa, df_endofsession, feedback_midyear, feedback_endofyear, feedback_endofsession = dataframes
-
-    # Select the appropriate feedback and cleaning based on the worksheet selected
-    if worksheet_name == "feedback_midyear":
-        cleaned_df = clean_data_midyear_endofession(df_midyear)
-        df_combined_mean = data_processing.create_grouped_df(cleaned_df)
-        dic_comments = data_processing.create_comments_dict(cleaned_df)
-        feedback = feedback_midyear
-    elif worksheet_name == "feedback_endofsession":
-        cleaned_df = clean_data_midyear_endofession(df_endofsession)
-        df_combined_mean = data_processing.create_grouped_df(cleaned_df)
-        dic_comments = data_processing.create_comments_dict(cleaned_df)
-        feedback = feedback_endofsession
+    # Select the appropriate response worksheet and feedback based on the worksheet selected
+    if response_worksheet is None and worksheet_name in ("feedback_midyear", "feedback_endofsession"):
+        response_worksheet = google_services.PAGE_WORKSHEETS[worksheet_name][0]
+    if response_worksheet is not None:
+        feedback_worksheet = worksheet_name
+        if incremental:
+            df_combined_mean, dic_comments = ingestion.ingest_survey_worksheet(sheet_name, response_worksheet)
+            feedback = google_services.load_worksheets(sheet_name, [feedback_worksheet])[feedback_worksheet]
+        else:
+            # Load only the worksheets this page needs
+            dataframes = google_services.load_worksheets(sheet_name, [response_worksheet, feedback_worksheet])
+            df_combined_mean, dic_comments = aggregate_survey_responses(dataframes[response_worksheet], clean_function)
+            feedback = dataframes[feedback_worksheet]
     else:
         st.error("Invalid worksheet selection")
         return None, None, None
@@ -66,9 +271,14 @@ def load_and_prepare_data(worksheet_name, sheet_name="edmo_dashboard"):
         st.write("Columns in combined mean data:", df_combined_mean.columns)
         return None, None, dic_comments  # Returning None for feedback and df_combined_mean if 'Location' is missing
 
-    # Merge feedback with combined mean to add the rating for each location
-    feedback = feedback.merge(df_combined_mean[['Location', 'Combined Mean']], on='Location', how='left')
-    feedback = feedback.sort_values(by='Combined Mean', ascending=False)
+    # Merge feedback with combined mean to add the rating for each location, once per version of both frames
+    def merge_feedback_ratings():
+        with telemetry.span("pandas.merge_feedback_ratings", locations=len(feedback)):
+            merged = feedback.merge(df_combined_mean[['Location', 'Combined Mean']], on='Location', how='left')
+            return merged.sort_values(by='Combined Mean', ascending=False)
+
+    key = ("feedback_ratings", aggregate_cache.fingerprint_frame(feedback), aggregate_cache.fingerprint_frame(df_combined_mean))
+    feedback = aggregate_cache.get_aggregate_cache().get_or_compute(key, merge_feedback_ratings)
 
     return feedback, df_combined_mean, dic_comments
 
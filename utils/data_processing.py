@@ -2,7 +2,21 @@ from collections import defaultdict
 import pandas as pd
 from datetime import datetime
 import streamlit as st
-from utils import data_cleaning, google_services, openai_functions
+from utils import data_cleaning, google_services, openai_functions, telemetry
+
+def is_precomputed_only():
+    """
+    Tells whether the dashboards only display results precomputed by the nightly batch job
+    (`python -m utils.batch_analysis`), set with `precomputed_only = true` in the `dashboard` secrets section.
+
+    Returns:
+    - bool: True if the pages must not call OpenAI themselves. False when there is no secrets file.
+    """
+    try:
+        return bool(st.secrets.get("dashboard", {}).get("precomputed_only", False))
+    except (FileNotFoundError, KeyError):
+        # The flag is optional, so a missing secrets file or section leaves it off
+        return False
 
 def load_feedback_summary_column(dataframe, column_name, default_value=""):
     """
@@ -26,14 +40,38 @@ def load_feedback_summaries(dataframe):
     - dataframe (pd.DataFrame): The feedback_endofyear DataFrame.
 
     Returns:
-    - dict: Dictionary with keys 'positive_summary', 'improvement_summary', and 'last_update_date'.
+    - dict: Dictionary with keys 'positive_summary', 'improvement_summary', 'last_update_date',
+      'positive_hash' and 'improvement_hash'.
     """
     return {
         "positive_summary": load_feedback_summary_column(dataframe, "Positive Feedback Summary"),
         "improvement_summary": load_feedback_summary_column(dataframe, "Improvement Feedback Summary"),
-        "last_update_date": load_feedback_summary_column(dataframe, "Date Sent", "No previous updates")
+        "last_update_date": load_feedback_summary_column(dataframe, "Date Sent", "No previous updates"),
+        "positive_hash": load_feedback_summary_column(dataframe, "Positive Feedback Hash"),
+        "improvement_hash": load_feedback_summary_column(dataframe, "Improvement Feedback Hash")
+    }
+
+def get_previous_analyses(feedback):
+    """
+    Collects the stored analysis of each location along with the fingerprint of the comments it was made from.
+
+    Parameters:
+    - feedback (pd.DataFrame): Feedback DataFrame with 'Location', 'Analysis' and 'Comments Hash' columns.
+
+    Returns:
+    - dict: A dictionary mapping each location to a (comments fingerprint, analysis) tuple. The
+      fingerprint is empty for analyses stored without one.
+    """
+    if feedback is None or "Location" not in feedback.columns or "Analysis" not in feedback.columns:
+        return {}
+    comments_hashes = feedback["Comments Hash"] if "Comments Hash" in feedback.columns else [""] * len(feedback)
+    return {
+        location: (comments_hash, analysis)
+        for location, analysis, comments_hash in zip(feedback["Location"], feedback["Analysis"], comments_hashes)
+        if analysis
     }
 
+@telemetry.traced("pandas.create_comments_dict")
 def create_comments_dict(cleaned_mid):
     """
     Creates a dictionary to store comments for each location.
@@ -50,6 +88,7 @@ def create_comments_dict(cleaned_mid):
             dic_comments_mid[location].append(comment)
     return dic_comments_mid
 
+@telemetry.traced("pandas.create_grouped_df")
 def create_grouped_df(cleaned_mid):
     """
     Groups a DataFrame by 'Location' and calculates the mean ratings.
@@ -60,9 +99,10 @@ def create_grouped_df(cleaned_mid):
     Returns:
     - pd.DataFrame: Sorted DataFrame by 'Combined Mean'.
     """
-    grouped_df = cleaned_mid.groupby('Location', as_index=False)[
-        ['Kid Camp Experience Rating', 'Recommendation Likelihood']
-    ].mean().round(2)
+    # Ratings are nullable integers, average them as floats over the categorical location codes
+    grouped_df = cleaned_mid[['Kid Camp Experience Rating', 'Recommendation Likelihood']].astype('float64').groupby(
+        cleaned_mid['Location'], observed=True
+    ).mean().round(2).reset_index()
     grouped_df['Combined Mean'] = grouped_df[['Kid Camp Experience Rating', 'Recommendation Likelihood']].mean(axis=1).round(2)
     return grouped_df.sort_values(by='Combined Mean', ascending=False)
 
@@ -164,23 +204,48 @@ def get_feedback_lists_by_indices(df, positive_feedback_index, improvement_feedb
 
 
 
-def update_feedback_summaries_endofyear(dataframes):
+def update_feedback_summaries_endofyear(dataframes, job=None):
     """
     Updates feedback summaries with new OpenAI-generated summaries if necessary.
+    Summaries whose comments did not change since the last update are kept as they are.
 
     Parameters:
-    - dataframes (list): List of DataFrames with feedback data.
+    - dataframes (dict): Dictionary of DataFrames keyed by worksheet name, including the
+      'df_endofyear_eng' and 'df_endofyear_spa' responses and the 'feedback_endofyear' summaries.
+    - job (jobs.Job): The background job running the update, if any. Its cancellation is checked
+      between the summaries and before writing to Google Sheets.
 
     Returns:
-    - tuple: Updated positive and improvement summaries along with the timestamp.
+    - tuple: Updated positive and improvement summaries along with the timestamp, or None if the
+      job was cancelled before writing.
     """
-    feedback_df = pd.concat([dataframes[1], dataframes[2]], ignore_index=True)
+    feedback_df = pd.concat([dataframes["df_endofyear_eng"], dataframes["df_endofyear_spa"]], ignore_index=True)
     feedback_dict = get_feedback_lists_by_indices(
         feedback_df, positive_feedback_index=23, improvement_feedback_index=24
     )
-    positive_summary = openai_functions.summarize_positive_feedback(feedback_dict["positive_feedback"])
-    improvement_summary = openai_functions.summarize_improvement_feedback(feedback_dict["improvement_feedback"])
+    previous = load_feedback_summaries(dataframes["feedback_endofyear"])
+    positive_summary = openai_functions.summarize_positive_feedback(
+        feedback_dict["positive_feedback"], previous["positive_summary"], previous["positive_hash"]
+    )
+    if job is not None and job.is_cancelled():
+        return None
+    improvement_summary = openai_functions.summarize_improvement_feedback(
+        feedback_dict["improvement_feedback"], previous["improvement_summary"], previous["improvement_hash"]
+    )
 
-    google_services.send_feedback_to_google_sheet(positive_summary, improvement_summary)
-    st.success("Dashboard updated successfully with feedback summaries!")
+    # Failed and kept summaries are fingerprinted so they are generated again on the next update
+    positive_hash = openai_functions.summary_hash(
+        positive_summary, feedback_dict["positive_feedback"], openai_functions.POSITIVE_SUMMARY_ERROR_MESSAGE,
+        previous["positive_summary"], previous["positive_hash"]
+    )
+    improvement_hash = openai_functions.summary_hash(
+        improvement_summary, feedback_dict["improvement_feedback"], openai_functions.IMPROVEMENT_SUMMARY_ERROR_MESSAGE,
+        previous["improvement_summary"], previous["improvement_hash"]
+    )
+
+    if job is not None and job.is_cancelled():
+        return None
+    google_services.send_feedback_to_google_sheet(
+        positive_summary, improvement_summary, positive_hash=positive_hash, improvement_hash=improvement_hash
+    )
     return positive_summary, improvement_summary, datetime.now().strftime("%Y-%m-%d %H:%M:%S")
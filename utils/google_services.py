@@ -1,8 +1,51 @@
+import os
+import time
+import threading
+from contextlib import ExitStack
 import pandas as pd
 import gspread
 import streamlit as st
-from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
+from utils import clients, resilience, sheets_mirror, telemetry
+
+# Number of seconds a downloaded worksheet is served from memory before it is refetched
+SHEETS_CACHE_TTL_SECONDS = 300
+
+# Read worksheets from the local Parquet mirror (`python -m utils.sheets_mirror`) instead of the Sheets API
+USE_SHEETS_MIRROR = False
+
+# Root directory of the local Parquet mirrors
+SHEETS_MIRROR_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "sheets_mirror")
+
+# Worksheets of the dashboard spreadsheet, in tab order
+WORKSHEETS = [
+    "df_midyear", "df_endofyear_eng", "df_endofyear_spa", "df_endofsession",
+    "feedback_midyear", "feedback_endofyear", "feedback_endofsession"
+]
+
+# Worksheets each page reads, keyed by the page's feedback worksheet
+PAGE_WORKSHEETS = {
+    "feedback_midyear": ["df_midyear", "feedback_midyear"],
+    "feedback_endofsession": ["df_endofsession", "feedback_endofsession"],
+    "feedback_endofyear": ["df_endofyear_eng", "df_endofyear_spa", "feedback_endofyear"]
+}
+
+# Process-wide snapshot cache shared by every session and page: {(sheet_name, worksheet): (fetched_at, dataframe)}
+_snapshot_cache = {}
+_snapshot_cache_lock = threading.Lock()
+_snapshot_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+# Lock held while a worksheet is being downloaded, so concurrent sessions wait for a single download
+# without blocking the cache: {(sheet_name, worksheet): Lock}. Guarded by _snapshot_cache_lock
+_snapshot_fetch_locks = {}
+
+# Number of invalidations of each worksheet: {(sheet_name, worksheet): count}. A download that overlaps
+# an invalidation of its worksheet is served but not cached, since it may predate the write that caused
+# it. Guarded by _snapshot_cache_lock
+_snapshot_cache_generations = {}
+
+# Tab titles of each spreadsheet, resolved once until the whole file is invalidated: {sheet_name: [title, ...]}
+_worksheet_titles = {}
 
 
 def load_credentials():
@@ -25,30 +68,296 @@ def load_credentials():
     }
 
     return [scope,credentials_info]
-def load_google_sheets_data(sheet_name):
+
+@telemetry.traced("sheets.load_google_sheets_data")
+def load_google_sheets_data(sheet_name, ttl=None):
     """
     Load data from Google Sheets and return DataFrames for each sheet.
 
     Parameters:
     - sheet_name (str): The name of the Google Sheets file.
+    - ttl (float): Maximum age in seconds of a cached worksheet. Defaults to SHEETS_CACHE_TTL_SECONDS.
 
     Returns:
     - List of DataFrames for each sheet within the Google Sheets file.
     """
-    # Load credentials
-    scope,credentials_info = load_credentials()
+    dataframes = load_worksheets(sheet_name, WORKSHEETS, ttl=ttl)
+    return [dataframes[worksheet] for worksheet in WORKSHEETS]
+
+def load_worksheets(sheet_name, worksheet_names, ttl=None):
+    """
+    Load only the requested worksheets of a Google Sheets file.
+
+    Worksheets are served from a process-wide snapshot cache while they are younger than `ttl`
+    seconds, so reruns and other sessions do not download them again. All the worksheets missing
+    from the cache are downloaded together in a single request, or read from the local Parquet
+    mirror when USE_SHEETS_MIRROR is set.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_names (list): Worksheets to load, as named in WORKSHEETS (see PAGE_WORKSHEETS for each page).
+    - ttl (float): Maximum age in seconds of a cached worksheet. Defaults to SHEETS_CACHE_TTL_SECONDS.
+
+    Returns:
+    - dict: A dictionary mapping each requested worksheet name to its DataFrame.
+    """
+    ttl = SHEETS_CACHE_TTL_SECONDS if ttl is None else ttl
+
+    with telemetry.span("sheets.load_worksheets", worksheets=len(worksheet_names)) as load_span:
+        dataframes, missing = get_cached_worksheets(sheet_name, worksheet_names, ttl, count_stats=True)
+        load_span.set_attributes(cache_misses=len(missing))
+        if not missing:
+            return dataframes
 
-    # Authorize the client
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials_info, scope)
-    client = gspread.authorize(creds)
+        # The cache lock is only held to look up and store snapshots. The download itself holds the
+        # fetch lock of each missing worksheet, taken in a fixed order so sessions cannot deadlock
+        with ExitStack() as fetch_locks:
+            with _snapshot_cache_lock:
+                locks = [_snapshot_fetch_locks.setdefault((sheet_name, worksheet), threading.Lock())
+                         for worksheet in sorted(missing)]
+            for lock in locks:
+                fetch_locks.enter_context(lock)
 
-    # Access each sheet and convert to DataFrames
-    spreadsheet = client.open(sheet_name)
-    dataframes = [pd.DataFrame(spreadsheet.get_worksheet(i).get_all_records()) for i in range(7)]
+            # Another session may have downloaded some of them while this one was waiting
+            fetched_meanwhile, missing = get_cached_worksheets(sheet_name, missing, ttl)
+            dataframes.update(fetched_meanwhile)
+            if missing:
+                with _snapshot_cache_lock:
+                    generations = {worksheet: _snapshot_cache_generations.get((sheet_name, worksheet), 0)
+                                   for worksheet in missing}
+                if USE_SHEETS_MIRROR:
+                    fetched = sheets_mirror.read_worksheets(sheet_name, missing, SHEETS_MIRROR_DIR)
+                else:
+                    fetched = fetch_worksheets(sheet_name, missing)
+                with _snapshot_cache_lock:
+                    for worksheet, dataframe in fetched.items():
+                        if generations[worksheet] == _snapshot_cache_generations.get((sheet_name, worksheet), 0):
+                            _snapshot_cache[(sheet_name, worksheet)] = (time.monotonic(), dataframe)
+                dataframes.update(fetched)
 
     return dataframes
 
-def send_to_google_sheet(analysis_dict, sheet_name="edmo_dashboard", worksheet_name="feedback_midyear"):
+def get_cached_worksheets(sheet_name, worksheet_names, ttl, count_stats=False):
+    """
+    Looks worksheets up in the snapshot cache.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_names (list): Worksheets to look up, as named in WORKSHEETS.
+    - ttl (float): Maximum age in seconds of a cached worksheet.
+    - count_stats (bool): Whether to count the lookups in the cache hits and misses.
+
+    Returns:
+    - tuple: The DataFrame of each cached worksheet keyed by worksheet name, and the list of the
+      worksheets that are missing or expired.
+    """
+    dataframes, missing = {}, []
+    with _snapshot_cache_lock:
+        for worksheet in worksheet_names:
+            cached = _snapshot_cache.get((sheet_name, worksheet))
+            if cached is not None and time.monotonic() - cached[0] < ttl:
+                dataframes[worksheet] = cached[1]
+            else:
+                missing.append(worksheet)
+        if count_stats:
+            _snapshot_cache_stats["hits"] += len(dataframes)
+            _snapshot_cache_stats["misses"] += len(missing)
+    return dataframes, missing
+
+def fetch_worksheets(sheet_name, worksheet_names):
+    """
+    Download worksheets of a Google Sheets file in one batch request, bypassing the snapshot cache.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_names (list): Worksheets to download, as named in WORKSHEETS.
+
+    Returns:
+    - dict: A dictionary mapping each worksheet name to its DataFrame.
+    """
+    # Reuse the process-wide authorized client and opened spreadsheet
+    spreadsheet = clients.get_spreadsheet(sheet_name)
+
+    ranges = [gspread.utils.absolute_range_name(get_worksheet_title(sheet_name, name)) for name in worksheet_names]
+    with telemetry.span("sheets.values_batch_get", worksheets=len(ranges)) as request_span:
+        response = resilience.call_with_retry("sheets", spreadsheet.values_batch_get, ranges)
+        request_span.set_attributes(rows=sum(len(value_range.get("values", [])) for value_range in response["valueRanges"]))
+
+    with telemetry.span("pandas.records_to_dataframe"):
+        return {
+            name: records_to_dataframe(value_range.get("values", []))
+            for name, value_range in zip(worksheet_names, response["valueRanges"])
+        }
+
+def get_worksheet_title(sheet_name, worksheet_name):
+    """
+    Returns the tab title of a worksheet. Worksheets are addressed by tab position, so the titles
+    are resolved once and kept until invalidate_sheets_cache drops the whole file.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_name (str): The worksheet, as named in WORKSHEETS.
+
+    Returns:
+    - str: The title of the worksheet's tab.
+    """
+    if sheet_name not in _worksheet_titles:
+        spreadsheet = clients.get_spreadsheet(sheet_name)
+        _worksheet_titles[sheet_name] = [worksheet.title for worksheet in resilience.call_with_retry("sheets", spreadsheet.worksheets)]
+    return _worksheet_titles[sheet_name][WORKSHEETS.index(worksheet_name)]
+
+def records_to_dataframe(values):
+    """
+    Converts raw worksheet values into a DataFrame the same way `get_all_records` does:
+    the first row is the header, rows are padded and numeric strings are converted to numbers.
+
+    Parameters:
+    - values (list): List of rows as returned by the Sheets API.
+
+    Returns:
+    - pd.DataFrame: A DataFrame with one row per record.
+    """
+    if not values:
+        return pd.DataFrame()
+
+    values = gspread.utils.fill_gaps(values)
+    header, rows = values[0], values[1:]
+    rows = [gspread.utils.numericise_all(row) for row in rows]
+    return pd.DataFrame(gspread.utils.to_records(header, rows))
+
+def invalidate_sheets_cache(sheet_name=None, worksheet_name=None):
+    """
+    Drops cached snapshots so that the next read downloads fresh data. Invalidating a whole file
+    also drops its tab titles, in case tabs were renamed.
+
+    Parameters:
+    - sheet_name (str): The Google Sheets file to invalidate. Invalidates every file when None.
+    - worksheet_name (str): The worksheet to invalidate. Invalidates every worksheet of the file when None.
+    """
+    with _snapshot_cache_lock:
+        if worksheet_name is None:
+            for name in list(_worksheet_titles):
+                if sheet_name in (None, name):
+                    _worksheet_titles.pop(name, None)
+        # Worksheets being downloaded have a fetch lock but no snapshot yet
+        for key in set(_snapshot_cache) | set(_snapshot_fetch_locks):
+            if sheet_name in (None, key[0]) and worksheet_name in (None, key[1]):
+                _snapshot_cache.pop(key, None)
+                _snapshot_cache_generations[key] = _snapshot_cache_generations.get(key, 0) + 1
+        _snapshot_cache_stats["invalidations"] += 1
+
+def get_sheets_cache_stats():
+    """
+    Returns the snapshot cache counters.
+
+    Returns:
+    - dict: Number of cache hits, misses and invalidations, plus the number of cached worksheets.
+    """
+    with _snapshot_cache_lock:
+        return {**_snapshot_cache_stats, "cached_worksheets": len(_snapshot_cache)}
+
+def get_changed_cell_runs(current_values, new_values):
+    """
+    Compares the values of a worksheet with the values that should replace them.
+
+    Cells of the current values outside the new values are blanked, so the worksheet ends up
+    holding exactly the new values.
+
+    Parameters:
+    - current_values (list): Rows currently in the worksheet, as returned by the Sheets API.
+    - new_values (list): Rows to write, starting at A1.
+
+    Returns:
+    - list: (row index, first column index, values) tuples, one per run of consecutive changed cells
+      in a row, with None for cells to blank. Indices start at 0.
+    """
+    runs = []
+    for row_index in range(max(len(current_values), len(new_values))):
+        current_row = current_values[row_index] if row_index < len(current_values) else []
+        new_row = new_values[row_index] if row_index < len(new_values) else []
+        run_start, run_values = None, []
+
+        for column_index in range(max(len(current_row), len(new_row))):
+            current = current_row[column_index] if column_index < len(current_row) else ""
+            new = new_row[column_index] if column_index < len(new_row) else None
+            if str(current) != ("" if new is None else str(new)):
+                if run_start is None:
+                    run_start = column_index
+                run_values.append(None if new == "" else new)
+            elif run_start is not None:
+                runs.append((row_index, run_start, run_values))
+                run_start, run_values = None, []
+
+        if run_start is not None:
+            runs.append((row_index, run_start, run_values))
+    return runs
+
+def to_cell_data(value):
+    """
+    Converts a value to the CellData of a Sheets `updateCells` request, storing text as is like RAW input.
+
+    Parameters:
+    - value: The value to write, None to blank the cell.
+
+    Returns:
+    - dict: The cell's CellData.
+    """
+    if value is None:
+        return {}
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+@telemetry.traced("sheets.write_worksheet_values")
+def write_worksheet_values(sheet_name, worksheet_name, values):
+    """
+    Replaces the content of a worksheet by writing only the cells that changed.
+
+    The current values are read once and every changed run of cells, along with any rows or columns
+    the grid needs, is sent in one `batch_update`. The Sheets API applies a batch atomically, so
+    readers see either the old or the new content, never an empty worksheet.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_name (str): The title of the worksheet to write.
+    - values (list): Rows to write, starting at A1.
+
+    Returns:
+    - int: The number of cells written.
+    """
+    spreadsheet = clients.get_spreadsheet(sheet_name)
+    sheet = resilience.call_with_retry("sheets", spreadsheet.worksheet, worksheet_name)
+    current_values = resilience.call_with_retry(
+        "sheets", spreadsheet.values_get, gspread.utils.absolute_range_name(sheet.title)
+    ).get("values", [])
+    runs = get_changed_cell_runs(current_values, values)
+    telemetry.get_current_span().set_attributes(worksheet=worksheet_name, changed_runs=len(runs))
+    if not runs:
+        return 0
+
+    requests = []
+    # Grow the grid first so the new cells fit in it
+    for dimension, needed, available in (("ROWS", len(values), sheet.row_count),
+                                         ("COLUMNS", max(map(len, values), default=0), sheet.col_count)):
+        if needed > available:
+            requests.append({"appendDimension": {"sheetId": sheet.id, "dimension": dimension, "length": needed - available}})
+
+    for row_index, column_index, run_values in runs:
+        requests.append({"updateCells": {
+            "range": {
+                "sheetId": sheet.id,
+                "startRowIndex": row_index, "endRowIndex": row_index + 1,
+                "startColumnIndex": column_index, "endColumnIndex": column_index + len(run_values)
+            },
+            "rows": [{"values": [to_cell_data(value) for value in run_values]}],
+            "fields": "userEnteredValue"
+        }})
+
+    resilience.call_with_retry("sheets", spreadsheet.batch_update, {"requests": requests})
+    return sum(len(run_values) for _, _, run_values in runs)
+
+def send_to_google_sheet(analysis_dict, sheet_name="edmo_dashboard", worksheet_name="feedback_midyear",
+                         comment_hashes=None):
     """
     Sends the analysis dictionary to a Google Sheet.
 
@@ -56,35 +365,32 @@ def send_to_google_sheet(analysis_dict, sheet_name="edmo_dashboard", worksheet_n
     - analysis_dict (dict): A dictionary where each key is a location, and each value is the analysis string for that location.
     - sheet_name (str): The name of the Google Sheets file to update.
     - worksheet_name (str): The name of the specific worksheet/tab to update within the Google Sheet.
+    - comment_hashes (dict): Optional comments fingerprint of each location, stored next to its analysis
+      so the next update only re-analyzes locations whose comments changed.
 
     Returns:
     - None
     """
-    # Load credentials
-    scope, credentials_info = load_credentials()
-
-    # Authorize the client
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials_info, scope)
-    client = gspread.authorize(creds)
-
-    # Open the Google Sheet by name and access the specified worksheet
-    sheet = client.open(sheet_name).worksheet(worksheet_name)
-
     # Get the current date
     current_date = datetime.now().strftime("%Y-%m-%d")
 
     # Prepare the data for insertion (convert dictionary to list of rows)
-    data_to_insert = [["Location", "Analysis", "Date Sent"]]  # Header row
+    comment_hashes = comment_hashes or {}
+    data_to_insert = [["Location", "Analysis", "Date Sent", "Comments Hash"]]  # Header row
     for location, analysis in analysis_dict.items():
-        data_to_insert.append([location, analysis, current_date])
+        data_to_insert.append([location, analysis, current_date, comment_hashes.get(location, "")])
+
+    # Only write the cells that differ from the worksheet, in a single atomic request
+    write_worksheet_values(sheet_name, worksheet_name, data_to_insert)
 
-    # Clear any existing data in the sheet and insert new data
-    sheet.clear()
-    sheet.update("A1", data_to_insert)  # Starting from cell A1
+    # The cached snapshot and the local mirror no longer reflect the worksheet
+    invalidate_sheets_cache(sheet_name, worksheet_name)
+    if USE_SHEETS_MIRROR:
+        sheets_mirror.write_worksheets(sheet_name, {worksheet_name: records_to_dataframe(data_to_insert)}, SHEETS_MIRROR_DIR)
 
 
 def send_feedback_to_google_sheet(positive_summary, improvement_summary, sheet_name="edmo_dashboard",
-                                  worksheet_name="feedback_endofyear"):
+                                  worksheet_name="feedback_endofyear", positive_hash="", improvement_hash=""):
     """
     Sends the summarized positive and improvement feedback to the specified Google Sheet and worksheet.
 
@@ -93,26 +399,23 @@ def send_feedback_to_google_sheet(positive_summary, improvement_summary, sheet_n
     - improvement_summary (str): Summary of improvement feedback.
     - sheet_name (str): Name of the Google Sheet.
     - worksheet_name (str): Name of the worksheet in the Google Sheet.
+    - positive_hash (str): Comments fingerprint of the positive feedback that was summarized.
+    - improvement_hash (str): Comments fingerprint of the improvement feedback that was summarized.
     """
-    # Load credentials
-    scope, credentials_info = load_credentials()
-
-    # Authorize the client
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials_info, scope)
-    client = gspread.authorize(creds)
-
-    # Open the Google Sheet and access the specified worksheet
-    sheet = client.open(sheet_name).worksheet(worksheet_name)
-
     # Get the current date
     current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     # Prepare the data for insertion as a list of lists for Google Sheets
     data_to_insert = [
-        ["Positive Feedback Summary", "Improvement Feedback Summary", "Date Sent"],  # Header row
-        [positive_summary, improvement_summary, current_date]
+        ["Positive Feedback Summary", "Improvement Feedback Summary", "Date Sent",
+         "Positive Feedback Hash", "Improvement Feedback Hash"],  # Header row
+        [positive_summary, improvement_summary, current_date, positive_hash, improvement_hash]
     ]
 
-    # Clear existing data and insert the new data
-    sheet.clear()
-    sheet.update("A1", data_to_insert)  # Starting from cell A1
\ No newline at end of file
+    # Only write the cells that differ from the worksheet, in a single atomic request
+    write_worksheet_values(sheet_name, worksheet_name, data_to_insert)
+
+    # The cached snapshot and the local mirror no longer reflect the worksheet
+    invalidate_sheets_cache(sheet_name, worksheet_name)
+    if USE_SHEETS_MIRROR:
+        sheets_mirror.write_worksheets(sheet_name, {worksheet_name: records_to_dataframe(data_to_insert)}, SHEETS_MIRROR_DIR)
@@ -0,0 +1,237 @@
+import time
+import threading
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+import gspread
+from utils import clients, data_cleaning, data_processing, google_services, resilience, rollups, telemetry
+
+# Rating columns of the cleaned survey data, averaged per location
+RATING_COLUMNS = ['Kid Camp Experience Rating', 'Recommendation Likelihood']
+
+# Ingestion state of each response worksheet, one per way of ingesting it since each reads the rows
+# from its own position: {(sheet_name, worksheet_name, keep_rows): IngestionState}
+_ingestion_states = {}
+_ingestion_states_lock = threading.Lock()
+
+
+class LocationAggregator:
+    """
+    Running per-location rating sums and counts, and comments per location, updated batch by batch.
+
+    Parameters:
+    - collect_comments (bool): Whether to keep the comments. Without them, memory only grows with the number of locations.
+    """
+
+    def __init__(self, collect_comments=True):
+        self.sums = defaultdict(lambda: np.zeros(len(RATING_COLUMNS)))
+        self.counts = defaultdict(lambda: np.zeros(len(RATING_COLUMNS), dtype=np.int64))
+        self.comments = defaultdict(list)
+        self.collect_comments = collect_comments
+
+    def update(self, cleaned_df):
+        """
+        Adds a batch of cleaned survey rows to the running totals.
+
+        Parameters:
+        - cleaned_df (pd.DataFrame): Rows cleaned by data_cleaning.clean_data_midyear_endofession.
+        """
+        grouped = cleaned_df[RATING_COLUMNS].astype("float64").groupby(cleaned_df["Location"], sort=False, observed=True)
+        batch_sums, batch_counts = grouped.sum(), grouped.count()
+        for location, sums, counts in zip(batch_sums.index, batch_sums.to_numpy(), batch_counts.to_numpy()):
+            self.sums[location] += sums
+            self.counts[location] += counts
+
+        if self.collect_comments:
+            for location, comments in data_processing.create_comments_dict(cleaned_df).items():
+                self.comments[location].extend(comments)
+
+    def grouped_df(self):
+        """
+        Builds the mean ratings per location from the running totals.
+
+        Returns:
+        - pd.DataFrame: The same frame as data_processing.create_grouped_df over every row added so far.
+        """
+        # Numeric locations first, like the categories of the cleaned frame
+        locations = sorted(self.sums, key=lambda location: (isinstance(location, str), location))
+        sums = np.array([self.sums[location] for location in locations]).reshape(len(locations), len(RATING_COLUMNS))
+        counts = np.array([self.counts[location] for location in locations]).reshape(len(locations), len(RATING_COLUMNS))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+        grouped_df = pd.DataFrame(means, columns=RATING_COLUMNS).round(2)
+        grouped_df.insert(0, "Location", locations)
+        grouped_df['Combined Mean'] = grouped_df[RATING_COLUMNS].mean(axis=1).round(2)
+        return grouped_df.sort_values(by='Combined Mean', ascending=False)
+
+    def comments_dict(self):
+        """
+        Returns a copy of the comments per location added so far, unaffected by later updates.
+
+        Returns:
+        - dict: A dictionary where each key is a location, and each value is a list of comments.
+        """
+        return {location: list(comments) for location, comments in self.comments.items()}
+
+
+def backfill_survey_exports(paths, chunksize=None, collect_comments=True):
+    """
+    Aggregates mid-year or end-of-session survey exports per location, one row batch at a time,
+    so a multi-year backfill runs in constant memory.
+
+    Parameters:
+    - paths (list): Paths of the .csv or .xlsx exports.
+    - chunksize (int): Number of rows per batch. Defaults to data_cleaning.SURVEY_EXPORT_CHUNK_ROWS.
+    - collect_comments (bool): Whether to keep the comments per location.
+
+    Returns:
+    - LocationAggregator: The aggregates over every row of every export.
+    """
+    chunksize = data_cleaning.SURVEY_EXPORT_CHUNK_ROWS if chunksize is None else chunksize
+    aggregator = LocationAggregator(collect_comments)
+    for path in paths:
+        for cleaned_chunk in data_cleaning.clean_survey_export(path, chunksize):
+            aggregator.update(cleaned_chunk)
+    return aggregator
+
+
+class IngestionState:
+    """
+    What has been ingested so far from one response worksheet.
+
+    Parameters:
+    - keep_rows (bool): Whether to keep the raw rows, for worksheets that are not aggregated per location.
+    """
+
+    def __init__(self, keep_rows=False):
+        self.header = None
+        self.next_row = 1
+        self.polled_at = None
+        self.aggregator = None if keep_rows else LocationAggregator()
+        self.rollups = None if keep_rows else rollups.SurveyRollups()
+        self.rows = pd.DataFrame() if keep_rows else None
+        self.lock = threading.Lock()
+
+
+def get_ingestion_state(sheet_name, worksheet_name, keep_rows=False):
+    """
+    Returns the process-wide ingestion state of a worksheet, creating an empty one on first use.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_name (str): The response worksheet, as named in google_services.WORKSHEETS.
+    - keep_rows (bool): Whether the state keeps raw rows instead of per-location aggregates.
+
+    Returns:
+    - IngestionState: The worksheet's ingestion state.
+    """
+    with _ingestion_states_lock:
+        # Aggregated and raw ingestion of the same worksheet keep separate states, so neither finds
+        # the other's state without its aggregates or rows
+        key = (sheet_name, worksheet_name, keep_rows)
+        if key not in _ingestion_states:
+            _ingestion_states[key] = IngestionState(keep_rows)
+        return _ingestion_states[key]
+
+def reset_ingestion(sheet_name=None, worksheet_name=None):
+    """
+    Forgets what has been ingested so the next call reads the worksheets from the first row again,
+    for instance after historical rows were edited or deleted.
+
+    Parameters:
+    - sheet_name (str): The Google Sheets file to reset. Resets every file when None.
+    - worksheet_name (str): The worksheet to reset. Resets every worksheet of the file when None.
+    """
+    with _ingestion_states_lock:
+        for key in list(_ingestion_states):
+            if sheet_name in (None, key[0]) and worksheet_name in (None, key[1]):
+                del _ingestion_states[key]
+
+def read_new_rows(state, sheet_name, worksheet_name):
+    """
+    Reads the rows added to a worksheet since the last read with a single ranged request.
+
+    Parameters:
+    - state (IngestionState): The worksheet's ingestion state, updated in place.
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_name (str): The worksheet, as named in google_services.WORKSHEETS.
+
+    Returns:
+    - pd.DataFrame: The new rows as records, empty when there are none.
+    """
+    title = google_services.get_worksheet_title(sheet_name, worksheet_name)
+    spreadsheet = clients.get_spreadsheet(sheet_name)
+
+    if state.header is None:
+        # First read: the whole worksheet, header included
+        values = resilience.call_with_retry(
+            "sheets", spreadsheet.values_get, gspread.utils.absolute_range_name(title)
+        ).get("values", [])
+        if not values:
+            return pd.DataFrame()
+        state.header, rows = values[0], values[1:]
+        state.next_row = 2
+    else:
+        # Later reads: only the rows below the last ingested one, within the header's columns
+        last_column = gspread.utils.rowcol_to_a1(1, len(state.header)).rstrip("0123456789")
+        range_name = gspread.utils.absolute_range_name(title, f"A{state.next_row}:{last_column}")
+        rows = resilience.call_with_retry("sheets", spreadsheet.values_get, range_name).get("values", [])
+
+    state.next_row += len(rows)
+    if not rows:
+        return pd.DataFrame()
+    return google_services.records_to_dataframe([state.header] + rows)
+
+@telemetry.traced("data.ingest_survey_worksheet")
+def ingest_survey_worksheet(sheet_name, worksheet_name, ttl=None):
+    """
+    Brings the per-location aggregates of a mid-year or end-of-session response worksheet up to date.
+
+    Only rows added since the last call are downloaded, cleaned and added to the running totals
+    and to the worksheet's per-period rollups.
+    The worksheet is polled at most once every `ttl` seconds.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_name (str): The response worksheet, as named in google_services.WORKSHEETS.
+    - ttl (float): Minimum number of seconds between two polls. Defaults to google_services.SHEETS_CACHE_TTL_SECONDS.
+
+    Returns:
+    - tuple: The DataFrame of mean ratings per location and the dictionary of comments per location,
+      copied from the shared aggregates under the worksheet's lock so later ingestion does not change them.
+    """
+    ttl = google_services.SHEETS_CACHE_TTL_SECONDS if ttl is None else ttl
+    state = get_ingestion_state(sheet_name, worksheet_name)
+    with state.lock:
+        if state.polled_at is None or time.monotonic() - state.polled_at >= ttl:
+            new_rows = read_new_rows(state, sheet_name, worksheet_name)
+            state.polled_at = time.monotonic()
+            if not new_rows.empty:
+                cleaned_rows = data_cleaning.clean_data_midyear_endofession(new_rows)
+                state.aggregator.update(cleaned_rows)
+                state.rollups.update(cleaned_rows, data_cleaning.get_response_timestamps(new_rows))
+        return state.aggregator.grouped_df(), state.aggregator.comments_dict()
+
+def ingest_raw_worksheet(sheet_name, worksheet_name, ttl=None):
+    """
+    Brings the raw rows of a response worksheet, such as the end-of-year ones, up to date by
+    appending only the rows added since the last call.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_name (str): The response worksheet, as named in google_services.WORKSHEETS.
+    - ttl (float): Minimum number of seconds between two polls. Defaults to google_services.SHEETS_CACHE_TTL_SECONDS.
+
+    Returns:
+    - pd.DataFrame: Every row of the worksheet ingested so far.
+    """
+    ttl = google_services.SHEETS_CACHE_TTL_SECONDS if ttl is None else ttl
+    state = get_ingestion_state(sheet_name, worksheet_name, keep_rows=True)
+    with state.lock:
+        if state.polled_at is None or time.monotonic() - state.polled_at >= ttl:
+            new_rows = read_new_rows(state, sheet_name, worksheet_name)
+            state.polled_at = time.monotonic()
+            if not new_rows.empty:
+                state.rows = new_rows if state.rows.empty else pd.concat([state.rows, new_rows], ignore_index=True)
+        return state.rows
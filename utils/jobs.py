@@ -0,0 +1,259 @@
+import uuid
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import data_processing, google_services, openai_functions, telemetry
+
+# Number of update jobs run at the same time in the background
+JOBS_MAX_WORKERS = 2
+
+# Number of finished jobs kept so pages can still read their outcome
+JOBS_MAX_FINISHED = 50
+
+# Number of seconds between two refreshes of a job's progress on the pages
+JOBS_POLL_INTERVAL_SECONDS = 1
+
+# Job statuses after which a job will not change anymore
+JOB_FINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+# Jobs of the process, in submission order: {job_id: Job}
+_jobs = {}
+_jobs_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=JOBS_MAX_WORKERS, thread_name_prefix="dashboard-job")
+
+
+class Job:
+    """
+    A dashboard update running in the background, outside of any Streamlit rerun.
+
+    Parameters:
+    - key (str): The name of the update, such as '<sheet name>-<worksheet name>'. A single job runs per key.
+    - locations (list): Locations whose progress is reported, empty for updates without locations.
+    """
+
+    def __init__(self, key, locations=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = "queued"
+        self.progress = {location: "" for location in locations or []}
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+
+    def is_cancelled(self):
+        """
+        Tells whether cancellation was requested. Long-running targets check it between steps.
+
+        Returns:
+        - bool: True if the job must stop.
+        """
+        return self.cancel_event.is_set()
+
+    def set_progress(self, location, text):
+        """
+        Records the analysis received so far for a location.
+
+        Parameters:
+        - location (str): The location.
+        - text (str): The analysis received so far.
+        """
+        with self.lock:
+            self.progress[location] = text
+
+    def finish(self, status, result=None, error=None):
+        """
+        Records the outcome of the job.
+
+        Parameters:
+        - status (str): One of JOB_FINAL_STATUSES.
+        - result: The value returned by the target.
+        - error (str): The error message of a failed job.
+        """
+        with self.lock:
+            self.status, self.result, self.error = status, result, error
+            self.finished_at = time.time()
+
+    def snapshot(self):
+        """
+        Returns a consistent copy of the job's state for display.
+
+        Returns:
+        - dict: The job's 'id', 'key', 'status', 'progress', 'error', 'result', 'created_at' and 'finished_at'.
+        """
+        with self.lock:
+            return {
+                "id": self.id, "key": self.key, "status": self.status, "progress": dict(self.progress),
+                "error": self.error, "result": self.result,
+                "created_at": self.created_at, "finished_at": self.finished_at
+            }
+
+
+def run_job(job, target, kwargs):
+    """
+    Runs a job's target in a worker thread and records its outcome.
+
+    Parameters:
+    - job (Job): The job to run.
+    - target (callable): Function called with the job and `kwargs`.
+    - kwargs (dict): Keyword arguments of the target.
+    """
+    with job.lock:
+        if job.cancel_event.is_set():
+            job.status, job.finished_at = "cancelled", time.time()
+            return
+        job.status = "running"
+    try:
+        # Jobs outlive the rerun that queued them, so each one is traced on its own
+        with telemetry.trace(f"job.{job.key}", job_id=job.id):
+            result = target(job, **kwargs)
+    except Exception as e:
+        print(f"Error in job '{job.key}' ({job.id}): {e}")
+        job.finish("failed", error=str(e))
+    else:
+        # Targets return None when they stop early on cancellation
+        job.finish("cancelled" if job.is_cancelled() and result is None else "succeeded", result=result)
+
+def enqueue_job(key, target, locations=None, **kwargs):
+    """
+    Queues an update to run in the background and returns right away.
+
+    If a job with the same key is already queued or running, that job is returned instead of
+    starting another one, so concurrent sessions share a single update.
+
+    Parameters:
+    - key (str): The name of the update, such as '<sheet name>-<worksheet name>'.
+    - target (callable): Function called with the job and `kwargs` in a worker thread.
+    - locations (list): Locations whose progress is reported.
+    - **kwargs: Keyword arguments of the target.
+
+    Returns:
+    - Job: The queued or already active job.
+    """
+    with _jobs_lock:
+        active = find_active_job(key)
+        if active is not None:
+            return active
+
+        # Forget the oldest finished jobs
+        finished = [job_id for job_id, job in _jobs.items() if job.status in JOB_FINAL_STATUSES]
+        for job_id in finished[:max(len(finished) - JOBS_MAX_FINISHED + 1, 0)]:
+            del _jobs[job_id]
+
+        job = Job(key, locations)
+        _jobs[job.id] = job
+    _executor.submit(run_job, job, target, kwargs)
+    return job
+
+def get_job(job_id):
+    """
+    Returns a job by ID.
+
+    Parameters:
+    - job_id (str): The job ID returned by enqueue_job.
+
+    Returns:
+    - Job: The job, or None if it is unknown or was forgotten.
+    """
+    return _jobs.get(job_id)
+
+def get_active_job(key):
+    """
+    Returns the queued or running job of an update.
+
+    Parameters:
+    - key (str): The name of the update.
+
+    Returns:
+    - Job: The active job, or None if there is none.
+    """
+    with _jobs_lock:
+        return find_active_job(key)
+
+def find_active_job(key):
+    """
+    Looks up the queued or running job of an update. The caller must hold _jobs_lock.
+
+    Parameters:
+    - key (str): The name of the update.
+
+    Returns:
+    - Job: The active job, or None if there is none.
+    """
+    for job in _jobs.values():
+        if job.key == key and job.status not in JOB_FINAL_STATUSES:
+            return job
+    return None
+
+def cancel_job(job_id):
+    """
+    Requests the cancellation of a job. A queued job never starts; a running job stops at its next
+    check and does not write its results.
+
+    Parameters:
+    - job_id (str): The job ID returned by enqueue_job.
+
+    Returns:
+    - bool: True if the job was still active.
+    """
+    job = get_job(job_id)
+    if job is None or job.status in JOB_FINAL_STATUSES:
+        return False
+    job.cancel_event.set()
+    return True
+
+def run_location_analysis_update(job, dic_comments, previous_analyses, sheet_name, worksheet_name):
+    """
+    Job target that streams the analysis of every location, then sends the analyses to Google Sheets.
+
+    Parameters:
+    - job (Job): The running job, updated with each location's partial analysis.
+    - dic_comments (dict): Dictionary where keys are locations and values are lists of comments.
+    - previous_analyses (dict): (comments fingerprint, analysis) tuple of each location from the last update.
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_name (str): The feedback worksheet to update.
+
+    Returns:
+    - dict: The analysis of each location, or None if the job was cancelled before writing.
+    """
+    analysis_dict = {}
+    # Cancelling the job also stops the streams in progress
+    stream = openai_functions.analyze_comment_stream(
+        dic_comments, previous_analyses=previous_analyses, stop_event=job.cancel_event
+    )
+    try:
+        for location, analysis in stream:
+            if job.is_cancelled():
+                return None
+            analysis_dict[location] = analysis
+            job.set_progress(location, analysis)
+    finally:
+        stream.close()
+    # The streams may all have stopped without another update being yielded
+    if job.is_cancelled():
+        return None
+
+    analysis_dict = {location: analysis_dict[location] for location in dic_comments}
+    google_services.send_to_google_sheet(
+        analysis_dict=analysis_dict,
+        sheet_name=sheet_name,
+        worksheet_name=worksheet_name,
+        comment_hashes=openai_functions.comment_hashes(dic_comments, analysis_dict, previous_analyses)
+    )
+    return analysis_dict
+
+def run_feedback_summaries_update(job, dataframes):
+    """
+    Job target that regenerates the end-of-year feedback summaries and sends them to Google Sheets.
+
+    Parameters:
+    - job (Job): The running job, checked for cancellation before each summary and before writing.
+    - dataframes (dict): The End of Year worksheets keyed by worksheet name.
+
+    Returns:
+    - tuple: Updated positive and improvement summaries along with the timestamp, or None if the
+      job was cancelled before writing.
+    """
+    return data_processing.update_feedback_summaries_endofyear(dataframes, job=job)
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Location of the on-disk cache, next to the app so it survives restarts and redeploys of the same checkout
+LLM_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "llm_responses.sqlite3")
+
+# Maximum number of cached responses; the least recently used ones are evicted beyond it
+LLM_CACHE_MAX_ENTRIES = 5000
+
+# Number of seconds a cached response stays valid, or None to keep responses until they are evicted
+LLM_CACHE_TTL_SECONDS = None
+
+
+class LLMCache:
+    """
+    Persistent SQLite cache of LLM responses keyed by a hash of the model, messages and parameters.
+
+    Parameters:
+    - path (str): Path of the SQLite database file.
+    - max_entries (int): Maximum number of cached responses before the least recently used are evicted.
+    - ttl (float): Number of seconds a response stays valid, or None for no expiry.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used_at ON responses (last_used_at)")
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(model, messages, params=None):
+        """
+        Builds the cache key of a request.
+
+        Parameters:
+        - model (str): The model name.
+        - messages (list): The chat messages.
+        - params (dict): Any other request parameters.
+
+        Returns:
+        - str: The SHA-256 hex digest of the request.
+        """
+        payload = json.dumps({"model": model, "messages": messages, "params": params or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Looks up a cached response and marks it as recently used.
+
+        Parameters:
+        - key (str): The cache key from make_key.
+
+        Returns:
+        - str: The cached response, or None on a miss or when it has expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                self.stats["misses"] += 1
+                return None
+
+            self._connection.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.stats["hits"] += 1
+            return row[0]
+
+    def set(self, key, response):
+        """
+        Stores a response and evicts the least recently used ones beyond max_entries.
+
+        Parameters:
+        - key (str): The cache key from make_key.
+        - response (str): The response to cache.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            evicted = self._connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            self._connection.commit()
+            self.stats["evictions"] += evicted
+
+    def clear(self):
+        """Removes every cached response."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def get_stats(self):
+        """
+        Returns the cache counters of this process.
+
+        Returns:
+        - dict: Hits, misses, evictions, hit rate and number of stored responses.
+        """
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {**self.stats, "hit_rate": self.stats["hits"] / lookups if lookups else 0.0, "entries": entries}
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """
+    Returns the process-wide LLM response cache, opening it on first use.
+
+    Returns:
+    - LLMCache: The shared cache.
+    """
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMCache(LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS)
+        return _llm_cache
@@ -1,174 +1,740 @@
-import streamlit as st
-from openai import OpenAI
+import json
+import time
+import hashlib
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from utils import chunking, clients, llm_cache, rate_limiter, resilience, telemetry
+
+# Maximum number of OpenAI requests in flight at once in analyze_comment
+OPENAI_MAX_CONCURRENCY = 8
+
+# Requests and tokens per minute allowed for each model on the account
+OPENAI_RATE_LIMITS = {
+    "gpt-4-turbo": {"requests_per_minute": 500, "tokens_per_minute": 300000},
+    "gpt-4o-mini": {"requests_per_minute": 500, "tokens_per_minute": 200000}
+}
+
+# Completion tokens reserved per request when estimating its token usage
+OPENAI_COMPLETION_TOKENS_ESTIMATE = 500
+
+# Placeholders stored when an analysis or a summary failed
+ANALYSIS_ERROR_MESSAGE = "Error analyzing feedback."
+POSITIVE_SUMMARY_ERROR_MESSAGE = "Error generating summary for positive feedback."
+IMPROVEMENT_SUMMARY_ERROR_MESSAGE = "Error generating summary for improvement feedback."
+
+# Process-wide rate limiters shared by every session: {model: RateLimiter}
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+# Number of tasks whose latest chunking report is kept; the oldest reports are forgotten beyond it
+CHUNKING_REPORTS_MAX_TASKS = 200
+
+# Chunking report of the latest map-reduce run of each task, oldest first:
+# {task: {"chunks": ..., "calls": ..., "tokens_per_call": [...]}}
+_chunking_reports = OrderedDict()
+_chunking_reports_lock = threading.Lock()
+
+
+def get_rate_limiter(model):
+    """
+    Returns the process-wide rate limiter for a model.
+
+    Parameters:
+    - model (str): The OpenAI model name.
 
-def analyze_comment(dic_comments):
+    Returns:
+    - RateLimiter: The limiter enforcing the model's requests and tokens per minute.
     """
-    Analyzes customer feedback for each location in the dictionary, providing
-    sentiment analysis, overall feedback, and summarized recommendations if they exist.
+    with _rate_limiters_lock:
+        if model not in _rate_limiters:
+            _rate_limiters[model] = rate_limiter.RateLimiter(**OPENAI_RATE_LIMITS[model])
+        return _rate_limiters[model]
+
+def estimate_tokens(messages, model):
+    """
+    Estimates the tokens used by a chat request with the model's local tokenizer.
 
     Parameters:
-    - dic_comments (dict): Dictionary where keys are locations and values are lists of comments.
+    - messages (list): The chat messages sent to the API.
+    - model (str): The OpenAI model name.
 
     Returns:
-    - dict: A dictionary with each location as the key, and analysis as the value.
+    - int: Prompt tokens plus the completion tokens reserved per request.
     """
-    # Initialize OpenAI client with API key
-    client = OpenAI(api_key=st.secrets["openai"]['openai_key'])
-    analysis_dict = {}  # Dictionary to store analysis for each location
+    return sum(chunking.count_tokens(message["content"], model) for message in messages) + OPENAI_COMPLETION_TOKENS_ESTIMATE
 
-    for location, comments in dic_comments.items():
-        # Join comments for the location into a single string for context
-        comments_text = " ".join([comment for comment in comments if comment])
+def get_token_usage(response):
+    """
+    Reads the token counts of a chat completion response.
 
+    Parameters:
+    - response: The chat completion, or the last chunk of a streamed one.
+
+    Returns:
+    - dict: The 'prompt_tokens', 'completion_tokens' and 'total_tokens' reported by the API,
+      empty if the response carries no usage.
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    return {key: getattr(usage, key, None) for key in ("prompt_tokens", "completion_tokens", "total_tokens")}
+
+def create_chat_completion(client, model, messages, **params):
+    """
+    Sends a chat completion request once the model's rate limits allow it, retrying rate limits
+    and server errors through resilience.call_with_retry.
+
+    Responses are stored in the persistent LLM cache, so an identical request (same model,
+    messages and parameters) is answered from disk without calling the API.
+
+    Parameters:
+    - client (OpenAI): The OpenAI client.
+    - model (str): The OpenAI model name.
+    - messages (list): The chat messages to send.
+    - **params: Any other parameters of the chat completion request.
+
+    Returns:
+    - str: The stripped content of the first choice.
+    """
+    with telemetry.span("openai.chat_completion", model=model) as request_span:
+        cache = llm_cache.get_llm_cache()
+        cache_key = cache.make_key(model, messages, params)
+        cached = cache.get(cache_key)
+        request_span.set_attributes(cached=cached is not None)
+        if cached is not None:
+            return cached
+
+        wait_started = time.perf_counter()
+        get_rate_limiter(model).acquire(estimate_tokens(messages, model))
+        request_span.set_attributes(rate_limit_wait_ms=round((time.perf_counter() - wait_started) * 1000, 1))
+        response = resilience.call_with_retry(
+            "openai", client.chat.completions.create, model=model, messages=messages, **params
+        )
+        request_span.set_attributes(**get_token_usage(response))
+        content = response.choices[0].message.content.strip()
+
+        cache.set(cache_key, content)
+        return content
+
+def stream_chat_completion(client, model, messages):
+    """
+    Streams a chat completion, yielding the text received so far after every chunk.
+
+    A cached response is yielded at once; a streamed response is stored in the persistent LLM cache
+    under the same key as create_chat_completion uses.
+
+    Parameters:
+    - client (OpenAI): The OpenAI client.
+    - model (str): The OpenAI model name.
+    - messages (list): The chat messages to send.
+
+    Yields:
+    - str: The accumulated text of the first choice; the last value is stripped.
+    """
+    # The span is not made current, since the caller's code runs between the yields
+    request_span = telemetry.start_span("openai.chat_completion", model=model, stream=True)
+    error = None
+    try:
+        cache = llm_cache.get_llm_cache()
+        cache_key = cache.make_key(model, messages, {})
+        cached = cache.get(cache_key)
+        request_span.set_attributes(cached=cached is not None)
+        if cached is not None:
+            yield cached
+            return
+
+        wait_started = time.perf_counter()
+        get_rate_limiter(model).acquire(estimate_tokens(messages, model))
+        request_span.set_attributes(rate_limit_wait_ms=round((time.perf_counter() - wait_started) * 1000, 1))
+        # Only opening the stream is retried, a stream that breaks midway is not replayed.
+        # The last chunk of the stream carries the token usage
+        stream = resilience.call_with_retry(
+            "openai", client.chat.completions.create, model=model, messages=messages, stream=True,
+            stream_options={"include_usage": True}
+        )
+        content = ""
         try:
-            # Use the OpenAI Chat API to analyze comments for each location with few-shot examples
-            response = client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=[
-                    {"role": "system",
-                     "content": "You are an assistant that analyzes customer feedback and provides sentiment analysis and recommendations."},
-
-                    # Few-shot example with feedback
-                    {"role": "user",
-                     "content": "Analyze the feedback for the location 'Sample Location A'. Provide the overall sentiment in a few sentences and summarize any customer recommendations if they are relevant: ['Pick up process needs to be improved.', 'More activities for kids.', 'Kids were bored.']"},
-                    {"role": "assistant", "content": """
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    request_span.set_attributes(**get_token_usage(chunk))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content += chunk.choices[0].delta.content
+                    yield content
+        finally:
+            # Closing the response stops the generation when the caller stops reading early
+            if hasattr(stream, "close"):
+                stream.close()
+
+        content = content.strip()
+        cache.set(cache_key, content)
+        yield content
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        request_span.end(error=error)
+
+def build_reduce_messages(instruction, partial_results):
+    """
+    Builds the chat messages asking to merge partial results from several chunks of comments.
+
+    Parameters:
+    - instruction (str): What the merged result should contain.
+    - partial_results (list): The partial results to merge.
+
+    Returns:
+    - list: The chat messages to send.
+    """
+    parts_text = "\n\n".join(f"Part {i}:\n{result}" for i, result in enumerate(partial_results, start=1))
+    return [
+        {"role": "system",
+         "content": "You are an assistant that merges partial analyses of customer feedback into a single one."},
+        {"role": "user", "content": f"{instruction}\n\n{parts_text}"}
+    ]
+
+def map_reduce_completion(client, model, task, comments, build_messages, reduce_instruction, token_budget=None):
+    """
+    Runs a prompt over comments that may not fit in a single request.
+
+    Comments within the token budget are sent in one request. Larger sets are split into chunks
+    that are processed in parallel, and the partial results are then merged, in several rounds
+    if the partial results themselves exceed the budget. Partial results too long to be merged
+    in pairs are shortened to half the budget, so every request stays within it.
+
+    The chunking of the run is recorded on its span and kept by get_chunking_reports.
+
+    Parameters:
+    - client (OpenAI): The OpenAI client.
+    - model (str): The OpenAI model name.
+    - task (str): Name of the task, used to report the chunking.
+    - comments (list): The comments to process.
+    - build_messages (callable): Builds the chat messages for a list of comments.
+    - reduce_instruction (str): Instruction given when merging partial results.
+    - token_budget (int): Maximum number of comment tokens per request. Defaults to chunking.COMMENTS_TOKEN_BUDGET.
+
+    Returns:
+    - str: The final result.
+
+    Raises:
+    - ValueError: If the budget is too small to merge even two shortened partial results.
+    """
+    token_budget = chunking.COMMENTS_TOKEN_BUDGET if token_budget is None else token_budget
+    with telemetry.span("openai.map_reduce", task=task) as map_reduce_span:
+        chunks = chunking.chunk_comments(comments, token_budget, model)
+        report = {"chunks": len(chunks), "calls": 0, "tokens_per_call": []}
+
+        def complete(messages):
+            report["tokens_per_call"].append(estimate_tokens(messages, model))
+            return create_chat_completion(client, model, messages)
+
+        if len(chunks) <= 1:
+            result = complete(build_messages(comments))
+        else:
+            # Map: process every chunk in parallel
+            with ThreadPoolExecutor(max_workers=min(len(chunks), OPENAI_MAX_CONCURRENCY)) as executor:
+                partial_results = list(executor.map(telemetry.bind_context(lambda chunk: complete(build_messages(chunk))), chunks))
+
+            # Reduce: merge the partial results until they fit in a single request
+            shortened = False
+            while True:
+                groups = chunking.chunk_comments(partial_results, token_budget, model)
+                if len(groups) <= 1:
+                    break
+                if len(groups) == len(partial_results):
+                    # No two neighbouring results fit together: shorten them once so that pairs do
+                    if shortened:
+                        raise ValueError(f"The token budget of {token_budget} is too small to merge the results of '{task}'")
+                    partial_results = [chunking.truncate_to_tokens(str(result), token_budget // 2, model) for result in partial_results]
+                    shortened = True
+                    continue
+                shortened = False
+                with ThreadPoolExecutor(max_workers=min(len(groups), OPENAI_MAX_CONCURRENCY)) as executor:
+                    partial_results = list(executor.map(
+                        telemetry.bind_context(lambda group: complete(build_reduce_messages(reduce_instruction, group))), groups
+                    ))
+            result = complete(build_reduce_messages(reduce_instruction, partial_results))
+
+        report["calls"] = len(report["tokens_per_call"])
+        map_reduce_span.set_attributes(
+            chunks=report["chunks"], calls=report["calls"], max_call_tokens=max(report["tokens_per_call"])
+        )
+        with _chunking_reports_lock:
+            _chunking_reports.pop(task, None)
+            _chunking_reports[task] = report
+            while len(_chunking_reports) > CHUNKING_REPORTS_MAX_TASKS:
+                _chunking_reports.popitem(last=False)
+        return result
+
+def get_chunking_reports():
+    """
+    Returns how the latest run of each of the last CHUNKING_REPORTS_MAX_TASKS tasks was split.
+
+    Returns:
+    - dict: For each task, the number of chunks, the number of API calls and the estimated tokens of each call.
+    """
+    with _chunking_reports_lock:
+        return {task: dict(report) for task, report in _chunking_reports.items()}
+
+def hash_comments(comments):
+    """
+    Computes a fingerprint of a list of comments that ignores order, blank comments and extra whitespace.
+
+    Parameters:
+    - comments (list): The comments to fingerprint.
+
+    Returns:
+    - str: The fingerprint, prefixed with 'sha256:' so Google Sheets keeps it as text.
+    """
+    normalized = sorted(" ".join(str(comment).split()) for comment in comments if str(comment).strip())
+    return "sha256:" + hashlib.sha256(json.dumps(normalized).encode()).hexdigest()[:16]
+
+def comment_hashes(dic_comments, analysis_dict, previous_analyses=None):
+    """
+    Computes the comments fingerprint to store next to each location's analysis.
+
+    Locations whose analysis failed get an empty fingerprint, and locations that kept their previous
+    analysis keep its fingerprint, so both are analyzed again on the next update.
+
+    Parameters:
+    - dic_comments (dict): Dictionary where keys are locations and values are lists of comments.
+    - analysis_dict (dict): Dictionary where keys are locations and values are their analysis.
+    - previous_analyses (dict): Dictionary mapping locations to a (comments fingerprint, analysis) tuple.
+
+    Returns:
+    - dict: A dictionary with each location as the key, and its comments fingerprint as the value.
+    """
+    previous_analyses = previous_analyses or {}
+    hashes = {}
+    for location, comments in dic_comments.items():
+        previous_hash, previous_analysis = previous_analyses.get(location, (None, None))
+        if analysis_dict.get(location) == ANALYSIS_ERROR_MESSAGE:
+            hashes[location] = ""
+        elif previous_analysis and analysis_dict.get(location) == previous_analysis:
+            hashes[location] = previous_hash or ""
+        else:
+            hashes[location] = hash_comments(comments)
+    return hashes
+
+def summary_hash(summary, comments, error_message, previous_summary=None, previous_hash=None):
+    """
+    Computes the comments fingerprint to store next to a feedback summary.
+
+    A failed summary gets an empty fingerprint, and a summary kept from the last update keeps its
+    fingerprint, so both are generated again on the next update.
+
+    Parameters:
+    - summary (str): The summary to store.
+    - comments (list): The comments that were summarized.
+    - error_message (str): The placeholder stored when the summary failed.
+    - previous_summary (str): Summary from the last update.
+    - previous_hash (str): Comments fingerprint stored with the previous summary.
+
+    Returns:
+    - str: The fingerprint to store.
+    """
+    if summary == error_message:
+        return ""
+    if previous_summary and summary == previous_summary:
+        return previous_hash or ""
+    return hash_comments(comments)
+
+def keep_previous_on_error(location, analysis, previous_analyses=None):
+    """
+    Replaces a failed analysis with the location's previous analysis, so a good analysis is never
+    overwritten with the error placeholder.
+
+    Parameters:
+    - location (str): The location name.
+    - analysis (str): The new analysis, possibly ANALYSIS_ERROR_MESSAGE.
+    - previous_analyses (dict): Dictionary mapping locations to a (comments fingerprint, analysis) tuple.
+
+    Returns:
+    - str: The new analysis, or the previous one if the new analysis failed.
+    """
+    previous_analysis = (previous_analyses or {}).get(location, (None, None))[1]
+    if analysis == ANALYSIS_ERROR_MESSAGE and previous_analysis and previous_analysis != ANALYSIS_ERROR_MESSAGE:
+        current_span = telemetry.get_current_span()
+        if current_span is not None:
+            current_span.set_attributes(kept_previous_analysis=True)
+        return previous_analysis
+    return analysis
+
+def build_analysis_messages(location, comments):
+    """
+    Builds the few-shot chat messages asking for the analysis of one location's comments.
+
+    Parameters:
+    - location (str): The location name.
+    - comments (list): The comments left for the location.
+
+    Returns:
+    - list: The chat messages to send.
+    """
+    # Join comments for the location into a single string for context
+    comments_text = " ".join([comment for comment in comments if comment])
+
+    return [
+        {"role": "system",
+         "content": "You are an assistant that analyzes customer feedback and provides sentiment analysis and recommendations."},
+
+        # Few-shot example with feedback
+        {"role": "user",
+         "content": "Analyze the feedback for the location 'Sample Location A'. Provide the overall sentiment in a few sentences and summarize any customer recommendations if they are relevant: ['Pick up process needs to be improved.', 'More activities for kids.', 'Kids were bored.']"},
+        {"role": "assistant", "content": """
 The overall sentiment for 'Sample Location A' is mixed. While there is appreciation for the existing program, there are concerns about the pick-up process and the level of engagement for children. Parents noted that children were sometimes bored and recommended having a more structured schedule with varied activities.
 
 ### Recommendations:
 1. **Improve Pick-Up Process**: Streamline the pick-up process to reduce waiting times for parents.
 2. **Increase Engagement Activities**: Add more structured activities to keep children engaged and prevent boredom.
-                    """},
+        """},
 
-                    # Few-shot example with no comments
-                    {"role": "user",
-                     "content": "Analyze the feedback for the location 'Sample Location B'. Provide the overall sentiment in a few sentences and summarize any customer recommendations if they are relevant: []"},
-                    {"role": "assistant", "content": """
+        # Few-shot example with no comments
+        {"role": "user",
+         "content": "Analyze the feedback for the location 'Sample Location B'. Provide the overall sentiment in a few sentences and summarize any customer recommendations if they are relevant: []"},
+        {"role": "assistant", "content": """
 There is no customer feedback available for 'Sample Location B' at this time.
-                    """},
+        """},
+
+        # Actual prompt for the current location
+        {"role": "user",
+         "content": f"Analyze the feedback for the location '{location}'. Provide the overall sentiment in a few sentences and summarize any customer recommendations if they are relevant: {comments_text or '[]'}"}
+    ]
+
+def analyze_location(client, location, comments):
+    """
+    Analyzes the comments of a single location.
 
-                    # Actual prompt for the current location
-                    {"role": "user",
-                     "content": f"Analyze the feedback for the location '{location}'. Provide the overall sentiment in a few sentences and summarize any customer recommendations if they are relevant: {comments_text or '[]'}"}
-                ]
+    Parameters:
+    - client (OpenAI): The OpenAI client.
+    - location (str): The location name.
+    - comments (list): The comments left for the location.
+
+    Returns:
+    - str: The analysis for the location, or an error message if the API call failed.
+    """
+    try:
+        # Use the OpenAI Chat API to analyze comments for the location with few-shot examples,
+        # splitting them into chunks if they exceed the token budget
+        with telemetry.span("openai.analyze_location", location=location, comments=len(comments)):
+            return map_reduce_completion(
+                client, "gpt-4-turbo", f"analysis:{location}", comments,
+                lambda chunk: build_analysis_messages(location, chunk),
+                f"Combine these partial analyses of the feedback for the location '{location}' into a single analysis. "
+                "Provide the overall sentiment in a few sentences and summarize any customer recommendations if they are relevant."
             )
 
-            # Extract and clean the response content
-            analysis = response.choices[0].message.content.strip()
-            # Store the analysis in the dictionary with location as key
-            analysis_dict[location] = analysis
+    except Exception as e:
+        print(f"Error in API call for location '{location}': {e}")
+        return ANALYSIS_ERROR_MESSAGE
 
-        except Exception as e:
-            print(f"Error in API call for location '{location}': {e}")
-            analysis_dict[location] = "Error analyzing feedback."
+def split_unchanged_locations(dic_comments, previous_analyses=None):
+    """
+    Separates the locations whose comments fingerprint matches their previous analysis from the others.
 
-    return analysis_dict
+    Parameters:
+    - dic_comments (dict): Dictionary where keys are locations and values are lists of comments.
+    - previous_analyses (dict): Dictionary mapping locations to a (comments fingerprint, analysis) tuple.
 
+    Returns:
+    - tuple: The previous analysis of each unchanged location, and the comments of the changed locations.
+    """
+    previous_analyses = previous_analyses or {}
+    unchanged_analyses = {}
+    changed_comments = {}
+    for location, comments in dic_comments.items():
+        previous_hash, previous_analysis = previous_analyses.get(location, (None, None))
+        if previous_analysis and previous_hash == hash_comments(comments):
+            unchanged_analyses[location] = previous_analysis
+        else:
+            changed_comments[location] = comments
+    return unchanged_analyses, changed_comments
+
+def analyze_comment(dic_comments, max_concurrency=None, previous_analyses=None):
+    """
+    Analyzes customer feedback for each location in the dictionary, providing
+    sentiment analysis, overall feedback, and summarized recommendations if they exist.
 
-from openai import OpenAI
-import streamlit as st
+    Locations are analyzed concurrently, at most `max_concurrency` at a time, within the
+    model's requests and tokens per minute limits. Locations whose comments fingerprint matches
+    the one stored with their previous analysis keep that analysis without calling the API, and
+    so do locations whose analysis failed.
 
+    Parameters:
+    - dic_comments (dict): Dictionary where keys are locations and values are lists of comments.
+    - max_concurrency (int): Maximum number of requests in flight. Defaults to OPENAI_MAX_CONCURRENCY;
+      1 analyzes the locations one after another.
+    - previous_analyses (dict): Dictionary mapping locations to a (comments fingerprint, analysis)
+      tuple from the last update, as returned by data_processing.get_previous_analyses.
 
-def summarize_positive_feedback(feedback_list):
+    Returns:
+    - dict: A dictionary with each location as the key, and analysis as the value.
     """
-    Summarizes positive feedback comments using OpenAI Chat API.
+    max_concurrency = OPENAI_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+
+    # Reuse the previous analysis of locations whose comments did not change
+    analysis_dict, changed_comments = split_unchanged_locations(dic_comments, previous_analyses)
+
+    if changed_comments:
+        # Reuse the process-wide OpenAI client
+        client = clients.get_openai_client()
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = {
+                location: executor.submit(telemetry.bind_context(analyze_location), client, location, comments)
+                for location, comments in changed_comments.items()
+            }
+        analysis_dict.update({
+            location: keep_previous_on_error(location, future.result(), previous_analyses)
+            for location, future in futures.items()
+        })
+
+    # Store the analysis for each location, keeping the order of the locations
+    return {location: analysis_dict[location] for location in dic_comments}
+
+def stream_location_analysis(client, location, comments):
+    """
+    Streams the analysis of a single location.
+
+    Comments above the token budget are analyzed with the chunked map-reduce path and yielded once complete.
+
+    Parameters:
+    - client (OpenAI): The OpenAI client.
+    - location (str): The location name.
+    - comments (list): The comments left for the location.
+
+    Yields:
+    - str: The analysis received so far; the last value is the complete analysis, or an error
+      message if the API call failed.
+    """
+    if len(chunking.chunk_comments(comments, model="gpt-4-turbo")) > 1:
+        yield analyze_location(client, location, comments)
+        return
+
+    try:
+        yield from stream_chat_completion(client, "gpt-4-turbo", build_analysis_messages(location, comments))
+
+    except Exception as e:
+        print(f"Error in API call for location '{location}': {e}")
+        yield ANALYSIS_ERROR_MESSAGE
+
+def analyze_comment_stream(dic_comments, max_concurrency=None, previous_analyses=None, stop_event=None):
+    """
+    Streams the analysis of every location as it is generated, so it can be displayed progressively.
+
+    Locations are streamed concurrently, at most `max_concurrency` at a time, and unchanged
+    locations yield their previous analysis right away, as in analyze_comment. A location whose
+    analysis fails ends with its previous analysis when it has one.
+
+    Streams in progress stop at their next chunk, and close their response, when `stop_event` is
+    set or when the caller stops iterating.
+
+    Parameters:
+    - dic_comments (dict): Dictionary where keys are locations and values are lists of comments.
+    - max_concurrency (int): Maximum number of requests in flight. Defaults to OPENAI_MAX_CONCURRENCY.
+    - previous_analyses (dict): Dictionary mapping locations to a (comments fingerprint, analysis)
+      tuple from the last update, as returned by data_processing.get_previous_analyses.
+    - stop_event (threading.Event): Set by the caller to stop every stream, such as a job's cancel event.
+
+    Yields:
+    - tuple: (location, text) pairs where text is the analysis received so far for the location.
+      The last pair of each location holds its complete analysis.
+    """
+    max_concurrency = OPENAI_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+    unchanged_analyses, changed_comments = split_unchanged_locations(dic_comments, previous_analyses)
+    yield from unchanged_analyses.items()
+    if not changed_comments:
+        return
+
+    # Reuse the process-wide OpenAI client
+    client = clients.get_openai_client()
+    updates = queue.Queue()
+    done = object()
+    # Set when the caller stops iterating
+    stopped = threading.Event()
+
+    def is_stopped():
+        return stopped.is_set() or (stop_event is not None and stop_event.is_set())
+
+    def stream_into_queue(location, comments):
+        texts = stream_location_analysis(client, location, comments)
+        try:
+            if is_stopped():
+                return
+            with telemetry.span("openai.stream_location_analysis", location=location, comments=len(comments)):
+                for text in texts:
+                    if is_stopped():
+                        break
+                    updates.put((location, keep_previous_on_error(location, text, previous_analyses)))
+        finally:
+            # Closing the generator closes the response of a stream in progress
+            texts.close()
+            updates.put(done)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for location, comments in changed_comments.items():
+            executor.submit(telemetry.bind_context(stream_into_queue), location, comments)
+
+        remaining = len(changed_comments)
+        try:
+            while remaining:
+                update = updates.get()
+                if update is done:
+                    remaining -= 1
+                else:
+                    yield update
+        finally:
+            # When the caller stops early, locations that have not started are not analyzed and
+            # the streams in progress stop at their next chunk
+            stopped.set()
+            executor.shutdown(cancel_futures=True)
+
+
+
+def build_positive_summary_messages(feedback_list):
+    """
+    Builds the few-shot chat messages asking for a summary of positive feedback.
 
     Parameters:
     - feedback_list (list): List of positive feedback comments.
 
     Returns:
-    - str: A summary of positive feedback.
+    - list: The chat messages to send.
     """
-    # Initialize OpenAI client with API key
-    client = OpenAI(api_key=st.secrets["openai"]['openai_key'])
-
     # Join comments into a single string for context
     comments_text = " ".join([comment for comment in feedback_list if comment])
 
-    try:
-        # Use the OpenAI Chat API to summarize positive feedback
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system",
-                 "content": "You are an assistant that summarizes positive aspects of feedback from customers."},
-
-                # Few-shot example with feedback
-                {"role": "user",
-                 "content": "Summarize the positive feedback about EDMO based on these comments: ['The staff is amazing.', 'My child loves the activities.', 'Great overall experience.']"},
-                {"role": "assistant", "content": """
+    return [
+        {"role": "system",
+         "content": "You are an assistant that summarizes positive aspects of feedback from customers."},
+
+        # Few-shot example with feedback
+        {"role": "user",
+         "content": "Summarize the positive feedback about EDMO based on these comments: ['The staff is amazing.', 'My child loves the activities.', 'Great overall experience.']"},
+        {"role": "assistant", "content": """
 Parents appreciate the positive environment and the engaging activities at EDMO. Many noted that the staff is friendly and helpful, and children enjoy attending the program. Overall, the feedback highlights a strong sense of satisfaction with the program.
-                """},
+        """},
 
-                # Few-shot example with no comments
-                {"role": "user",
-                 "content": "Summarize the positive feedback about EDMO based on these comments: []"},
-                {"role": "assistant", "content": """
+        # Few-shot example with no comments
+        {"role": "user",
+         "content": "Summarize the positive feedback about EDMO based on these comments: []"},
+        {"role": "assistant", "content": """
 There is no positive feedback available at this time.
-                """},
+        """},
 
-                # Actual prompt for the current list of positive feedback
-                {"role": "user",
-                 "content": f"Summarize the positive feedback about EDMO based on these comments: {comments_text or '[]'}"}
-            ]
-        )
+        # Actual prompt for the current list of positive feedback
+        {"role": "user",
+         "content": f"Summarize the positive feedback about EDMO based on these comments: {comments_text or '[]'}"}
+    ]
+
+
+def summarize_positive_feedback(feedback_list, previous_summary=None, previous_hash=None):
+    """
+    Summarizes positive feedback comments using OpenAI Chat API.
+
+    The previous summary is returned without calling the API when the comments fingerprint
+    matches the one stored with it.
+
+    Parameters:
+    - feedback_list (list): List of positive feedback comments.
+    - previous_summary (str): Summary from the last update.
+    - previous_hash (str): Comments fingerprint stored with the previous summary.
+
+    Returns:
+    - str: A summary of positive feedback, or the previous summary if the API call failed.
+    """
+    # Reuse the previous summary if the comments did not change
+    if previous_summary and previous_hash == hash_comments(feedback_list):
+        return previous_summary
 
-        # Extract and clean the response content
-        summary = response.choices[0].message.content.strip()
-        return summary
+    # Reuse the process-wide OpenAI client
+    client = clients.get_openai_client()
+
+    try:
+        # Use the OpenAI Chat API to summarize positive feedback, in chunks if it exceeds the token budget
+        return map_reduce_completion(
+            client, "gpt-4o-mini", "positive_summary", feedback_list, build_positive_summary_messages,
+            "Combine these partial summaries of the positive feedback about EDMO into a single summary."
+        )
 
     except Exception as e:
         print(f"Error in API call for positive feedback: {e}")
-        return "Error generating summary for positive feedback."
+        # Never replace a good summary with the error message
+        if previous_summary and previous_summary != POSITIVE_SUMMARY_ERROR_MESSAGE:
+            return previous_summary
+        return POSITIVE_SUMMARY_ERROR_MESSAGE
 
 
-def summarize_improvement_feedback(feedback_list):
+def build_improvement_summary_messages(feedback_list):
     """
-    Summarizes improvement feedback comments using OpenAI Chat API.
+    Builds the few-shot chat messages asking for a summary of improvement feedback.
 
     Parameters:
-    - feedback_list (list): List of feedback comments about areas for improvement.
+    - feedback_list (list): List of improvement feedback comments.
 
     Returns:
-    - str: A summary of improvement feedback.
+    - list: The chat messages to send.
     """
-    # Initialize OpenAI client with API key
-    client = OpenAI(api_key=st.secrets["openai"]['openai_key'])
-
     # Join comments into a single string for context
     comments_text = " ".join([comment for comment in feedback_list if comment])
 
-    try:
-        # Use the OpenAI Chat API to summarize improvement feedback
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system",
-                 "content": "You are an assistant that summarizes areas for improvement based on customer feedback."},
-
-                # Few-shot example with feedback
-                {"role": "user",
-                 "content": "Summarize the areas for improvement in EDMO based on these comments: ['The pick-up process could be smoother.', 'More structured activities for kids.', 'Kids sometimes seemed bored.']"},
-                {"role": "assistant", "content": """
+    return [
+        {"role": "system",
+         "content": "You are an assistant that summarizes areas for improvement based on customer feedback."},
+
+        # Few-shot example with feedback
+        {"role": "user",
+         "content": "Summarize the areas for improvement in EDMO based on these comments: ['The pick-up process could be smoother.', 'More structured activities for kids.', 'Kids sometimes seemed bored.']"},
+        {"role": "assistant", "content": """
 Areas for improvement include refining the pick-up process to make it more efficient, adding more structured activities to maintain engagement, and addressing occasional boredom reported by children. These changes could enhance the overall experience.
-                """},
+        """},
 
-                # Few-shot example with no comments
-                {"role": "user",
-                 "content": "Summarize the areas for improvement in EDMO based on these comments: []"},
-                {"role": "assistant", "content": """
+        # Few-shot example with no comments
+        {"role": "user",
+         "content": "Summarize the areas for improvement in EDMO based on these comments: []"},
+        {"role": "assistant", "content": """
 There are no specific areas for improvement mentioned at this time.
-                """},
+        """},
 
-                # Actual prompt for the current list of improvement feedback
-                {"role": "user",
-                 "content": f"Summarize the areas for improvement in EDMO based on these comments: {comments_text or '[]'}"}
-            ]
-        )
+        # Actual prompt for the current list of improvement feedback
+        {"role": "user",
+         "content": f"Summarize the areas for improvement in EDMO based on these comments: {comments_text or '[]'}"}
+    ]
 
-        # Extract and clean the response content
-        summary = response.choices[0].message.content.strip()
-        return summary
+
+def summarize_improvement_feedback(feedback_list, previous_summary=None, previous_hash=None):
+    """
+    Summarizes improvement feedback comments using OpenAI Chat API.
+
+    The previous summary is returned without calling the API when the comments fingerprint
+    matches the one stored with it.
+
+    Parameters:
+    - feedback_list (list): List of feedback comments about areas for improvement.
+    - previous_summary (str): Summary from the last update.
+    - previous_hash (str): Comments fingerprint stored with the previous summary.
+
+    Returns:
+    - str: A summary of improvement feedback, or the previous summary if the API call failed.
+    """
+    # Reuse the previous summary if the comments did not change
+    if previous_summary and previous_hash == hash_comments(feedback_list):
+        return previous_summary
+
+    # Reuse the process-wide OpenAI client
+    client = clients.get_openai_client()
+
+    try:
+        # Use the OpenAI Chat API to summarize improvement feedback, in chunks if it exceeds the token budget
+        return map_reduce_completion(
+            client, "gpt-4o-mini", "improvement_summary", feedback_list, build_improvement_summary_messages,
+            "Combine these partial summaries of the areas for improvement in EDMO into a single summary."
+        )
 
     except Exception as e:
         print(f"Error in API call for improvement feedback: {e}")
-        return "Error generating summary for improvement feedback."
+        # Never replace a good summary with the error message
+        if previous_summary and previous_summary != IMPROVEMENT_SUMMARY_ERROR_MESSAGE:
+            return previous_summary
+        return IMPROVEMENT_SUMMARY_ERROR_MESSAGE
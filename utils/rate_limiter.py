@@ -0,0 +1,65 @@
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that refills continuously up to its capacity.
+
+    Parameters:
+    - capacity (float): Maximum number of tokens the bucket can hold.
+    - refill_per_second (float): Number of tokens added back every second.
+    """
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.refill_per_second)
+        self._updated_at = now
+
+    def acquire(self, amount=1):
+        """
+        Blocks until `amount` tokens are available and takes them from the bucket.
+
+        Parameters:
+        - amount (float): Number of tokens to take. Amounts above the capacity are capped to it.
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait_seconds = (amount - self._tokens) / self.refill_per_second
+            time.sleep(wait_seconds)
+
+
+class RateLimiter:
+    """
+    Keeps API calls under a requests-per-minute and a tokens-per-minute limit.
+
+    Parameters:
+    - requests_per_minute (int): Maximum number of requests per minute.
+    - tokens_per_minute (int): Maximum number of tokens per minute.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+
+    def acquire(self, tokens):
+        """
+        Blocks until one request using `tokens` tokens fits within both limits.
+
+        Parameters:
+        - tokens (int): Estimated number of tokens used by the request.
+        """
+        self.requests.acquire(1)
+        self.tokens.acquire(tokens)
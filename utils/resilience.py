@@ -0,0 +1,251 @@
+import time
+import threading
+from email.utils import parsedate_to_datetime
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+from utils import telemetry
+
+# Maximum number of attempts of a call, the first one included
+RETRY_MAX_ATTEMPTS = 5
+
+# Exponential backoff between attempts: first wait and longest wait, in seconds, before jitter
+RETRY_INITIAL_WAIT_SECONDS = 1
+RETRY_MAX_WAIT_SECONDS = 60
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+# Number of consecutive upstream failures after which calls fail fast, and seconds before trying again
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 60
+
+# Process-wide circuit breakers shared by every session: {service: CircuitBreaker}
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a service after consecutive upstream failures, then lets a single trial call
+    through once `reset_seconds` have passed.
+
+    Parameters:
+    - service (str): The name of the service, used in error messages.
+    - failure_threshold (int): Consecutive failures that open the circuit.
+    - reset_seconds (float): Seconds the circuit stays open before a trial call.
+    """
+
+    def __init__(self, service, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Checks that the service may be called.
+
+        Raises:
+        - CircuitOpenError: If the circuit is open, or half-open with a trial call already in flight.
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_seconds or self.trial_in_flight:
+                raise CircuitOpenError(f"{self.service} is unavailable, calls are suspended for a while")
+            self.trial_in_flight = True
+
+    def record_success(self):
+        """Closes the circuit after a successful call."""
+        with self.lock:
+            self.failures, self.opened_at, self.trial_in_flight = 0, None, False
+
+    def record_failure(self):
+        """Counts an upstream failure and opens the circuit once the threshold is reached."""
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    current_span = telemetry.get_current_span()
+                    if current_span is not None:
+                        current_span.set_attributes(circuit_opened=self.service, circuit_failures=self.failures)
+                self.opened_at = time.monotonic()
+
+    def get_state(self):
+        """
+        Returns the state of the circuit.
+
+        Returns:
+        - str: 'closed', 'open' or 'half-open'.
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - self.opened_at < self.reset_seconds else "half-open"
+
+
+def get_circuit_breaker(service):
+    """
+    Returns the process-wide circuit breaker of a service.
+
+    Parameters:
+    - service (str): The name of the service, such as "openai" or "sheets".
+
+    Returns:
+    - CircuitBreaker: The service's circuit breaker.
+    """
+    with _circuit_breakers_lock:
+        if service not in _circuit_breakers:
+            _circuit_breakers[service] = CircuitBreaker(service)
+        return _circuit_breakers[service]
+
+def get_status_code(error):
+    """
+    Extracts the HTTP status of an OpenAI or gspread error.
+
+    Parameters:
+    - error (Exception): The raised error.
+
+    Returns:
+    - int: The HTTP status, or None if the error carries no response.
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+def is_connection_error(error):
+    """
+    Tells whether an error is a network failure or a timeout, without any HTTP response.
+
+    Parameters:
+    - error (Exception): The raised error.
+
+    Returns:
+    - bool: True for connection errors and timeouts.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # openai.APIConnectionError, openai.APITimeoutError, requests.ConnectionError and requests.Timeout
+    return any(cls.__name__ in ("APIConnectionError", "APITimeoutError", "ConnectionError", "Timeout")
+               for cls in type(error).__mro__)
+
+def is_retryable(error):
+    """
+    Tells whether a failed call is worth retrying.
+
+    Parameters:
+    - error (Exception): The raised error.
+
+    Returns:
+    - bool: True for rate limits, server errors, timeouts and connection errors.
+    """
+    return get_status_code(error) in RETRYABLE_STATUS_CODES or is_connection_error(error)
+
+def is_upstream_failure(error):
+    """
+    Tells whether an error means the service itself is failing, as opposed to rate limiting or a bad request.
+
+    Parameters:
+    - error (Exception): The raised error.
+
+    Returns:
+    - bool: True for server errors, timeouts and connection errors.
+    """
+    status_code = get_status_code(error)
+    return (status_code is not None and status_code >= 500) or is_connection_error(error)
+
+def get_retry_after(error):
+    """
+    Reads how long the service asked to wait before retrying, from the Retry-After headers of its response.
+
+    Parameters:
+    - error (Exception): The raised error.
+
+    Returns:
+    - float: The number of seconds to wait, or None if the response gives none.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+def wait_with_retry_after(retry_state):
+    """
+    tenacity wait strategy: exponential backoff with jitter, but never less than the Retry-After of the response.
+
+    Parameters:
+    - retry_state (tenacity.RetryCallState): The state of the retried call.
+
+    Returns:
+    - float: The number of seconds to wait before the next attempt.
+    """
+    backoff = wait_exponential_jitter(initial=RETRY_INITIAL_WAIT_SECONDS, max=RETRY_MAX_WAIT_SECONDS)(retry_state)
+    retry_after = get_retry_after(retry_state.outcome.exception())
+    return min(max(backoff, retry_after or 0), RETRY_MAX_WAIT_SECONDS)
+
+def call_with_retry(service, func, *args, **kwargs):
+    """
+    Calls a service with retries and a circuit breaker.
+
+    Rate limits, server errors and connection errors are retried with exponential backoff and jitter,
+    honoring Retry-After. Other errors are raised at once. Server and connection errors count toward
+    the service's circuit breaker; while it is open, calls raise CircuitOpenError without reaching the service.
+
+    Parameters:
+    - service (str): The name of the service, such as "openai" or "sheets".
+    - func (callable): The call to make.
+    - *args, **kwargs: Arguments of the call.
+
+    Returns:
+    - The value returned by the call.
+    """
+    breaker = get_circuit_breaker(service)
+
+    def attempt():
+        breaker.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if is_upstream_failure(e):
+                breaker.record_failure()
+            else:
+                with breaker.lock:
+                    breaker.trial_in_flight = False
+            raise
+        breaker.record_success()
+        return result
+
+    def record_retry(retry_state):
+        # Retries are counted on the span of the call, such as openai.chat_completion
+        current_span = telemetry.get_current_span()
+        if current_span is not None:
+            current_span.set_attributes(
+                retries=retry_state.attempt_number, last_retry_error=str(retry_state.outcome.exception()),
+                retry_wait_s=round(current_span.attributes.get("retry_wait_s", 0) + retry_state.next_action.sleep, 3)
+            )
+
+    retrying = Retrying(
+        stop=stop_after_attempt(RETRY_MAX_ATTEMPTS),
+        wait=wait_with_retry_after,
+        retry=retry_if_exception(is_retryable),
+        before_sleep=record_retry,
+        reraise=True
+    )
+    return retrying(attempt)
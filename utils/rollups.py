@@ -0,0 +1,243 @@
+import numpy as np
+import pandas as pd
+from utils import aggregate_cache, data_cleaning, ingestion, telemetry
+
+# Length of the periods the rollups are stored at. Trends are answered for any multiple of it
+ROLLUP_FREQ = "D"
+
+# Default length of the periods of a trend: "W" for weeks starting on Monday, "M" for calendar months
+TREND_FREQ = "W"
+
+
+def get_rollup_columns():
+    """
+    Returns the columns of a rollup table, built from ingestion.RATING_COLUMNS when first needed
+    since the utils modules import each other.
+
+    Returns:
+    - tuple: The sum column and the count column of each rating, then every column of the table,
+      ending with 'Responses'.
+    """
+    sum_columns = [f"{column} Sum" for column in ingestion.RATING_COLUMNS]
+    count_columns = [f"{column} Count" for column in ingestion.RATING_COLUMNS]
+    return sum_columns, count_columns, sum_columns + count_columns + ["Responses"]
+
+def empty_rollup_table():
+    """
+    Returns a rollup table without any period.
+
+    Returns:
+    - pd.DataFrame: An empty table indexed by 'Location' and 'Period'.
+    """
+    columns = get_rollup_columns()[2]
+    index = pd.MultiIndex.from_arrays([pd.Index([], dtype=object), pd.DatetimeIndex([])], names=["Location", "Period"])
+    return pd.DataFrame(np.zeros((0, len(columns))), index=index, columns=columns)
+
+def summarize_rollups(table, labels):
+    """
+    Sums rollup rows per location and label, and turns the sums into mean ratings like
+    data_processing.create_grouped_df.
+
+    Parameters:
+    - table (pd.DataFrame): Rollup rows indexed by 'Location' and 'Period'.
+    - labels (array-like): The period of the trend each row belongs to, aligned with `table`.
+
+    Returns:
+    - pd.DataFrame: One row per location and period with 'Location', 'Period', the mean of each
+      rating, 'Combined Mean' and 'Responses', sorted by period then location.
+    """
+    sum_columns, count_columns, _ = get_rollup_columns()
+    totals = table.groupby([table.index.get_level_values("Location"), pd.Index(labels, name="Period")], sort=True).sum()
+    counts = totals[count_columns].to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, totals[sum_columns].to_numpy() / np.maximum(counts, 1), np.nan)
+
+    trend = pd.DataFrame(means, columns=ingestion.RATING_COLUMNS, index=totals.index).round(2)
+    trend['Combined Mean'] = trend[ingestion.RATING_COLUMNS].mean(axis=1).round(2)
+    trend['Responses'] = totals["Responses"].astype("int64")
+    return trend.reset_index().sort_values(["Period", "Location"], ignore_index=True)
+
+
+class SurveyRollups:
+    """
+    Per-location rating sums and counts of each ROLLUP_FREQ period, maintained batch by batch, so
+    trends over any window are computed from the periods it covers instead of from every response.
+
+    Responses without a readable timestamp are counted in `undated` and left out of the trends.
+
+    Parameters:
+    - table (pd.DataFrame): Existing rollups, as built by `update`. Not modified.
+    - undated (int): Number of responses without a timestamp in the existing rollups.
+    """
+
+    def __init__(self, table=None, undated=0):
+        self.table = empty_rollup_table() if table is None else table
+        self.undated = undated
+
+    def update(self, cleaned_df, timestamps):
+        """
+        Adds a batch of cleaned survey rows to the rollups of their periods.
+
+        Parameters:
+        - cleaned_df (pd.DataFrame): Rows cleaned by data_cleaning.clean_data_midyear_endofession.
+        - timestamps (pd.Series): Submission time of each row, as returned by data_cleaning.get_response_timestamps.
+        """
+        timestamps = pd.Series(np.asarray(timestamps, dtype="datetime64[ns]"))
+        dated = timestamps.notna().to_numpy()
+        self.undated += int((~dated).sum())
+        if not dated.any():
+            return
+
+        ratings = cleaned_df[ingestion.RATING_COLUMNS].astype("float64")[dated]
+        keys = [
+            cleaned_df["Location"].to_numpy(dtype=object)[dated],
+            timestamps[dated].dt.to_period(ROLLUP_FREQ).dt.start_time.to_numpy()
+        ]
+        grouped = ratings.groupby(keys, sort=False)
+        batch = pd.concat([grouped.sum(), grouped.count(), grouped.size()], axis=1)
+        batch.columns = get_rollup_columns()[2]
+        batch.index.names = ["Location", "Period"]
+
+        # Aligning on the index adds the batch to existing periods and inserts the new ones.
+        # The table is replaced, not modified, so shared rollups stay unchanged
+        self.table = self.table.add(batch, fill_value=0).sort_index()
+
+    def window(self, start=None, end=None, locations=None):
+        """
+        Returns the rollup rows of the periods within a window.
+
+        Parameters:
+        - start: First day of the window, anything pd.Timestamp accepts. Unbounded when None.
+        - end: Last day of the window, included. Unbounded when None.
+        - locations (list): Locations to keep. Keeps every location when None.
+
+        Returns:
+        - pd.DataFrame: The matching rollup rows.
+        """
+        periods = self.table.index.get_level_values("Period")
+        mask = np.ones(len(self.table), dtype=bool)
+        if start is not None:
+            mask &= periods >= pd.Timestamp(start).normalize()
+        if end is not None:
+            mask &= periods <= pd.Timestamp(end).normalize()
+        if locations is not None:
+            mask &= self.table.index.get_level_values("Location").isin(list(locations))
+        return self.table[mask]
+
+    def query(self, start=None, end=None, freq=TREND_FREQ, locations=None):
+        """
+        Computes the mean ratings of each location per period within a window.
+
+        Parameters:
+        - start: First day of the window, anything pd.Timestamp accepts. Unbounded when None.
+        - end: Last day of the window, included. Unbounded when None.
+        - freq (str): pandas period alias of the trend, such as "D", "W" or "M". None for a single
+          row per location over the whole window, labelled with the first day of the window.
+        - locations (list): Locations to keep. Keeps every location when None.
+
+        Returns:
+        - pd.DataFrame: See summarize_rollups. 'Period' is the first day of each period.
+        """
+        with telemetry.span("rollups.query", freq=str(freq)) as query_span:
+            rows = self.window(start, end, locations)
+            periods = rows.index.get_level_values("Period")
+            if freq is None:
+                labels = np.full(len(rows), pd.Timestamp(start).normalize() if start is not None else periods.min())
+            else:
+                labels = periods.to_period(freq).start_time
+            query_span.set_attributes(rollup_rows=len(rows))
+            return summarize_rollups(rows, labels)
+
+    def session_trend(self, session_starts, locations=None):
+        """
+        Computes the mean ratings of each location per session.
+
+        Each session runs from its start until the start of the next one; the last session is open-ended.
+        Periods before the first session are left out.
+
+        Parameters:
+        - session_starts (dict): First day of each session by session name, such as {"Session 1": "2024-06-03"}.
+        - locations (list): Locations to keep. Keeps every location when None.
+
+        Returns:
+        - pd.DataFrame: See summarize_rollups, with the session name as 'Period', in session order.
+        """
+        sessions = sorted((pd.Timestamp(start).normalize(), name) for name, start in session_starts.items())
+        if not sessions:
+            return summarize_rollups(self.table[:0], [])
+
+        rows = self.window(sessions[0][0], None, locations)
+        # Index of the session each period belongs to, so the trend is sorted in session order
+        positions = np.searchsorted([start for start, _ in sessions], rows.index.get_level_values("Period"), side="right") - 1
+        trend = summarize_rollups(rows, positions)
+        trend["Period"] = [sessions[position][1] for position in trend["Period"]]
+        return trend
+
+    def to_cache_value(self):
+        """
+        Returns the state of the rollups as plain pandas and Python objects, for aggregate_cache.
+
+        Returns:
+        - tuple: The rollup table and the number of undated responses.
+        """
+        return self.table, self.undated
+
+
+def build_survey_rollups(responses, clean_function=None):
+    """
+    Builds the rollups of a whole response worksheet.
+
+    Parameters:
+    - responses (pd.DataFrame): A response worksheet as returned by google_services.load_worksheets.
+    - clean_function (callable): Turns the worksheet into a frame following data_cleaning.CLEANED_SURVEY_SCHEMA,
+      one row per response in the same order. Defaults to data_cleaning.clean_data_midyear_endofession.
+
+    Returns:
+    - SurveyRollups: The rollups of every response.
+    """
+    clean_function = clean_function or data_cleaning.clean_data_midyear_endofession
+    with telemetry.span("rollups.build", rows=len(responses)):
+        rollups = SurveyRollups()
+        if not responses.empty:
+            # Reuses the cleaning of data_cleaning.aggregate_survey_responses on the same snapshot
+            cleaned_df = data_cleaning.clean_survey_responses(responses, clean_function)
+            rollups.update(cleaned_df, data_cleaning.get_response_timestamps(responses))
+        return rollups
+
+def get_survey_rollups(responses, clean_function=None):
+    """
+    Returns the rollups of a response worksheet, built once per version of its content and shared
+    by every page and session reading it, like data_cleaning.aggregate_survey_responses.
+
+    Parameters:
+    - responses (pd.DataFrame): A response worksheet as returned by google_services.load_worksheets.
+    - clean_function (callable): Turns the worksheet into a frame following data_cleaning.CLEANED_SURVEY_SCHEMA.
+      Defaults to data_cleaning.clean_data_midyear_endofession.
+
+    Returns:
+    - SurveyRollups: The rollups of every response.
+    """
+    clean_function = clean_function or data_cleaning.clean_data_midyear_endofession
+    key = ("survey_rollups", aggregate_cache.fingerprint_frame(responses), clean_function)
+    table, undated = aggregate_cache.get_aggregate_cache().get_or_compute(
+        key, lambda: build_survey_rollups(responses, clean_function).to_cache_value()
+    )
+    return SurveyRollups(table, undated)
+
+def get_ingested_rollups(sheet_name, worksheet_name, ttl=None):
+    """
+    Returns the rollups of a response worksheet maintained by incremental ingestion, after fetching
+    the rows added since the last call. See ingestion.ingest_survey_worksheet.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_name (str): The response worksheet, as named in google_services.WORKSHEETS.
+    - ttl (float): Minimum number of seconds between two polls. Defaults to google_services.SHEETS_CACHE_TTL_SECONDS.
+
+    Returns:
+    - SurveyRollups: A copy of the worksheet's rollups, unaffected by later ingestion.
+    """
+    ingestion.ingest_survey_worksheet(sheet_name, worksheet_name, ttl)
+    state = ingestion.get_ingestion_state(sheet_name, worksheet_name)
+    with state.lock:
+        return SurveyRollups(*state.rollups.to_cache_value())
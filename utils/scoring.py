@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+# Scale applied to each satisfaction column; the second one is on a 10-point scale
+SATISFACTION_SCALES = [1.0, 0.5]
+
+
+def encode_responses(feedback_df, column_indices, response_encoding):
+    """
+    Encodes the answers of the given columns as scores in a single float matrix.
+
+    Likert labels are turned into Categorical int8 codes and looked up in the encoding; answers that
+    are not Likert labels, such as 0-10 ratings, are converted to numbers. Missing or unparseable
+    answers become NaN.
+
+    Parameters:
+    - feedback_df (pd.DataFrame): The end-of-year responses.
+    - column_indices (list): Positions of the columns to encode.
+    - response_encoding (dict): Score of each Likert label.
+
+    Returns:
+    - np.ndarray: A (responses x columns) float64 matrix of scores.
+    """
+    labels = list(response_encoding)
+    label_scores = np.array([response_encoding[label] for label in labels], dtype=np.float64)
+    encoded = np.empty((len(feedback_df), len(column_indices)), dtype=np.float64)
+
+    for position, column_index in enumerate(column_indices):
+        column = feedback_df.iloc[:, column_index]
+        codes = pd.Categorical(column, categories=labels).codes
+        numeric = pd.to_numeric(column.where(codes < 0), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        encoded[:, position] = np.where(codes >= 0, label_scores[codes], numeric)
+
+    return encoded
+
+def build_weight_matrix(dimensions, column_indices):
+    """
+    Builds the dimension-by-question weight matrix.
+
+    Each dimension weighs its questions equally unless its details provide a 'weights' list
+    aligned with its 'indices'.
+
+    Parameters:
+    - dimensions (dict): Dimension details with the column 'indices' of their questions.
+    - column_indices (list): Positions of the encoded columns, in matrix order.
+
+    Returns:
+    - np.ndarray: A (dimensions x columns) float64 matrix of weights.
+    """
+    positions = {column_index: position for position, column_index in enumerate(column_indices)}
+    weights = np.zeros((len(dimensions), len(column_indices)), dtype=np.float64)
+    for row, details in enumerate(dimensions.values()):
+        for column_index, weight in zip(details["indices"], details.get("weights", [1.0] * len(details["indices"]))):
+            weights[row, positions[column_index]] = weight
+    return weights
+
+def weighted_row_means(encoded, weights):
+    """
+    Computes every respondent's weighted mean per group of columns, ignoring missing answers.
+
+    Parameters:
+    - encoded (np.ndarray): A (responses x columns) matrix of scores with NaN for missing answers.
+    - weights (np.ndarray): A (groups x columns) matrix of weights.
+
+    Returns:
+    - np.ndarray: A (responses x groups) matrix of means, NaN where a respondent answered none of the group's columns.
+    """
+    answered = ~np.isnan(encoded)
+    sums = np.where(answered, encoded, 0) @ weights.T
+    totals = answered.astype(np.float64) @ weights.T
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(totals > 0, sums / totals, np.nan)
+
+def column_means(values):
+    """
+    Averages each column, ignoring NaN.
+
+    Parameters:
+    - values (np.ndarray): A 2-D matrix.
+
+    Returns:
+    - np.ndarray: The mean of each column, NaN for columns without any value.
+    """
+    present = ~np.isnan(values)
+    counts = present.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, np.where(present, values, 0).sum(axis=0) / counts, np.nan)
+
+def compute_endofyear_scores(feedback_df, dimensions, response_encoding, satisfaction_indices):
+    """
+    Computes the mean score of every dimension and the combined satisfaction score in one pass.
+
+    A dimension's score is the mean over respondents of each respondent's mean answer to the
+    dimension's questions. The satisfaction score averages the satisfaction columns the same way,
+    after bringing the 10-point one down to a 5-point scale.
+
+    Parameters:
+    - feedback_df (pd.DataFrame): The end-of-year responses.
+    - dimensions (dict): Dimension details with the column 'indices' of their questions.
+    - response_encoding (dict): Score of each Likert label.
+    - satisfaction_indices (list): Positions of the satisfaction columns.
+
+    Returns:
+    - dict: 'dimension_scores', a list of (dimension, score) tuples sorted by descending score,
+      and 'satisfaction_score', the combined satisfaction mean.
+    """
+    question_indices = sorted({index for details in dimensions.values() for index in details["indices"]})
+    encoded = encode_responses(feedback_df, question_indices + list(satisfaction_indices), response_encoding)
+    questions, satisfaction = encoded[:, :len(question_indices)], encoded[:, len(question_indices):]
+
+    dimension_means = column_means(weighted_row_means(questions, build_weight_matrix(dimensions, question_indices)))
+    satisfaction_weights = np.ones((1, len(satisfaction_indices)), dtype=np.float64)
+    satisfaction_mean = column_means(weighted_row_means(
+        satisfaction * np.array(SATISFACTION_SCALES[:len(satisfaction_indices)], dtype=np.float64), satisfaction_weights
+    ))[0]
+
+    dimension_scores = sorted(
+        zip(dimensions, dimension_means.astype(float)), key=lambda item: item[1], reverse=True
+    )
+    return {"dimension_scores": dimension_scores, "satisfaction_score": float(satisfaction_mean)}
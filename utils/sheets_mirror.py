@@ -0,0 +1,179 @@
+"""
+Local Parquet mirror of the dashboard spreadsheet.
+
+Downloads every worksheet in one batch request and stores it as a typed Parquet file next to a
+manifest, so the pages can read local data (see google_services.USE_SHEETS_MIRROR). Run it from
+the repository root, for instance from cron:
+
+    python -m utils.sheets_mirror
+"""
+import os
+import json
+import argparse
+from datetime import datetime
+import pandas as pd
+import gspread
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils import google_services
+
+MANIFEST_FILE = "manifest.json"
+
+
+def to_typed_frame(dataframe):
+    """
+    Gives every column of a worksheet a single type so it can be stored in Parquet.
+
+    Columns whose cells are all numbers or all text keep their type. Columns mixing numbers and
+    text, including numbers next to empty cells, are stored as text and listed as mixed, so
+    from_typed_frame can restore the type of each cell.
+
+    Parameters:
+    - dataframe (pd.DataFrame): A worksheet as returned by google_services.records_to_dataframe.
+
+    Returns:
+    - tuple: The typed worksheet and the list of its mixed columns.
+    """
+    typed, mixed_columns = {}, []
+    for name, column in dataframe.items():
+        if column.dtype == object and not column.map(lambda value: isinstance(value, str)).all():
+            mixed_columns.append(str(name))
+            column = column.astype(str)
+        typed[str(name)] = column
+    return pd.DataFrame(typed, index=dataframe.index), mixed_columns
+
+def from_typed_frame(dataframe, mixed_columns):
+    """
+    Restores a worksheet stored by to_typed_frame, converting the numeric cells of mixed columns back
+    to numbers like google_services.records_to_dataframe does, so both paths read the same frame.
+
+    Parameters:
+    - dataframe (pd.DataFrame): The worksheet read from Parquet.
+    - mixed_columns (list): The columns stored as text by to_typed_frame.
+
+    Returns:
+    - pd.DataFrame: The worksheet with per-cell types in its mixed columns.
+    """
+    for name in mixed_columns:
+        dataframe[name] = pd.Series(gspread.utils.numericise_all(dataframe[name].tolist()), index=dataframe.index,
+                                    dtype=object)
+    return dataframe
+
+def get_mirror_path(sheet_name, mirror_dir=None):
+    """
+    Returns the directory holding the mirror of a spreadsheet.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - mirror_dir (str): Root directory of the mirrors. Defaults to google_services.SHEETS_MIRROR_DIR.
+
+    Returns:
+    - str: The directory of the spreadsheet's Parquet files and manifest.
+    """
+    return os.path.join(mirror_dir or google_services.SHEETS_MIRROR_DIR, sheet_name)
+
+def read_manifest(sheet_name, mirror_dir=None):
+    """
+    Reads the manifest of a spreadsheet's mirror.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - mirror_dir (str): Root directory of the mirrors.
+
+    Returns:
+    - dict: The manifest, with an entry per mirrored worksheet under 'worksheets'.
+    """
+    path = os.path.join(get_mirror_path(sheet_name, mirror_dir), MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"sheet_name": sheet_name, "worksheets": {}}
+    with open(path, encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+def write_worksheets(sheet_name, dataframes, mirror_dir=None):
+    """
+    Stores worksheets in the mirror and records them in the manifest.
+
+    Files are written under a temporary name and then renamed, so readers never see a partial file.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - dataframes (dict): DataFrames keyed by worksheet name.
+    - mirror_dir (str): Root directory of the mirrors.
+    """
+    path = get_mirror_path(sheet_name, mirror_dir)
+    os.makedirs(path, exist_ok=True)
+    manifest = read_manifest(sheet_name, mirror_dir)
+
+    for worksheet_name, dataframe in dataframes.items():
+        typed_frame, mixed_columns = to_typed_frame(dataframe)
+        table = pa.Table.from_pandas(typed_frame, preserve_index=False)
+        file_name = f"{worksheet_name}.parquet"
+        pq.write_table(table, os.path.join(path, file_name + ".tmp"))
+        os.replace(os.path.join(path, file_name + ".tmp"), os.path.join(path, file_name))
+        manifest["worksheets"][worksheet_name] = {
+            "file": file_name,
+            "rows": table.num_rows,
+            "schema": {field.name: str(field.type) for field in table.schema},
+            "mixed_columns": mixed_columns,
+            "synced_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    with open(os.path.join(path, MANIFEST_FILE + ".tmp"), "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(os.path.join(path, MANIFEST_FILE + ".tmp"), os.path.join(path, MANIFEST_FILE))
+
+def read_worksheets(sheet_name, worksheet_names, mirror_dir=None):
+    """
+    Reads worksheets from the mirror through memory-mapped Parquet files.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_names (list): Worksheets to read, as named in google_services.WORKSHEETS.
+    - mirror_dir (str): Root directory of the mirrors.
+
+    Returns:
+    - dict: A dictionary mapping each worksheet name to its DataFrame.
+    """
+    path = get_mirror_path(sheet_name, mirror_dir)
+    manifest = read_manifest(sheet_name, mirror_dir)
+    dataframes = {}
+    for worksheet_name in worksheet_names:
+        if worksheet_name not in manifest["worksheets"]:
+            raise FileNotFoundError(f"Worksheet '{worksheet_name}' is not mirrored yet, run `python -m utils.sheets_mirror`.")
+        entry = manifest["worksheets"][worksheet_name]
+        file_path = os.path.join(path, entry["file"])
+        dataframes[worksheet_name] = from_typed_frame(
+            pq.read_table(file_path, memory_map=True).to_pandas(), entry.get("mixed_columns", [])
+        )
+    return dataframes
+
+def sync_mirror(sheet_name="edmo_dashboard", worksheet_names=None, mirror_dir=None):
+    """
+    Downloads worksheets from Google Sheets in one batch request and stores them in the mirror.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_names (list): Worksheets to mirror. Defaults to every worksheet in google_services.WORKSHEETS.
+    - mirror_dir (str): Root directory of the mirrors.
+
+    Returns:
+    - dict: The updated manifest.
+    """
+    dataframes = google_services.fetch_worksheets(sheet_name, worksheet_names or google_services.WORKSHEETS)
+    write_worksheets(sheet_name, dataframes, mirror_dir)
+    return read_manifest(sheet_name, mirror_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mirror the dashboard spreadsheet into local Parquet files.")
+    parser.add_argument("--sheet-name", default="edmo_dashboard", help="Name of the Google Sheets file.")
+    parser.add_argument("--worksheets", nargs="*", default=None, help="Worksheets to mirror, all by default.")
+    parser.add_argument("--mirror-dir", default=None, help="Root directory of the mirrors.")
+    args = parser.parse_args()
+
+    manifest = sync_mirror(args.sheet_name, args.worksheets, args.mirror_dir)
+    for worksheet_name, entry in manifest["worksheets"].items():
+        print(f"{worksheet_name}: {entry['rows']} rows, synced at {entry['synced_at']}")
+
+
+if __name__ == '__main__':
+    main()
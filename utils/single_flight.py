@@ -0,0 +1,165 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+import streamlit as st
+from utils import google_services
+
+try:
+    import fcntl
+except ImportError:  # Without fcntl (Windows), only sessions of the same process share the lock
+    fcntl = None
+
+# Directory of the lock files shared by every dashboard process on the host
+SINGLE_FLIGHT_LOCK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "locks")
+
+# Maximum number of seconds a session waits for another session's regeneration
+SINGLE_FLIGHT_WAIT_SECONDS = 600
+
+# Number of seconds after a regeneration during which the next caller serves its result instead of running again
+SINGLE_FLIGHT_FRESH_SECONDS = 120
+
+# In-process locks, one per key, so threads of the same process do not rely on the file lock alone
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def get_thread_lock(key):
+    """
+    Returns the in-process lock of a key, creating it on first use.
+
+    Parameters:
+    - key (str): The name of the guarded operation.
+
+    Returns:
+    - threading.Lock: The lock of the key.
+    """
+    with _thread_locks_guard:
+        if key not in _thread_locks:
+            _thread_locks[key] = threading.Lock()
+        return _thread_locks[key]
+
+def try_acquire(thread_lock, lock_file):
+    """
+    Tries to take both the in-process lock and the file lock without waiting.
+
+    Parameters:
+    - thread_lock (threading.Lock): The in-process lock.
+    - lock_file (file): The open lock file.
+
+    Returns:
+    - bool: True if both locks are now held.
+    """
+    if not thread_lock.acquire(blocking=False):
+        return False
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            thread_lock.release()
+            return False
+    return True
+
+def release(thread_lock, lock_file):
+    """
+    Releases the locks taken by try_acquire.
+
+    Parameters:
+    - thread_lock (threading.Lock): The in-process lock.
+    - lock_file (file): The open lock file.
+    """
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    thread_lock.release()
+
+def read_completed_at(lock_file):
+    """
+    Reads when the guarded operation last completed, as stored in its lock file.
+
+    Parameters:
+    - lock_file (file): The open lock file.
+
+    Returns:
+    - float: The completion time as a Unix timestamp, 0 if it never completed.
+    """
+    lock_file.seek(0)
+    try:
+        return float(lock_file.read().strip() or 0)
+    except ValueError:
+        return 0
+
+def write_completed_at(lock_file):
+    """
+    Stores the current time as the completion time of the guarded operation.
+
+    Parameters:
+    - lock_file (file): The open lock file.
+    """
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(time.time()))
+    lock_file.flush()
+
+@contextmanager
+def single_flight(key, wait_timeout=None, fresh_for=None):
+    """
+    Lets a single session, across threads and processes of the host, run an operation at a time.
+
+    The context yields True to the session that must run the operation. Every other session waits
+    until that run is over, or until `wait_timeout`, and gets False: it should serve the result
+    instead of running the operation again. A caller also gets False when the operation completed
+    less than `fresh_for` seconds ago. A run that raises does not count as completed.
+
+    Parameters:
+    - key (str): The name of the guarded operation, such as '<sheet name>-<worksheet name>'.
+    - wait_timeout (float): Maximum number of seconds to wait for another run. Defaults to SINGLE_FLIGHT_WAIT_SECONDS.
+    - fresh_for (float): Seconds during which a completed run is reused. Defaults to SINGLE_FLIGHT_FRESH_SECONDS.
+
+    Yields:
+    - bool: Whether the caller must run the operation.
+    """
+    wait_timeout = SINGLE_FLIGHT_WAIT_SECONDS if wait_timeout is None else wait_timeout
+    fresh_for = SINGLE_FLIGHT_FRESH_SECONDS if fresh_for is None else fresh_for
+    thread_lock = get_thread_lock(key)
+    os.makedirs(SINGLE_FLIGHT_LOCK_DIR, exist_ok=True)
+    file_descriptor = os.open(os.path.join(SINGLE_FLIGHT_LOCK_DIR, f"{key}.lock"), os.O_RDWR | os.O_CREAT)
+
+    with os.fdopen(file_descriptor, "r+") as lock_file:
+        if not try_acquire(thread_lock, lock_file):
+            # Another session is running the operation, wait for it to finish
+            deadline = time.monotonic() + wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.5)
+                if try_acquire(thread_lock, lock_file):
+                    release(thread_lock, lock_file)
+                    break
+            yield False
+            return
+
+        try:
+            if time.time() - read_completed_at(lock_file) < fresh_for:
+                yield False
+            else:
+                yield True
+                write_completed_at(lock_file)
+        finally:
+            release(thread_lock, lock_file)
+
+def reload_leader_result(sheet_name, worksheet_name):
+    """
+    Reruns the page once with fresh worksheet data after another session regenerated it.
+
+    Returns without rerunning if the page was already reloaded for this reason, so a page whose
+    data is still incomplete does not rerun forever.
+
+    Parameters:
+    - sheet_name (str): The name of the Google Sheets file.
+    - worksheet_name (str): The regenerated worksheet.
+    """
+    session_key = f"reloaded_{sheet_name}_{worksheet_name}"
+    if st.session_state.get(session_key):
+        st.session_state[session_key] = False
+        return
+    st.session_state[session_key] = True
+    google_services.invalidate_sheets_cache(sheet_name, worksheet_name)
+    st.rerun()
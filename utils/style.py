@@ -1,20 +1,17 @@
 import streamlit as st
-import requests
 import base64
 import pandas as pd
+from utils import assets, scoring, telemetry
 
-def get_image_base64(image_path):
-    if image_path.startswith(('http://', 'https://')):
-        # For URLs: download the image first
-        response = requests.get(image_path)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        image_content = response.content
-    else:
-        # For local files: read directly
-        with open(image_path, "rb") as image_file:
-            image_content = image_file.read()
+# Number of location cards shown at once; longer lists are split into pages
+LOCATION_CARDS_PAGE_SIZE = 50
+
+# Height in pixels of the scrollable box holding the location cards, None to let the page grow with them
+LOCATION_CARDS_SCROLL_HEIGHT = None
 
-    return base64.b64encode(image_content).decode()
+def get_image_base64(image_path):
+    # The image is read or downloaded once per process
+    return base64.b64encode(assets.get_asset_bytes(image_path)).decode()
 
 
 
@@ -28,14 +25,15 @@ def set_bg_image(image_path, opacity=0.9, deploy=False):
     - deploy (bool): Set to True when deploying the app to use direct URL for the image.
     """
     if not deploy:
-        # Convert the image to base64 for local deployment
-        base64_image = get_image_base64(image_path)
+        # The image is scaled down and compressed once per process, then served from static files
+        # or inlined from memory
+        image_url = assets.get_image_url(image_path)
         st.markdown(
             f"""
             <style>
             .stApp {{
                 background-image: linear-gradient(rgba(255, 255, 255, {opacity}), rgba(255, 255, 255, {opacity})), 
-                url("data:image/png;base64,{base64_image}");
+                url("{image_url}");
                 background-size: cover;
                 background-position: center;
                 background-repeat: no-repeat;
@@ -121,6 +119,70 @@ def set_container_style_midyear_endofsession():
     """
     return container_style
 
+def get_location_container_html(location, rating, analysis):
+    """
+    Builds the styled container showing a location's rating and analysis.
+
+    Parameters:
+    - location (str): The location name.
+    - rating (float): The combined mean rating of the location.
+    - analysis (str): The analysis of the location's feedback.
+
+    Returns:
+    - str: The container HTML.
+    """
+    return f"""
+        <div class="container">
+            <div class="location-title">{location} <span class="rating">(Rating: {rating})</span></div>
+            <div class="sentiment"><strong>Overall Sentiment:</strong> {analysis}</div>
+        </div>
+        """
+
+def get_location_cards_html(locations, ratings, analyses):
+    """
+    Builds the containers of many locations in a single pass, to be sent to the page at once.
+
+    Parameters:
+    - locations (list): The location names.
+    - ratings (list): The combined mean rating of each location.
+    - analyses (list): The analysis of each location's feedback.
+
+    Returns:
+    - str: The HTML of every container, in the given order.
+    """
+    return "".join(
+        get_location_container_html(location, rating, analysis)
+        for location, rating, analysis in zip(locations, ratings, analyses)
+    )
+
+def display_location_cards(feedback, key):
+    """
+    Displays the container of every location with a single Streamlit element.
+
+    Lists longer than LOCATION_CARDS_PAGE_SIZE get a page selector, and only the selected page is
+    built and sent. With LOCATION_CARDS_SCROLL_HEIGHT set, the cards scroll inside a box of that height.
+
+    Parameters:
+    - feedback (pd.DataFrame): DataFrame with 'Location', 'Combined Mean' and 'Analysis' columns, in display order.
+    - key (str): Unique key of the page selector, such as the page's feedback worksheet name.
+    """
+    start, end = 0, len(feedback)
+    if len(feedback) > LOCATION_CARDS_PAGE_SIZE:
+        page_count = -(-len(feedback) // LOCATION_CARDS_PAGE_SIZE)
+        page = st.number_input(f"Page (1-{page_count})", min_value=1, max_value=page_count, step=1,
+                               key=f"{key}_cards_page")
+        start = (page - 1) * LOCATION_CARDS_PAGE_SIZE
+        end = min(start + LOCATION_CARDS_PAGE_SIZE, len(feedback))
+        st.caption(f"Locations {start + 1}-{end} of {len(feedback)}")
+
+    # Read the columns once instead of building a Series per row
+    page_feedback = feedback.iloc[start:end]
+    cards_html = get_location_cards_html(
+        page_feedback["Location"].tolist(), page_feedback["Combined Mean"].tolist(), page_feedback["Analysis"].tolist()
+    )
+    container = st.container(height=LOCATION_CARDS_SCROLL_HEIGHT) if LOCATION_CARDS_SCROLL_HEIGHT else st.container()
+    container.markdown(cards_html, unsafe_allow_html=True)
+
 def set_container_style_endofyear():
     """
     Sets custom style for containers with teal and golden yellow accents.
@@ -183,49 +245,39 @@ def set_container_style_endofyear():
 def configure_page_style_endofyear():
     """Configures the style settings for the Streamlit page."""
     pd.set_option('future.no_silent_downcasting', True)
-    set_bg_image(
-        image_path="https://raw.githubusercontent.com/OthmanBensoudaKoraichi/EDMO/refs/heads/main/images/colorkit.png",
-        opacity=0.3
-    )
+    set_bg_image(image_path=assets.BACKGROUND_PATH, opacity=0.3)
     st.markdown(set_button_style(), unsafe_allow_html=True)
     st.markdown(set_container_style_endofyear(), unsafe_allow_html=True)
 
 
 def display_dimensions_scores_endofyear(feedback_df, dimensions, response_encoding, satisfaction_indices):
     """Displays the dimensions, questions, and scores based on user feedback data."""
-    feedback_encoded = feedback_df.replace(response_encoding).apply(pd.to_numeric, errors='coerce')
-
-    dimension_means = {
-        dimension: feedback_encoded.iloc[:, details["indices"]].mean(axis=1).mean()
-        for dimension, details in dimensions.items()
-    }
-
-    sorted_dimensions = sorted(dimension_means.items(), key=lambda x: x[1], reverse=True)
-    satisfaction_scores = feedback_encoded.iloc[:, satisfaction_indices]
-    satisfaction_scores.iloc[:, 1] = satisfaction_scores.iloc[:, 1] / 2  # Normalize 10-point scale
-    combined_satisfaction_mean = satisfaction_scores.mean(axis=1).mean()
-
-    # Display each dimension's score
-    st.markdown("<div class='section-title'>Dimensions and Questions</div>", unsafe_allow_html=True)
-    for dimension, mean_score in sorted_dimensions:
-        details = dimensions[dimension]
-        questions_html = "".join([f"<li>{q}</li>" for q in details["questions"]])
+    with telemetry.span("pandas.compute_endofyear_scores", responses=len(feedback_df)):
+        scores = scoring.compute_endofyear_scores(feedback_df, dimensions, response_encoding, satisfaction_indices)
+    sorted_dimensions = scores["dimension_scores"]
+    combined_satisfaction_mean = scores["satisfaction_score"]
 
-        container_html = f"""
-        <div class="container">
-            <div class="location-title">{dimension} <span class="rating">(Score: {mean_score:.2f})</span></div>
-            <div class="sentiment">{details["summary"]}</div>
-            <ul>{questions_html}</ul>
-        </div>
-        """
-        st.markdown(container_html, unsafe_allow_html=True)
-
-    # Display overall satisfaction score
-    st.markdown("<div class='section-title'>Combined Satisfaction Score</div>", unsafe_allow_html=True)
-    overall_satisfaction_html = f"""
-    <div class="container">
-        <div class="location-title">Overall Satisfaction <span class="rating">(Score: {combined_satisfaction_mean:.2f})</span></div>
-        <div class="sentiment">Measures general satisfaction with EDMO and likelihood of recommending it to others.</div>
-    </div>
-    """
-    st.markdown(overall_satisfaction_html, unsafe_allow_html=True)
\ No newline at end of file
+    # Build each dimension's score and the overall satisfaction score, then display them at once
+    with telemetry.span("render.dimension_containers", dimensions=len(sorted_dimensions)):
+        dimensions_html = "".join(
+            f"""
+            <div class="container">
+                <div class="location-title">{dimension} <span class="rating">(Score: {mean_score:.2f})</span></div>
+                <div class="sentiment">{dimensions[dimension]["summary"]}</div>
+                <ul>{"".join(f"<li>{q}</li>" for q in dimensions[dimension]["questions"])}</ul>
+            </div>
+            """
+            for dimension, mean_score in sorted_dimensions
+        )
+        st.markdown(
+            f"""
+            <div class='section-title'>Dimensions and Questions</div>
+            {dimensions_html}
+            <div class='section-title'>Combined Satisfaction Score</div>
+            <div class="container">
+                <div class="location-title">Overall Satisfaction <span class="rating">(Score: {combined_satisfaction_mean:.2f})</span></div>
+                <div class="sentiment">Measures general satisfaction with EDMO and likelihood of recommending it to others.</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
\ No newline at end of file
@@ -0,0 +1,266 @@
+import streamlit as st
+from utils import (assets, data_cleaning, data_processing, google_services, jobs, openai_functions, rollups,
+                   single_flight, style, telemetry)
+
+# Browser tab title of the dashboard pages
+PAGE_TITLE = "EDMO End of Year Feedback Dashboard"
+
+# Read only the responses added since the last load instead of downloading the whole response worksheet
+# on every refresh. Form responses are only ever appended; after editing or deleting past responses,
+# call ingestion.reset_ingestion so they are read again
+SURVEY_INCREMENTAL_INGESTION = True
+
+# Period lengths offered by the trends chart, as pandas period aliases
+TREND_PERIODS = {"Week": "W", "Month": "M"}
+
+# Number of locations charted by default, the best rated first
+TREND_DEFAULT_LOCATIONS = 5
+
+
+class SurveyPage:
+    """
+    A dashboard page showing the rating and the feedback analysis of each location for one survey.
+
+    Parameters:
+    - feedback_worksheet (str): The worksheet holding the analysis of each location, such as "feedback_midyear".
+    - title (str): The heading of the page.
+    - response_worksheet (str): The worksheet holding the survey responses. Defaults to the one
+      google_services.PAGE_WORKSHEETS gives for the feedback worksheet.
+    - clean_function (callable): Turns the response worksheet into a frame following data_cleaning.CLEANED_SURVEY_SCHEMA.
+    - sheet_name (str): The name of the Google Sheets file.
+    - show_trends (bool): Whether to chart the ratings of each location over time.
+    - session_starts (dict): First day of each session by session name, such as {"Session 1": "2024-06-03"},
+      to also chart the ratings session by session.
+    - incremental (bool): Whether to ingest only new responses, see SURVEY_INCREMENTAL_INGESTION, which it
+      defaults to. Incremental ingestion always cleans with data_cleaning.clean_data_midyear_endofession, so
+      pages with another clean function download the whole worksheet.
+    """
+
+    def __init__(self, feedback_worksheet, title, response_worksheet=None,
+                 clean_function=data_cleaning.clean_data_midyear_endofession, sheet_name="edmo_dashboard",
+                 show_trends=True, session_starts=None, incremental=None):
+        self.feedback_worksheet = feedback_worksheet
+        self.title = title
+        self.response_worksheet = response_worksheet or google_services.PAGE_WORKSHEETS[feedback_worksheet][0]
+        self.clean_function = clean_function
+        self.sheet_name = sheet_name
+        self.show_trends = show_trends
+        self.session_starts = session_starts or {}
+        self.incremental = (SURVEY_INCREMENTAL_INGESTION if incremental is None else incremental) and \
+            clean_function is data_cleaning.clean_data_midyear_endofession
+        # Name of the page's update, shared by its background jobs and its automatic regeneration
+        self.update_key = f"{sheet_name}-{feedback_worksheet}"
+
+
+@st.fragment(run_every=jobs.JOBS_POLL_INTERVAL_SECONDS)
+def show_update_progress(page, job_id, ratings):
+    """
+    Shows the progress of a background update, with the analysis received so far for each location,
+    and reruns the page with the new analyses once it is over.
+
+    Parameters:
+    - page (SurveyPage): The page being updated.
+    - job_id (str): The ID of the update job.
+    - ratings (dict): Combined mean rating of each location.
+    """
+    job = jobs.get_job(job_id)
+    state = job.snapshot() if job is not None else {"status": "cancelled", "progress": {}}
+    if state["status"] in jobs.JOB_FINAL_STATUSES:
+        st.session_state[f"update_message_{page.feedback_worksheet}"] = {
+            "succeeded": ("success", "Dashboard updated successfully!"),
+            "failed": ("error", f"The update failed: {state.get('error')}"),
+            "cancelled": ("info", "The update was cancelled.")
+        }[state["status"]]
+        st.rerun()
+
+    received = sum(1 for text in state["progress"].values() if text)
+    st.progress(received / max(len(state["progress"]), 1),
+                text=f"Updating the dashboard: {received}/{len(state['progress'])} locations received")
+    if st.button("Cancel update"):
+        jobs.cancel_job(job_id)
+
+    # One container per location, in rating order, with the analysis received so far. A job started by
+    # another session from newer data may include locations this session has no rating for yet
+    received_progress = {location: analysis for location, analysis in state["progress"].items() if analysis}
+    st.markdown(style.get_location_cards_html(
+        list(received_progress), [ratings.get(location, "") for location in received_progress],
+        list(received_progress.values())
+    ), unsafe_allow_html=True)
+
+def run_automatic_update(page, dic_comments):
+    """
+    Analyzes every location and writes the analyses when the page has none yet, unless another
+    session is already doing it, in which case its result is served once written.
+
+    Parameters:
+    - page (SurveyPage): The page to update.
+    - dic_comments (dict): Dictionary where keys are locations and values are lists of comments.
+    """
+    # Analysis is left to the nightly batch job
+    if data_processing.is_precomputed_only():
+        st.info("No analysis is available yet. It will appear after the next nightly update.")
+        return
+
+    st.warning("The 'Location' column is missing. Running the update functions automatically.")
+
+    # Run OpenAI analysis and update Google Sheets, unless another session is already doing it
+    with st.spinner("Running analysis and updating Google Sheets..."), \
+            single_flight.single_flight(page.update_key) as leader:
+        if leader:
+            analysis_dict = openai_functions.analyze_comment(dic_comments)
+            google_services.send_to_google_sheet(
+                analysis_dict=analysis_dict,
+                sheet_name=page.sheet_name,
+                worksheet_name=page.feedback_worksheet,
+                comment_hashes=openai_functions.comment_hashes(dic_comments, analysis_dict)
+            )
+    if not leader:
+        # Serve the analysis written by the other session
+        single_flight.reload_leader_result(page.sheet_name, page.feedback_worksheet)
+        st.info("The analysis is being updated by another session. Please refresh the page in a moment.")
+        return
+    st.success("Dashboard updated successfully!")
+
+def enqueue_update(page, feedback, df_combined_mean, dic_comments):
+    """
+    Queues the update of the page's analyses as a background job, so it is not interrupted by reruns
+    or page changes. Only locations whose comments changed since the last update are analyzed.
+
+    Parameters:
+    - page (SurveyPage): The page to update.
+    - feedback (pd.DataFrame): The page's current analyses, as returned by data_cleaning.load_and_prepare_data.
+    - df_combined_mean (pd.DataFrame): The mean ratings of each location, in display order.
+    - dic_comments (dict): Dictionary where keys are locations and values are lists of comments.
+    """
+    jobs.enqueue_job(
+        page.update_key, jobs.run_location_analysis_update,
+        locations=[location for location in df_combined_mean["Location"] if location in dic_comments],
+        dic_comments=dic_comments,
+        previous_analyses=data_processing.get_previous_analyses(feedback),
+        sheet_name=page.sheet_name,
+        worksheet_name=page.feedback_worksheet
+    )
+
+def display_trends(page, df_combined_mean):
+    """
+    Charts the combined mean rating of the chosen locations week by week, month by month or session
+    by session, computed from the per-day rollups of the response worksheet.
+
+    Parameters:
+    - page (SurveyPage): The page showing the trends.
+    - df_combined_mean (pd.DataFrame): The mean ratings of each location, in display order.
+    """
+    with st.expander("Trends", expanded=False):
+        if page.incremental:
+            # Maintained by the ingestion that loaded the page, from the same new rows
+            survey_rollups = rollups.get_ingested_rollups(page.sheet_name, page.response_worksheet)
+        else:
+            # Served from the snapshot the page was loaded from, the rollups are built once per version of it
+            responses = google_services.load_worksheets(page.sheet_name, [page.response_worksheet])[page.response_worksheet]
+            survey_rollups = rollups.get_survey_rollups(responses, page.clean_function)
+        if survey_rollups.table.empty:
+            st.info("No dated responses to show trends for yet.")
+            return
+
+        periods = list(TREND_PERIODS) + (["Session"] if page.session_starts else [])
+        period = st.radio("Period", periods, horizontal=True, key=f"trend_period_{page.feedback_worksheet}")
+        locations = st.multiselect(
+            "Locations", df_combined_mean["Location"].tolist(),
+            default=df_combined_mean["Location"].head(TREND_DEFAULT_LOCATIONS).tolist(),
+            key=f"trend_locations_{page.feedback_worksheet}"
+        )
+        if not locations:
+            return
+
+        if period == "Session":
+            trend = survey_rollups.session_trend(page.session_starts, locations)
+        else:
+            trend = survey_rollups.query(freq=TREND_PERIODS[period], locations=locations)
+        # Keep the periods in trend order, since sessions are named rather than dated
+        chart = trend.pivot(index="Period", columns="Location", values="Combined Mean").reindex(trend["Period"].unique())
+        st.line_chart(chart)
+        if survey_rollups.undated:
+            st.caption(f"{survey_rollups.undated} responses without a timestamp are not charted.")
+
+def render_survey_page(page):
+    """
+    Renders a survey page: loads its data, regenerates missing analyses, offers the update button,
+    follows a running update and displays the trends and each location.
+
+    Parameters:
+    - page (SurveyPage): The page to render.
+    """
+    # Display the logo in the sidebar, encoded once per process from the local images
+    st.sidebar.image(assets.get_encoded_image(assets.LOGO_PATH, assets.LOGO_SIDEBAR_WIDTH)[0], use_column_width=True)
+    # Set background image from style module
+    style.set_bg_image(image_path=assets.BACKGROUND_PATH, opacity=0.3)
+
+    # Load and prepare the page's data, shared with every other page and session reading the same worksheets
+    feedback, df_combined_mean, dic_comments = data_cleaning.load_and_prepare_data(
+        page.feedback_worksheet, page.sheet_name, incremental=page.incremental,
+        response_worksheet=page.response_worksheet, clean_function=page.clean_function
+    )
+
+    # Check if feedback or df_combined_mean is None due to missing 'Location' column
+    if feedback is None or df_combined_mean is None:
+        run_automatic_update(page, dic_comments)
+        return
+
+    # Display title of the page
+    st.markdown(f"<h1 style='color: #6BD0C3;'>{page.title}</h1>", unsafe_allow_html=True)
+
+    # Apply button and container styles from style module
+    st.markdown(style.set_button_style(), unsafe_allow_html=True)
+    st.markdown(style.set_container_style_midyear_endofsession(), unsafe_allow_html=True)
+
+    # Report the outcome of the last background update started from this session
+    update_message = st.session_state.pop(f"update_message_{page.feedback_worksheet}", None)
+    if update_message:
+        getattr(st, update_message[0])(update_message[1])
+
+    # Primary Update Dashboard button, hidden when the analysis is left to the nightly batch job
+    if not data_processing.is_precomputed_only() and st.button("Update Dashboard"):
+        enqueue_update(page, feedback, df_combined_mean, dic_comments)
+
+    # Follow the update running for this page, whichever session started it
+    active_job = jobs.get_active_job(page.update_key)
+    if active_job is not None:
+        ratings = dict(zip(df_combined_mean["Location"], df_combined_mean["Combined Mean"]))
+        show_update_progress(page, active_job.id, ratings)
+        return
+
+    # Display the date of last update
+    if not feedback.empty:
+        date_sent = feedback["Date Sent"].iloc[0]
+        st.markdown(f"**Last updated:** {date_sent}")
+
+    # Chart the ratings over time from the precomputed rollups
+    if page.show_trends:
+        with telemetry.span("render.trends"):
+            display_trends(page, df_combined_mean)
+
+    # Display each location in a styled container, all of them in a single element
+    with telemetry.span("render.location_containers", locations=len(feedback)):
+        style.display_location_cards(feedback, key=page.feedback_worksheet)
+
+def run_survey_page(page, trace_name):
+    """
+    Runs a survey page script: configures the page, renders it within a telemetry trace and shows
+    the performance panel when it is enabled.
+
+    Parameters:
+    - page (SurveyPage): The page to run.
+    - trace_name (str): Name of the trace of each rerun, such as "page.Mid_Year".
+    """
+    # Set page configuration with favicon and collapsed sidebar
+    st.set_page_config(
+        layout="wide",
+        page_title=PAGE_TITLE,
+        page_icon=assets.get_encoded_image(assets.LOGO_PATH, assets.FAVICON_WIDTH)[0],
+        initial_sidebar_state="expanded"
+    )
+
+    # Time the whole rerun, and show where the time went when the performance panel is enabled
+    with telemetry.trace(trace_name) as rerun_span:
+        render_survey_page(page)
+    telemetry.show_performance_panel(rerun_span.trace)
@@ -0,0 +1,388 @@
+import os
+import json
+import time
+import secrets
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import pandas as pd
+import streamlit as st
+
+# Export of finished traces: None to keep them in memory only, "log" for one JSON line per span,
+# or "otlp" for one OpenTelemetry (OTLP/JSON) document per trace
+TELEMETRY_EXPORT_FORMAT = None
+
+# File the exported spans are appended to, printed to the logs when None
+TELEMETRY_EXPORT_PATH = None
+
+# Name of the service reported in the OpenTelemetry resource
+TELEMETRY_SERVICE_NAME = "edmo-dashboard"
+
+# Maximum number of spans recorded per trace, so long background jobs stay bounded
+TELEMETRY_MAX_SPANS_PER_TRACE = 2000
+
+# Show the timing breakdown of each rerun in the sidebar. It can also be shown with the `?perf=1` query parameter
+TELEMETRY_SIDEBAR_PANEL = False
+
+# Span running in the current thread or task, inherited by pools through bind_context
+_current_span = contextvars.ContextVar("telemetry_current_span", default=None)
+_export_lock = threading.Lock()
+
+
+class Trace:
+    """
+    The spans of one rerun or one background job.
+
+    Parameters:
+    - name (str): The name of the root span.
+    """
+
+    def __init__(self, name):
+        self.trace_id = secrets.token_hex(16)
+        self.name = name
+        self.spans = []
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def add(self, span):
+        """
+        Records a finished span, unless the trace already holds TELEMETRY_MAX_SPANS_PER_TRACE spans.
+
+        Parameters:
+        - span (Span): The finished span.
+        """
+        with self.lock:
+            if len(self.spans) < TELEMETRY_MAX_SPANS_PER_TRACE or span.parent_id is None:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def get_spans(self):
+        """
+        Returns the finished spans in start order.
+
+        Returns:
+        - list: The spans of the trace.
+        """
+        with self.lock:
+            return sorted(self.spans, key=lambda span: span.start_ns)
+
+
+class Span:
+    """
+    A timed operation, such as a Sheets download or an OpenAI call.
+
+    Parameters:
+    - name (str): The operation, prefixed with its category such as "sheets." or "openai.".
+    - trace (Trace): The trace the span belongs to.
+    - parent_id (str): The ID of the enclosing span, None for the root span of the trace.
+    - attributes (dict): Details of the operation, such as row or token counts.
+    """
+
+    def __init__(self, name, trace, parent_id=None, attributes=None):
+        self.name = name
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.duration = None
+        self._started = time.perf_counter()
+
+    def set_attributes(self, **attributes):
+        """
+        Adds details to the span, None values are ignored.
+
+        Parameters:
+        - **attributes: Attribute values, as str, int, float or bool.
+        """
+        self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+    def end(self, error=None):
+        """
+        Stops the timing and records the span in its trace. The trace is exported when its root span ends.
+
+        Parameters:
+        - error (Exception): The error the operation failed with.
+        """
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        self.error = str(error) if error is not None else None
+        self.trace.add(self)
+        if self.parent_id is None:
+            export_trace(self.trace)
+
+
+def get_current_span():
+    """
+    Returns the span running in the current context.
+
+    Returns:
+    - Span: The current span, or None outside of any span.
+    """
+    return _current_span.get()
+
+def start_span(name, new_trace=False, **attributes):
+    """
+    Starts a span without making it the current one, for code such as generators that cannot
+    hold a context manager across yields. End it with `Span.end`.
+
+    Parameters:
+    - name (str): The operation.
+    - new_trace (bool): Start a new trace even inside another span.
+    - **attributes: Details of the operation.
+
+    Returns:
+    - Span: The started span, a child of the current span if there is one.
+    """
+    parent = None if new_trace else _current_span.get()
+    if parent is None:
+        return Span(name, Trace(name), attributes=attributes)
+    return Span(name, parent.trace, parent.span_id, attributes)
+
+@contextmanager
+def span(name, new_trace=False, **attributes):
+    """
+    Times the enclosed block as a span, child of the current span. Outside of any span, the span
+    starts its own trace.
+
+    Parameters:
+    - name (str): The operation.
+    - new_trace (bool): Start a new trace even inside another span.
+    - **attributes: Details of the operation.
+
+    Yields:
+    - Span: The running span, to add attributes known only once the operation is done.
+    """
+    current = start_span(name, new_trace, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.end(error=e)
+        raise
+    finally:
+        _current_span.reset(token)
+        # Streamlit's reruns and stops are not errors
+        current.end()
+
+def trace(name, **attributes):
+    """
+    Times the enclosed block as the root span of a new trace, such as a page rerun or a background job.
+
+    Parameters:
+    - name (str): The name of the trace.
+    - **attributes: Details of the trace.
+
+    Returns:
+    - A context manager yielding the root span; its `trace` holds every span once the block is done.
+    """
+    return span(name, new_trace=True, **attributes)
+
+def traced(name):
+    """
+    Decorator timing every call of a function as a span.
+
+    Parameters:
+    - name (str): The operation.
+
+    Returns:
+    - callable: The decorator.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def bind_context(func):
+    """
+    Binds a function to the current context, so spans it starts in a pool thread are children of
+    the current span instead of separate traces.
+
+    Parameters:
+    - func (callable): The function submitted to the pool.
+
+    Returns:
+    - callable: The function, run in a copy of the current context on every call.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+def to_log_records(trace):
+    """
+    Converts a trace into structured log records, one per span.
+
+    Parameters:
+    - trace (Trace): The finished trace.
+
+    Returns:
+    - list: One dictionary per span.
+    """
+    return [
+        {
+            "timestamp": datetime.fromtimestamp(span.start_ns / 1e9, timezone.utc).isoformat(),
+            "trace_id": trace.trace_id, "span_id": span.span_id, "parent_span_id": span.parent_id,
+            "name": span.name, "duration_ms": round(span.duration * 1000, 3),
+            "status": "error" if span.error else "ok", "error": span.error, "attributes": span.attributes
+        }
+        for span in trace.get_spans()
+    ]
+
+def to_otlp_value(value):
+    """
+    Converts an attribute value into an OTLP/JSON AnyValue.
+
+    Parameters:
+    - value: The attribute value.
+
+    Returns:
+    - dict: The AnyValue.
+    """
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def to_otlp_json(trace):
+    """
+    Converts a trace into an OpenTelemetry export request (OTLP/JSON), which the OpenTelemetry
+    Collector and most tracing backends import.
+
+    Parameters:
+    - trace (Trace): The finished trace.
+
+    Returns:
+    - dict: The ExportTraceServiceRequest.
+    """
+    spans = []
+    for span in trace.get_spans():
+        otlp_span = {
+            "traceId": trace.trace_id, "spanId": span.span_id, "name": span.name, "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.start_ns + int(span.duration * 1e9)),
+            "attributes": [{"key": key, "value": to_otlp_value(value)} for key, value in span.attributes.items()],
+            # STATUS_CODE_OK is 1, STATUS_CODE_ERROR is 2
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TELEMETRY_SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "utils.telemetry"}, "spans": spans}]
+    }]}
+
+def export_trace(trace):
+    """
+    Writes a finished trace in TELEMETRY_EXPORT_FORMAT to TELEMETRY_EXPORT_PATH, or to the logs.
+
+    Parameters:
+    - trace (Trace): The finished trace.
+    """
+    if TELEMETRY_EXPORT_FORMAT is None:
+        return
+    try:
+        if TELEMETRY_EXPORT_FORMAT == "otlp":
+            lines = [json.dumps(to_otlp_json(trace))]
+        else:
+            lines = [json.dumps(record) for record in to_log_records(trace)]
+
+        with _export_lock:
+            if TELEMETRY_EXPORT_PATH is None:
+                for line in lines:
+                    print(line)
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(TELEMETRY_EXPORT_PATH)), exist_ok=True)
+                with open(TELEMETRY_EXPORT_PATH, "a", encoding="utf-8") as export_file:
+                    export_file.write("".join(line + "\n" for line in lines))
+    except Exception as e:
+        # Telemetry never breaks the page
+        print(f"Error exporting trace '{trace.name}': {e}")
+
+def get_breakdown(trace):
+    """
+    Summarizes where the time of a trace went.
+
+    The self time of a span is its duration minus the time of its children, so the self times of
+    all spans add up to the duration of the trace when nothing runs in parallel.
+
+    Parameters:
+    - trace (Trace): The finished trace.
+
+    Returns:
+    - tuple: A DataFrame with one row per span, in start order and indented by depth, and a DataFrame
+      of the self time of each category (the span name prefix, such as "sheets" or "openai").
+    """
+    spans = trace.get_spans()
+    by_id = {span.span_id: span for span in spans}
+    children_time = {}
+    for span in spans:
+        if span.parent_id in by_id:
+            children_time[span.parent_id] = children_time.get(span.parent_id, 0) + span.duration
+    total = max((span.duration for span in spans if span.parent_id is None), default=0) or 1
+
+    rows = []
+    for span in spans:
+        depth, parent_id = 0, span.parent_id
+        while parent_id in by_id:
+            depth, parent_id = depth + 1, by_id[parent_id].parent_id
+        # Children running in parallel can add up to more than their parent
+        self_time = max(span.duration - children_time.get(span.span_id, 0), 0)
+        rows.append({
+            "Span": "  " * depth + span.name,
+            "Category": span.name.split(".")[0],
+            "Duration (ms)": round(span.duration * 1000, 1),
+            "Self (ms)": round(self_time * 1000, 1),
+            "Share": f"{span.duration / total:.0%}",
+            "Details": ", ".join(f"{key}={value}" for key, value in span.attributes.items())
+                       + (f" error={span.error}" if span.error else "")
+        })
+    spans_df = pd.DataFrame(rows, columns=["Span", "Category", "Duration (ms)", "Self (ms)", "Share", "Details"])
+    categories_df = (spans_df.groupby("Category", as_index=False)["Self (ms)"].sum()
+                     .sort_values("Self (ms)", ascending=False, ignore_index=True))
+    return spans_df, categories_df
+
+def is_panel_enabled():
+    """
+    Tells whether the performance panel is shown.
+
+    Returns:
+    - bool: True if TELEMETRY_SIDEBAR_PANEL is set or the page was opened with `?perf=1`.
+    """
+    return TELEMETRY_SIDEBAR_PANEL or st.query_params.get("perf") not in (None, "", "0")
+
+def show_performance_panel(trace):
+    """
+    Shows the timing breakdown of a rerun in the sidebar, with a download of its spans, when the panel is enabled.
+
+    Parameters:
+    - trace (Trace): The trace of the rerun.
+    """
+    if not is_panel_enabled():
+        return
+    spans_df, categories_df = get_breakdown(trace)
+    with st.sidebar.expander("Performance of this run", expanded=True):
+        st.caption(f"{trace.name}: {spans_df['Duration (ms)'].max():.0f} ms, {len(spans_df)} spans"
+                   + (f" ({trace.dropped} dropped)" if trace.dropped else ""))
+        st.dataframe(categories_df, hide_index=True, use_container_width=True)
+        st.dataframe(spans_df.drop(columns="Category"), hide_index=True, use_container_width=True)
+        st.download_button(
+            "Download spans (OpenTelemetry JSON)", json.dumps(to_otlp_json(trace)),
+            file_name=f"trace-{trace.trace_id}.json", mime="application/json"
+        )